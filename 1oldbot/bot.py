@@ -13,18 +13,29 @@ from dotenv import load_dotenv
 from bot_logic.registration.handlers import router as registration_router
 from bot_logic.transfer.handlers import router as transfer_router
 from bot_logic.common.handlers import router as common_router
+from bot_logic.admin.common.handlers import router as admin_common_router
+from bot_logic.admin.transfer.handlers import router as admin_transfer_router
+from bot_logic.middlewares import CallbackDedupMiddleware, ConcurrencyLimitMiddleware, UserEventIsolation
+from oldbot.database import db_stubs
+from oldbot.bot_logic.transfer.config import transfer_config_service
+from services.broadcast import Broadcaster
+from services.fsm_storage import create_fsm_storage
+from services.webhook import run_webhook
+import config
 
 
-async def main():
-    logging.basicConfig(level=logging.INFO)
-    load_dotenv()
+async def create_bot_runtime(worker_id: int = 0):
+    """
+    Создает бота и диспетчер со всеми роутерами.
+    Возвращает (bot, dp, cleanup), где cleanup — корутина корректного завершения.
+    """
     bot_token = os.getenv("BOT_TOKEN")
-    if not bot_token:
-        logging.error("Ошибка: не найден токен бота. Проверьте ваш .env файл.")
-        return
-
     bot = Bot(token=bot_token, default=DefaultBotProperties(parse_mode="HTML"))
-    dp = Dispatcher()
+    # Состояния диалогов: в памяти или в Redis (config.FSM_STORAGE), общем для нескольких процессов
+    # Апдейты одного пользователя обрабатываются по очереди, разных — параллельно
+    dp = Dispatcher(storage=create_fsm_storage(), events_isolation=UserEventIsolation())
+    dp.update.outer_middleware(ConcurrencyLimitMiddleware(config.UPDATE_CONCURRENCY_LIMIT))
+    dp.callback_query.outer_middleware(CallbackDedupMiddleware(config.CALLBACK_DEDUP_TTL))
 
     # !!! ПОДКЛЮЧАЕМ ВСЕ РОУТЕРЫ !!!
     # Важно: Порядок регистрации роутеров имеет значение.
@@ -33,29 +44,62 @@ async def main():
     # чтобы их хэндлеры срабатывали первыми.
     dp.include_router(registration_router)
     dp.include_router(transfer_router)
+    # Админка, вход командой /admin
+    dp.include_router(admin_common_router)
+    dp.include_router(admin_transfer_router)
     dp.include_router(common_router)
 
+    if worker_id == 0:
+        # --- Регистрация команд бота для "синего меню" ---
+        commands = [
+            BotCommand(command="start", description="Начать работу с ботом"),
+            # BotCommand(command="cancel", description="Отменить всё и вернуться в главное меню"),
+        ]
+        await bot.set_my_commands(commands)
+        logging.info("Команды бота успешно установлены.")
+
+    # Изменения config.json подхватываются без перезапуска бота
+    config_watch_task = asyncio.create_task(transfer_config_service.watch())
+
+    # Рассылки всем клиентам; прерванные остановкой или падением продолжаются с сохраненной позиции
+    broadcaster = Broadcaster(bot, db_stubs.BROADCAST_DIR)
+    dp["broadcaster"] = broadcaster
+    if worker_id == 0:
+        broadcaster.resume_unfinished(db_stubs.iter_client_id_chunks, db_stubs.io_executor.read)
+
+    async def cleanup():
+        config_watch_task.cancel()
+        await broadcaster.stop()
+        logging.info(f"Кэш профилей клиентов: {db_stubs.user_cache.stats()}")
+        db_stubs.io_executor.shutdown()
+        db_stubs.journal.close()
+        await dp.storage.close()
+        await bot.session.close()
 
-    # --- Регистрация команд бота для "синего меню" ---
-    commands = [
-        BotCommand(command="start", description="Начать работу с ботом"),
-        # BotCommand(command="cancel", description="Отменить всё и вернуться в главное меню"),
-    ]
-    await bot.set_my_commands(commands)
-    logging.info("Команды бота успешно установлены.")
+    return bot, dp, cleanup
 
 
+async def main():
+    bot, dp, cleanup = await create_bot_runtime()
+
     await bot.delete_webhook(drop_pending_updates=True)
 
     try:
         await dp.start_polling(bot)
     finally:
-        await bot.session.close()
+        await cleanup()
 
 
 if __name__ == "__main__":
-    try:
-        asyncio.run(main())
-    except KeyboardInterrupt:
-        print("Бот остановлен.")
-
+    logging.basicConfig(level=logging.INFO)
+    load_dotenv()
+    if not os.getenv("BOT_TOKEN"):
+        logging.error("Ошибка: не найден токен бота. Проверьте ваш .env файл.")
+    elif config.BOT_MODE == "webhook":
+        # Клиенты (clients.xlsx), журнал заявок и счетчики мест в памяти рассчитаны на один процесс
+        run_webhook(create_bot_runtime, single_writer=True)
+    else:
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            print("Бот остановлен.")
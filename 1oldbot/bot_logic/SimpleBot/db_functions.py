@@ -1,7 +1,11 @@
-import json
+import asyncio
 import logging
-import os
-from datetime import datetime
+
+import paths  # noqa: F401 — подключает database/ и корень проекта к sys.path
+import config
+from excel_manager import JOURNAL_DIR
+from journal import ApplicationJournal
+from services.id_generator import IdGenerator
 
 # --- "Заглушка" для проверки пользователя в базе ---
 async def check_user_in_db(user_id: int) -> bool:
@@ -16,26 +20,27 @@ async def check_user_in_db(user_id: int) -> bool:
     return user_id % 2 == 0
 
 
-# --- Сохранение заявки в JSON ---
-APPLICATIONS_DIR = "applications"
+# --- Сохранение заявки в журнал ---
+# Тот же журнал, который excel_manager переносит в книгу (путь задается APPLICATIONS_JOURNAL_DIR)
+journal = ApplicationJournal(JOURNAL_DIR)
+# Свой номер узла, чтобы ID заявок не пересекались с основным ботом
+if config.SIMPLEBOT_ID_NODE == config.ID_NODE:
+    raise ValueError(f"SIMPLEBOT_ID_NODE совпадает с ID_NODE основного бота ({config.ID_NODE}), ID заявок пересекутся.")
+id_generator = IdGenerator(node_id=config.SIMPLEBOT_ID_NODE)
+
 
-async def save_application_to_json(data: dict):
+async def save_application(data: dict):
     """
-    Сохраняет данные заявки в JSON-файл.
+    Дописывает заявку в журнал заявок.
+    Возвращает номер заявки или None при ошибке.
     """
-    if not os.path.exists(APPLICATIONS_DIR):
-        os.makedirs(APPLICATIONS_DIR)
-
-    # Создаем уникальное имя файла
-    user_id = data.get('user_id')
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    file_name = f"app_{user_id}_{timestamp}.json"
-    file_path = os.path.join("D:/sync/2 way BikeFit Lab - nikolay mac/transfer/transfer_tg_bot/database/data/applications", file_name)
-    # file_path = os.path.join("C:/Users/Nikolay/PycharmProjects/transfer_tg_bot/database/data/applications", file_name)
+    app_id = id_generator.next_id()
 
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(data, f, ensure_ascii=False, indent=4)
-        logging.info(f"Заявка сохранена в файл: {file_path}")
+        # Журнал сам упорядочивает записи, а одновременные заявки делят один fsync
+        await asyncio.to_thread(journal.append_application, app_id, data)
+        logging.info(f"Заявка {app_id} сохранена в журнал.")
+        return app_id
     except Exception as e:
-        logging.error(f"Ошибка при сохранении заявки в файл: {e}")
+        logging.error(f"Ошибка при сохранении заявки в журнал: {e}")
+        return None
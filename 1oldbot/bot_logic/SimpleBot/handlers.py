@@ -1,7 +1,6 @@
 import logging
+import os
 from datetime import datetime
-import subprocess
-import sys
 from aiogram import F, Router
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
@@ -9,35 +8,30 @@ from aiogram.types import (CallbackQuery, FSInputFile, Message)
 
 import keyboards
 import texts
-from db_functions import save_application_to_json
+from db_functions import save_application
 from fsm import ApplicationFSM
+from ingestion import ApplicationIngestionWorker
+from services.notifications import NotificationDispatcher
 
 router = Router()
 
+# Чат, куда приходят уведомления о /start; задается переменной окружения START_WATCH_CHAT_ID.
+# Если не задан, уведомления о /start не отправляются
+START_WATCH_CHAT_ID = int(os.getenv("START_WATCH_CHAT_ID") or 0)
+
 
 # --- Обработка команды /start ---
 @router.message(Command("start"))
-async def start_handler(message: Message, state: FSMContext):
+async def start_handler(message: Message, state: FSMContext, notifier: NotificationDispatcher):
     """
     Обработчик команды /start.
     Проверяет, есть ли пользователь в базе.
     """
     user_id = message.from_user.id
     logging.info(f"Пользователь {user_id} нажал /start")
-    if (user_id != 730191569  # Nikolay telegram id main
-            and user_id != 233935975
-            and user_id != 233935975): # Sergey telegram id
-        if 1:
-            try:
-                await message.bot.send_message(
-                    chat_id=6507777374,  # Nikolay telegram id watches
-                    text=(f"@{message.from_user.username} {user_id} /start"),
-                    parse_mode="HTML"
-                )
-            except Exception as e:
-                logging.error(f"Не удалось отправить уведомление администратору: {e}")
-
-
+    # О новых посетителях (кроме самих админов) сообщаем в отдельный чат наблюдения
+    if START_WATCH_CHAT_ID and user_id not in notifier.recipients():
+        notifier.notify(f"@{message.from_user.username} {user_id} /start", chat_ids=[START_WATCH_CHAT_ID])
 
     # Сбрасываем предыдущее состояние, если оно было
     await state.clear()
@@ -203,7 +197,9 @@ async def passport_handler(message: Message, state: FSMContext):
 
 # --- Финальное подтверждение ---
 @router.callback_query(ApplicationFSM.final_confirmation, F.data == "confirm")
-async def confirm_application_handler(callback: CallbackQuery, state: FSMContext):
+async def confirm_application_handler(callback: CallbackQuery, state: FSMContext,
+                                      ingestion_worker: ApplicationIngestionWorker,
+                                      notifier: NotificationDispatcher):
     user_data = await state.get_data()
     user_info = {
         'user_id': callback.from_user.id,
@@ -219,7 +215,9 @@ async def confirm_application_handler(callback: CallbackQuery, state: FSMContext
         'dropoff_point': user_data.get('dropoff_point'),
     }
 
-    await save_application_to_json(user_info)
+    if await save_application(user_info):
+        # Запись в Excel выполняет фоновый обработчик, дочитывая журнал заявок
+        ingestion_worker.notify()
     if user_data.get('selected_date', 'Не указана') == '23-29-starovatut':
         date = '      23.09 - 29.09 11:00-20:00\n      Староватутинский пр. 12с13'
     elif user_data.get('selected_date', 'Не указана') == '27-krylo':
@@ -258,26 +256,8 @@ async def confirm_application_handler(callback: CallbackQuery, state: FSMContext
         f"🛂 <b>Паспортные данные:</b> \n      {user_data.get('passport', 'Не указаны')}\n\n"
     )
 
-    # Отправляем сообщение администратору
-    if 0:
-        try:
-            await callback.bot.send_message(
-                chat_id=233935975,  # Sergei telegram id
-                text=admin_message,
-                parse_mode="HTML"
-            )
-        except Exception as e:
-            logging.error(f"Не удалось отправить уведомление администратору: {e}")
-    if 1:
-        try:
-            await callback.bot.send_message(
-                chat_id=730191569,  # Nikolay telegram id
-                text=admin_message,
-                parse_mode="HTML"
-            )
-        except Exception as e:
-            logging.error(f"Не удалось отправить уведомление администратору: {e}")
-
+    # Уведомление админам (admin_ids из config.json) уходит из фоновой очереди и не задерживает ответ клиенту
+    notifier.notify(admin_message)
 
     #    await callback.message.edit_text(texts.APPLICATION_SUCCESS_TEXT)
     await callback.message.edit_text(user_message)
@@ -285,9 +265,6 @@ async def confirm_application_handler(callback: CallbackQuery, state: FSMContext
     await state.set_state(ApplicationFSM.main_menu)
     await callback.answer("Заявка успешно создана!\nДля подтверждения бронирования менеджер свяжется с Вами в ближайшее время.", show_alert=True)
     # await callback.answer("Вы успешно добавлены в лист ожидания!", show_alert=True)
-    # script_path = "C:/Users/Nikolay/PycharmProjects/transfer_tg_bot/database/excel_manager.py"
-    script_path = "D:/sync/2 way BikeFit Lab - nikolay mac/transfer/transfer_tg_bot/database/excel_manager.py"
-    subprocess.run([sys.executable, script_path])
 
 
 # --- Универсальный обработчик кнопки "Назад" ---
@@ -0,0 +1,78 @@
+import asyncio
+import logging
+
+import paths  # noqa: F401 — подключает database/ к sys.path
+import excel_manager
+from journal import ApplicationJournal
+
+
+class ApplicationIngestionWorker:
+    """
+    Фоновый обработчик заявок, работающий вместе с ботом.
+
+    Заявки уже лежат в журнале (см. database/journal.py), поэтому хендлеры только
+    будят воркер через notify(). Сигналы, пришедшие во время паузы или записи,
+    сливаются в один проход: воркер дочитывает хвост журнала и добавляет его на
+    листы событий за одно открытие/сохранение книги Excel. При ошибке проход
+    повторяется с паузой, а чекпойнт журнала не сдвигается.
+    """
+
+    def __init__(self, journal: ApplicationJournal, batch_delay: float = 3.0, max_retries: int = 5,
+                 retry_delay: float = 10.0):
+        self.journal = journal
+        self.batch_delay = batch_delay
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task = None
+
+    async def start(self):
+        """Переносит в журнал старые JSON-файлы и запускает обработку хвоста, оставшегося с прошлого запуска."""
+        await asyncio.to_thread(excel_manager.migrate_legacy_inbox, self.journal)
+        self._task = asyncio.create_task(self._run())
+        self.notify()
+        logging.info("Обработчик заявок запущен.")
+
+    def notify(self):
+        """Сообщает воркеру, что в журнале появились новые заявки. Не блокирует хендлер."""
+        self._wakeup.set()
+
+    async def stop(self, timeout: float = 60.0):
+        """Завершает текущий проход, дочитывает журнал и останавливает воркер."""
+        if not self._task:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logging.warning("Обработчик заявок не успел завершиться, хвост журнала будет обработан при следующем запуске.")
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            if not self._stopping:
+                # Небольшая пауза, чтобы заявки, пришедшие следом, попали в тот же проход
+                await asyncio.sleep(self.batch_delay)
+            self._wakeup.clear()
+            await self._ingest_with_retry()
+            # При остановке делаем еще один проход, если сигнал пришел во время записи
+            if self._stopping and not self._wakeup.is_set():
+                break
+
+    async def _ingest_with_retry(self):
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                count = await asyncio.to_thread(excel_manager.ingest_journal, self.journal)
+                if count:
+                    logging.info(f"Добавлено заявок в Excel: {count}.")
+                return
+            except Exception as e:
+                logging.error(f"Ошибка при добавлении заявок в Excel (попытка {attempt}/{self.max_retries}): {e}")
+                if attempt < self.max_retries and not self._stopping:
+                    await asyncio.sleep(self.retry_delay * attempt)
+                else:
+                    break
+
+        logging.error("Заявки не добавлены в Excel. Они остались в журнале и будут обработаны следующим проходом.")
@@ -0,0 +1,12 @@
+import os
+import sys
+
+# SimpleBot запускается как отдельный скрипт из своей папки, поэтому модули
+# из database/ основного проекта (excel_manager.py) подключаем через sys.path.
+DATABASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'database'))
+# Корень репозитория — для общих сервисов (services/id_generator.py)
+PROJECT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+for path in (DATABASE_DIR, PROJECT_DIR):
+    if path not in sys.path:
+        sys.path.append(path)
@@ -8,6 +8,9 @@ from aiogram.fsm.storage.memory import MemoryStorage
 from dotenv import load_dotenv
 
 from handlers import router
+from db_functions import journal
+from ingestion import ApplicationIngestionWorker
+from services.notifications import NotificationDispatcher, parse_chat_ids
 
 async def main():
     """
@@ -45,12 +48,29 @@ async def main():
     # Подключаем роутер с нашими обработчиками
     dp.include_router(router)
 
+    # Фоновый обработчик, который переносит подтвержденные заявки в Excel пачками
+    ingestion_worker = ApplicationIngestionWorker(journal)
+    dp["ingestion_worker"] = ingestion_worker
+    await ingestion_worker.start()
+
+    # Уведомления о новых заявках уходят из фоновой очереди. Получатели — отдельная настройка
+    # NOTIFY_CHAT_IDS ("123,456"), а не admin_ids: попадание в admin_ids дает права админа
+    notify_chat_ids = parse_chat_ids(os.getenv("NOTIFY_CHAT_IDS", ""))
+    if not notify_chat_ids:
+        logging.warning("NOTIFY_CHAT_IDS не задан, уведомления о заявках никому не отправляются.")
+    notifier = NotificationDispatcher(bot, lambda: notify_chat_ids)
+    dp["notifier"] = notifier
+    notifier.start()
+
     # Удаляем вебхук и запускаем polling
     await bot.delete_webhook(drop_pending_updates=True)
     try:
         logging.info("Бот запускается...")
         await dp.start_polling(bot)
     finally:
+        await ingestion_worker.stop()
+        await notifier.stop()
+        journal.close()
         await bot.session.close()
 
 
@@ -2,7 +2,8 @@
 import logging
 
 from aiogram import Router, F
-from aiogram.types import CallbackQuery
+from aiogram.filters import Command
+from aiogram.types import CallbackQuery, Message
 from aiogram.fsm.context import FSMContext
 
 # Импорты для FSM
@@ -14,16 +15,28 @@ from oldbot.bot_logic.admin.common import keyboards as admin_common_kb
 from oldbot.bot_logic.admin.transfer import keyboards as admin_transfer_kb # Для вызова меню трансферов
 
 # Импорт конфигурации (для получения admin_ids)
-from oldbot.bot_logic.transfer.config import TRANSFER_CONFIG # Здесь мы берем admin_ids из общего конфига трансфера
+from oldbot.bot_logic.transfer.config import get_event_registry # Здесь мы берем admin_ids из общего конфига трансфера
 
 router = Router()
 logger = logging.getLogger(__name__)
 
+# --- Вход в админку командой /admin ---
+# Для остальных пользователей команды нет: сообщение уходит в общий роутер
+@router.message(Command("admin"), F.from_user.func(lambda user: user.id in get_event_registry().admin_ids))
+async def cmd_admin(message: Message, state: FSMContext):
+    await state.clear()
+    await message.answer(
+        "Добро пожаловать в админ-панель!",
+        reply_markup=admin_common_kb.get_admin_main_menu_keyboard()
+    )
+    await state.set_state(AdminCommonFSM.admin_main_menu)
+
+
 # --- Обработка входа в меню админ-трансферов ---
 @router.callback_query(AdminCommonFSM.admin_main_menu, F.data == 'admin_transfer_menu')
 async def admin_transfer_menu(callback: CallbackQuery, state: FSMContext):
     # Дополнительная проверка на админа, хотя уже была при входе в админку
-    if callback.from_user.id not in TRANSFER_CONFIG.get('admin_ids', []):
+    if callback.from_user.id not in get_event_registry().admin_ids:
         await callback.answer("У вас нет прав доступа.", show_alert=True)
         await callback.message.delete()
         await state.clear() # Сбрасываем состояние на всякий случай
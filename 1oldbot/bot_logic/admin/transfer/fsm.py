@@ -7,4 +7,7 @@ class AdminTransferFSM(StatesGroup):
     viewing_applications = State()      # Просмотр списка заявок
     editing_application = State()       # Редактирование конкретной заявки
     deleting_application = State()      # Удаление заявки
+    viewing_dashboard = State()         # Сводка по заявкам событий
+    choosing_broadcast_event = State()  # Выбор события для рассылки расписания
+    confirming_broadcast = State()      # Подтверждение рассылки расписания
     # ... другие состояния для администрирования трансферов
\ No newline at end of file
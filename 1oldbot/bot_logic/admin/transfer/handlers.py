@@ -1,5 +1,6 @@
 # bot_logic/admin/transfer/handlers.py
 import logging
+from typing import Optional
 
 from aiogram import Router, F
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
@@ -12,12 +13,17 @@ from oldbot.bot_logic.admin.transfer.fsm import AdminTransferFSM
 from oldbot.bot_logic.admin.transfer import keyboards as admin_transfer_kb
 
 # Импорты для базы данных
+from oldbot.database import db_stubs
 
 # Импорт утилит
 from oldbot.bot_logic.utils.utils import format_application_summary
 
 # Импорт конфигурации (для получения admin_ids)
-from oldbot.bot_logic.transfer.config import TRANSFER_CONFIG
+from oldbot.bot_logic.transfer.config import get_event_registry
+from oldbot.bot_logic.transfer.registry import OPTION_KEYS, SLOT_MODE_RANGE, EventRegistry
+from oldbot.database.application_index import APPLICATION_STATUSES, DEFAULT_STATUS
+
+from services.broadcast import Broadcaster
 
 router = Router()
 logger = logging.getLogger(__name__)
@@ -25,41 +31,64 @@ logger = logging.getLogger(__name__)
 
 # --- Вспомогательная функция для проверки прав админа ---
 def is_admin(user_id: int) -> bool:
-    return user_id in TRANSFER_CONFIG.get('admin_ids', [])
+    return user_id in get_event_registry().admin_ids
 
 
 # --- Просмотр списка заявок ---
+APPLICATIONS_PER_PAGE = 5
+
+
+async def _show_applications_page(callback: CallbackQuery, state: FSMContext, cursor: Optional[str] = None):
+    """Показывает страницу заявок по курсору и запоминает курсор для возврата к списку."""
+    page = await db_stubs.list_applications(cursor=cursor, limit=APPLICATIONS_PER_PAGE)
+    text = f"Список заявок (всего {page.total}):" if page.items else "Заявок пока нет."
+    await callback.message.edit_text(
+        text,
+        reply_markup=admin_transfer_kb.get_application_list_keyboard(page.items, page.next_cursor, page.prev_cursor)
+    )
+    await state.update_data(admin_apps_cursor=cursor)
+    await state.set_state(AdminTransferFSM.viewing_applications)
+
+
 @router.callback_query(AdminTransferFSM.transfer_management_menu, F.data == 'admin_view_applications')
-@router.callback_query(AdminTransferFSM.viewing_applications, F.data.startswith('admin_apps_page_'))
+@router.callback_query(AdminTransferFSM.viewing_applications, F.data.startswith(admin_transfer_kb.APPS_PAGE_PREFIX))
 async def admin_view_applications(callback: CallbackQuery, state: FSMContext):
     if not is_admin(callback.from_user.id):
         await callback.answer("У вас нет прав доступа.", show_alert=True)
         return
 
-    current_page = 0
-    if F.data.startswith('admin_apps_page_'):
-        current_page = int(callback.data.split('_')[-1])
-
-    # TODO: Получить реальные заявки из БД
-    # Пока заглушка:
-    all_applications = [
-        {"id": 1, "full_name": "Иванов И.И.", "event_name": "Весенний марафон", "status": "Новая"},
-        {"id": 2, "full_name": "Петров А.В.", "event_name": "Гонка Лето 2025", "status": "В обработке"},
-        {"id": 3, "full_name": "Сидорова Е.К.", "event_name": "Гонка Осень 2025", "status": "Завершена"},
-        {"id": 4, "full_name": "Кузнецов Р.Л.", "event_name": "Весенний марафон", "status": "Новая"},
-        {"id": 5, "full_name": "Смирнова В.О.", "event_name": "Гонка Лето 2025", "status": "Отменена"},
-        {"id": 6, "full_name": "Волков С.Д.", "event_name": "Гонка Осень 2025", "status": "Новая"},
-    ]
+    cursor = None
+    if callback.data.startswith(admin_transfer_kb.APPS_PAGE_PREFIX):
+        cursor = callback.data[len(admin_transfer_kb.APPS_PAGE_PREFIX):]
 
-    await callback.message.edit_text(
-        f"Список заявок (Страница {current_page + 1}):",
-        reply_markup=admin_transfer_kb.get_application_list_keyboard(all_applications, current_page)
-    )
-    await state.set_state(AdminTransferFSM.viewing_applications)
+    await _show_applications_page(callback, state, cursor)
     await callback.answer()
 
 
 # --- Просмотр деталей конкретной заявки ---
+async def _show_application_details(callback: CallbackQuery, state: FSMContext, app_id: int) -> bool:
+    """Показывает заявку из журнала. Если ее нет (например, уже удалена), возвращает False."""
+    application = await db_stubs.get_application_by_id(app_id)
+    if application is None:
+        return False
+
+    # В заявке точка записана в 'point_name' (в старых — в 'date'), сводка ждет 'selected_point_name'
+    summary_data = dict(application, selected_point_name=application.get('point_name') or application.get('date'))
+    status = application.get('status') or DEFAULT_STATUS
+    client = await db_stubs.get_user(application.get('user_id')) or {}
+    client_text = (f"Клиент: {client.get('full_name') or '—'}, {client.get('phone_number') or '—'}\n"
+                   f"ID пользователя: {application.get('user_id')}")
+
+    await callback.message.edit_text(
+        f"Детали заявки №{app_id}:\n\n{format_application_summary(summary_data)}\n"
+        f"Статус: {status}\n\n{client_text}",
+        reply_markup=admin_transfer_kb.get_application_details_keyboard(app_id, status)
+    )
+    await state.update_data(current_admin_application_id=app_id)  # Сохраняем ID для дальнейших действий
+    await state.set_state(AdminTransferFSM.editing_application)  # Переходим в состояние редактирования
+    return True
+
+
 @router.callback_query(AdminTransferFSM.viewing_applications, F.data.startswith('admin_view_app_'))
 async def admin_view_app_details(callback: CallbackQuery, state: FSMContext):
     if not is_admin(callback.from_user.id):
@@ -67,34 +96,28 @@ async def admin_view_app_details(callback: CallbackQuery, state: FSMContext):
         return
 
     app_id = int(callback.data.replace('admin_view_app_', ''))
+    if not await _show_application_details(callback, state, app_id):
+        await callback.answer(f"Заявка №{app_id} не найдена.", show_alert=True)
+        data = await state.get_data()
+        await _show_applications_page(callback, state, data.get('admin_apps_cursor'))
+        return
+    await callback.answer()
 
-    # TODO: Получить реальные данные заявки из БД по app_id
-    # Пока заглушка:
-    application_data = {
-        "id": app_id,
-        "event_name": "Гонка 'Золотые Колеса'",
-        "drop_off_point_name": "Точка на Ленина, 1",
-        "drop_off_date": "2025-07-10",
-        "drop_off_time": "10:00-12:00",
-        "pickup_point_name": "Привезём по вашему адресу",
-        "pickup_date": "2025-07-21",
-        "pickup_time": "10:00-18:00",
-        "pre_repair": True,
-        "pre_repair_comment": "Требуется замена покрышек и настройка переключателя.",
-        "full_name": "Тестовый Тест Тестович",
-        "phone_number": "+79001234567",
-        "status": "Новая"
-    }
-
-    summary_text = format_application_summary(application_data) + f"\nСтатус: {application_data['status']}"
 
-    await callback.message.edit_text(
-        f"Детали заявки №{app_id}:\n\n{summary_text}",
-        reply_markup=admin_transfer_kb.get_application_details_keyboard(app_id)
-    )
-    await state.update_data(current_admin_application_id=app_id)  # Сохраняем ID для дальнейших действий
-    await state.set_state(AdminTransferFSM.editing_application)  # Переходим в состояние редактирования
-    await callback.answer()
+# --- Смена статуса заявки ---
+@router.callback_query(AdminTransferFSM.editing_application, F.data.startswith(admin_transfer_kb.APP_STATUS_PREFIX))
+async def admin_set_application_status(callback: CallbackQuery, state: FSMContext):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("У вас нет прав доступа.", show_alert=True)
+        return
+
+    app_id, status_index = map(int, callback.data[len(admin_transfer_kb.APP_STATUS_PREFIX):].split('_'))
+    status = APPLICATION_STATUSES[status_index]
+    if not await db_stubs.set_application_status(app_id, status):
+        await callback.answer(f"Не удалось изменить статус заявки №{app_id}.", show_alert=True)
+        return
+    await _show_application_details(callback, state, app_id)
+    await callback.answer(f"Статус заявки №{app_id}: {status}")
 
 
 # --- Редактирование заявки (начало процесса) ---
@@ -138,27 +161,173 @@ async def admin_delete_application_execute(callback: CallbackQuery, state: FSMCo
         return
 
     app_id = int(callback.data.replace('admin_confirm_delete_app_', ''))
-    # TODO: Реальная логика удаления из БД
-    logger.info(f"ЗАГЛУШКА: Удаление заявки №{app_id} из БД.")
-    await callback.message.edit_text(f"Заявка №{app_id} успешно удалена.")
-    await state.set_state(AdminTransferFSM.transfer_management_menu)  # Возвращаемся в меню управления трансферами
-    await callback.answer()
+    # Удаление освобождает место в слоте и уменьшает счетчики сводки
+    deleted = await db_stubs.delete_application(app_id)
+    await callback.answer(f"Заявка №{app_id} удалена." if deleted else f"Заявка №{app_id} не найдена.",
+                          show_alert=not deleted)
+    # Возвращаемся на ту страницу списка, с которой открыли заявку
+    data = await state.get_data()
+    await _show_applications_page(callback, state, data.get('admin_apps_cursor'))
 
 
 # --- Возврат из деталей заявки к списку ---
 @router.callback_query(AdminTransferFSM.editing_application, F.data == 'back_to_admin_app_details')
+@router.callback_query(AdminTransferFSM.editing_application, F.data == 'back_to_admin_view_applications')
 @router.callback_query(AdminTransferFSM.deleting_application, F.data == 'back_to_admin_app_details')
 async def back_to_admin_app_details(callback: CallbackQuery, state: FSMContext):
     if not is_admin(callback.from_user.id):
         await callback.answer("У вас нет прав доступа.", show_alert=True)
         return
-    # Снова вызываем функцию просмотра списка, чтобы обновить клавиатуру
-    await admin_view_applications(callback, state)  # Возвращаем на текущую страницу списка
+    # Возвращаемся на ту страницу списка, с которой открыли заявку
+    data = await state.get_data()
+    await _show_applications_page(callback, state, data.get('admin_apps_cursor'))
+    await callback.answer()
+
+
+# --- Сводка по заявкам ---
+def _format_status_counts(by_status: dict) -> str:
+    return ", ".join(f"{status}: {count}" for status, count in sorted(by_status.items()))
+
+
+@router.callback_query(AdminTransferFSM.transfer_management_menu, F.data == 'admin_applications_dashboard')
+@router.callback_query(AdminTransferFSM.viewing_dashboard, F.data == 'admin_applications_dashboard')
+async def admin_applications_dashboard(callback: CallbackQuery, state: FSMContext):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("У вас нет прав доступа.", show_alert=True)
+        return
+
+    # Все цифры берутся из счетчиков db_stubs.application_stats, заявки не перебираются
+    registry = get_event_registry()
+    lines = []
+    events = []
+    for event_id in db_stubs.application_stats.event_ids():
+        event = registry.get_event(event_id)
+        event_name = (event or {}).get('name') or db_stubs.application_stats.event_name(event_id) or event_id
+        summary = db_stubs.get_applications_summary(event_id)
+        lines.append(f"{event_name}: всего {summary['total']}, с ремонтом {summary['pre_repair']}\n"
+                     f"    {_format_status_counts(summary['by_status'])}")
+        events.append((event_id, event_name))
+
+    text = "Сводка по заявкам:\n\n" + "\n".join(lines) if lines else "Заявок пока нет."
+    await callback.message.edit_text(text, reply_markup=admin_transfer_kb.get_dashboard_keyboard(events))
+    await state.set_state(AdminTransferFSM.viewing_dashboard)
+    await callback.answer()
+
+
+@router.callback_query(AdminTransferFSM.viewing_dashboard, F.data.startswith(admin_transfer_kb.DASHBOARD_EVENT_PREFIX))
+async def admin_dashboard_event(callback: CallbackQuery, state: FSMContext):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("У вас нет прав доступа.", show_alert=True)
+        return
+
+    event_id = callback.data[len(admin_transfer_kb.DASHBOARD_EVENT_PREFIX):]
+    event = get_event_registry().get_event(event_id)
+    event_name = (event or {}).get('name') or db_stubs.application_stats.event_name(event_id) or event_id
+    summary = db_stubs.get_applications_summary(event_id)
+
+    lines = [
+        f"{event_name}",
+        f"Всего заявок: {summary['total']}, с предварительным ремонтом: {summary['pre_repair']}",
+        f"По статусам: {_format_status_counts(summary['by_status'])}",
+        "",
+        "По точкам и датам:",
+    ]
+    for (point, date), count in sorted(summary['by_slot'].items()):
+        lines.append(f"{point}, {date}: {count}")
+
+    await callback.message.edit_text("\n".join(lines), reply_markup=admin_transfer_kb.get_dashboard_event_keyboard())
+    await callback.answer()
+
+
+# --- Рассылка расписания всем клиентам ---
+OPTION_TITLES = {"dropoff": "Прием велосипедов", "pickup": "Выдача велосипедов"}
+
+
+def _format_slot_rule(rule) -> str:
+    times = ", ".join(rule.times)
+    if rule.start == rule.end:
+        dates = rule.start.strftime('%d.%m')
+    elif rule.mode == SLOT_MODE_RANGE:
+        dates = f"{rule.start.strftime('%d.%m')} - {rule.end.strftime('%d.%m')}"
+    else:
+        dates = f"ежедневно с {rule.start.strftime('%d.%m')} по {rule.end.strftime('%d.%m')}"
+    return f"{dates} {times}".strip()
+
+
+def format_event_schedule(registry: EventRegistry, event_id: str) -> str:
+    """Текст рассылки: название события и правила слотов каждой точки (без разворачивания по дням)."""
+    event = registry.get_event(event_id) or {}
+    lines = [f"<b>Расписание трансфера: {event.get('name', event_id)}</b>"]
+    for option_type in OPTION_KEYS:
+        options = registry.get_options(event_id, option_type)
+        if not options:
+            continue
+        lines.append(f"\n<b>{OPTION_TITLES.get(option_type, option_type)}:</b>")
+        for point_index, option in options:
+            rules = registry.get_slot_rules(event_id, option_type, point_index)
+            lines.append(f"📍 {option.get('point_name', '')}")
+            lines.extend(f"    {_format_slot_rule(rule)}" for rule in rules)
+    return "\n".join(lines)
+
+
+@router.callback_query(AdminTransferFSM.transfer_management_menu, F.data == 'admin_broadcast_schedule')
+@router.callback_query(AdminTransferFSM.confirming_broadcast, F.data == 'admin_broadcast_schedule')
+async def admin_broadcast_schedule(callback: CallbackQuery, state: FSMContext):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("У вас нет прав доступа.", show_alert=True)
+        return
+
+    await callback.message.edit_text(
+        "Расписание какого события разослать всем клиентам?",
+        reply_markup=admin_transfer_kb.get_broadcast_events_keyboard(get_event_registry().events())
+    )
+    await state.set_state(AdminTransferFSM.choosing_broadcast_event)
+    await callback.answer()
+
+
+@router.callback_query(AdminTransferFSM.choosing_broadcast_event,
+                       F.data.startswith(admin_transfer_kb.BROADCAST_EVENT_PREFIX))
+async def admin_broadcast_preview(callback: CallbackQuery, state: FSMContext):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("У вас нет прав доступа.", show_alert=True)
+        return
+
+    event_id = callback.data[len(admin_transfer_kb.BROADCAST_EVENT_PREFIX):]
+    text = format_event_schedule(get_event_registry(), event_id)
+    await callback.message.edit_text(
+        f"Клиенты получат сообщение:\n\n{text}",
+        reply_markup=admin_transfer_kb.get_broadcast_confirm_keyboard()
+    )
+    await state.update_data(broadcast_event_id=event_id)
+    await state.set_state(AdminTransferFSM.confirming_broadcast)
+    await callback.answer()
+
+
+@router.callback_query(AdminTransferFSM.confirming_broadcast, F.data == 'admin_broadcast_confirm')
+async def admin_broadcast_confirm(callback: CallbackQuery, state: FSMContext, broadcaster: Broadcaster):
+    if not is_admin(callback.from_user.id):
+        await callback.answer("У вас нет прав доступа.", show_alert=True)
+        return
+
+    data = await state.get_data()
+    text = format_event_schedule(get_event_registry(), data.get('broadcast_event_id'))
+    # Рассылка идет в фоне; отчет о доставке придет этому админу отдельным сообщением
+    job = broadcaster.create(text, notify_chat_id=callback.from_user.id)
+    broadcaster.start(job, db_stubs.iter_client_id_chunks, db_stubs.io_executor.read)
+    logger.info(f"Админ {callback.from_user.id} запустил рассылку {job.job_id}.")
+
+    await callback.message.edit_text(
+        f"Рассылка {job.job_id} запущена. Отчет о доставке придет после завершения.",
+        reply_markup=admin_transfer_kb.get_admin_transfer_menu_keyboard()
+    )
+    await state.set_state(AdminTransferFSM.transfer_management_menu)
     await callback.answer()
 
 
 # --- Возврат к меню управления трансферами из списка заявок ---
 @router.callback_query(AdminTransferFSM.viewing_applications, F.data == 'back_to_admin_transfer_menu')
+@router.callback_query(AdminTransferFSM.viewing_dashboard, F.data == 'back_to_admin_transfer_menu')
+@router.callback_query(AdminTransferFSM.choosing_broadcast_event, F.data == 'back_to_admin_transfer_menu')
 async def back_to_admin_transfer_menu_from_viewing(callback: CallbackQuery, state: FSMContext):
     if not is_admin(callback.from_user.id):
         await callback.answer("У вас нет прав доступа.", show_alert=True)
@@ -1,35 +1,49 @@
 # bot_logic/admin/transfer/keyboards.py
 
+from typing import Optional
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from oldbot.bot_logic.utils.utils import _add_back_button
+from oldbot.database.application_index import APPLICATION_STATUSES
 
 
 def get_admin_transfer_menu_keyboard() -> InlineKeyboardMarkup:
     """Меню управления трансферами для админа."""
     builder = InlineKeyboardBuilder()
     builder.button(text="Посмотреть заявки 📋", callback_data="admin_view_applications")
+    builder.button(text="Сводка по заявкам 📊", callback_data="admin_applications_dashboard")
+    builder.button(text="Разослать расписание 📣", callback_data="admin_broadcast_schedule")
     builder.button(text="Создать событие ➕", callback_data="admin_create_event")
     # Добавьте другие кнопки, если нужны (редактирование, удаление событий и т.д.)
     _add_back_button(builder, callback_data="back_to_admin_main_menu")
+    builder.adjust(1)
     return builder.as_markup()
 
 
-def get_application_list_keyboard(applications: list, page: int = 0, items_per_page: int = 5) -> InlineKeyboardMarkup:
-    """Клавиатура для постраничного просмотра заявок."""
+# Префикс callback_data страницы списка заявок; после него идет курсор страницы
+APPS_PAGE_PREFIX = "admin_apps_page_"
+
+
+def get_application_list_keyboard(applications: list, next_cursor: Optional[str] = None,
+                                  prev_cursor: Optional[str] = None) -> InlineKeyboardMarkup:
+    """
+    Клавиатура одной страницы заявок (db_stubs.list_applications).
+    Кнопки навигации несут курсор соседней страницы в callback_data.
+    """
     builder = InlineKeyboardBuilder()
-    start_index = page * items_per_page
-    end_index = start_index + items_per_page
 
-    for i, app in enumerate(applications[start_index:end_index]):
-        builder.button(text=f"Заявка №{app['id']} ({app['full_name']})", callback_data=f"admin_view_app_{app['id']}")
+    for app in applications:
+        label = app.get('full_name') or app.get('event_name') or ''
+        builder.button(text=f"Заявка №{app['id']} ({label}) — {app['status']}",
+                       callback_data=f"admin_view_app_{app['id']}")
+    builder.adjust(1)
 
     # Кнопки навигации
     nav_buttons = []
-    if page > 0:
-        nav_buttons.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"admin_apps_page_{page - 1}"))
-    if end_index < len(applications):
-        nav_buttons.append(InlineKeyboardButton(text="Вперед ➡️", callback_data=f"admin_apps_page_{page + 1}"))
+    if prev_cursor:
+        nav_buttons.append(InlineKeyboardButton(text="⬅️ Назад", callback_data=f"{APPS_PAGE_PREFIX}{prev_cursor}"))
+    if next_cursor:
+        nav_buttons.append(InlineKeyboardButton(text="Вперед ➡️", callback_data=f"{APPS_PAGE_PREFIX}{next_cursor}"))
 
     if nav_buttons:
         builder.row(*nav_buttons)
@@ -38,11 +52,64 @@ def get_application_list_keyboard(applications: list, page: int = 0, items_per_p
     return builder.as_markup()
 
 
-def get_application_details_keyboard(application_id: int) -> InlineKeyboardMarkup:
+# Префикс callback_data смены статуса: admin_app_status_<ID заявки>_<номер статуса в APPLICATION_STATUSES>
+APP_STATUS_PREFIX = "admin_app_status_"
+
+
+def get_application_details_keyboard(application_id: int, current_status: Optional[str] = None) -> InlineKeyboardMarkup:
     """Клавиатура для действий с конкретной заявкой."""
-    buttons = [
+    status_buttons = [
+        InlineKeyboardButton(text=status, callback_data=f"{APP_STATUS_PREFIX}{application_id}_{index}")
+        for index, status in enumerate(APPLICATION_STATUSES) if status != current_status
+    ]
+    # Кнопки статусов — по две в ряд
+    buttons = [status_buttons[i:i + 2] for i in range(0, len(status_buttons), 2)]
+    buttons += [
         [InlineKeyboardButton(text="✏️ Редактировать", callback_data=f"admin_edit_app_{application_id}")],
         [InlineKeyboardButton(text="❌ Удалить", callback_data=f"admin_delete_app_{application_id}")],
         [InlineKeyboardButton(text="⬅️ Назад к списку", callback_data="back_to_admin_view_applications")]
     ]
-    return InlineKeyboardMarkup(inline_keyboard=buttons)
\ No newline at end of file
+    return InlineKeyboardMarkup(inline_keyboard=buttons)
+
+# Префикс callback_data сводки одного события; после него идет ID события
+DASHBOARD_EVENT_PREFIX = "admin_dashboard_event_"
+
+
+def get_dashboard_keyboard(events: list) -> InlineKeyboardMarkup:
+    """Сводка: кнопка на каждое событие с заявками. events — пары (ID события, название)."""
+    builder = InlineKeyboardBuilder()
+    for event_id, event_name in events:
+        builder.button(text=event_name, callback_data=f"{DASHBOARD_EVENT_PREFIX}{event_id}")
+    builder.adjust(1)
+    _add_back_button(builder, callback_data="back_to_admin_transfer_menu")
+    return builder.as_markup()
+
+
+def get_dashboard_event_keyboard() -> InlineKeyboardMarkup:
+    """Сводка события: возврат к списку событий."""
+    builder = InlineKeyboardBuilder()
+    _add_back_button(builder, callback_data="admin_applications_dashboard")
+    return builder.as_markup()
+
+
+# Префикс callback_data выбора события для рассылки; после него идет ID события
+BROADCAST_EVENT_PREFIX = "admin_broadcast_event_"
+
+
+def get_broadcast_events_keyboard(events: list) -> InlineKeyboardMarkup:
+    """Выбор события, расписание которого рассылается всем клиентам. events — события из реестра."""
+    builder = InlineKeyboardBuilder()
+    for event in events:
+        builder.button(text=event['name'], callback_data=f"{BROADCAST_EVENT_PREFIX}{event['id']}")
+    builder.adjust(1)
+    _add_back_button(builder, callback_data="back_to_admin_transfer_menu")
+    return builder.as_markup()
+
+
+def get_broadcast_confirm_keyboard() -> InlineKeyboardMarkup:
+    """Подтверждение рассылки."""
+    builder = InlineKeyboardBuilder()
+    builder.button(text="✅ Разослать всем клиентам", callback_data="admin_broadcast_confirm")
+    builder.adjust(1)
+    _add_back_button(builder, callback_data="admin_broadcast_schedule")
+    return builder.as_markup()
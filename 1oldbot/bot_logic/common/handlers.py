@@ -17,8 +17,6 @@ from oldbot.bot_logic.registration.fsm import RegistrationFSM
 from oldbot.bot_logic.common import keyboards as common_kb
 from oldbot.bot_logic.registration import keyboards as registration_kb
 
-# Import TRANSFER_CONFIG (если он нужен для общих сообщений, иначе удалить)
-
 # Imports for database
 from oldbot.database import db_stubs
 
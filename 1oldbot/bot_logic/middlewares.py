@@ -0,0 +1,107 @@
+# bot_logic/middlewares.py
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, Awaitable, Callable, Dict, Hashable, List
+from aiogram import BaseMiddleware
+from aiogram.fsm.storage.base import BaseEventIsolation, StorageKey
+from aiogram.types import CallbackQuery, TelegramObject
+
+logger = logging.getLogger(__name__)
+
+
+class UserEventIsolation(BaseEventIsolation):
+    """
+    Последовательная обработка апдейтов одного пользователя.
+
+    Передается в Dispatcher(events_isolation=...): aiogram берет блокировку до чтения
+    состояния FSM, поэтому второе нажатие "✅ Оформить" ждет окончания первого и видит
+    уже новое состояние, а не повторно создает заявку. Апдейты разных пользователей
+    друг друга не ждут.
+
+    Блокировка пользователя удаляется из таблицы, как только ее никто не держит и не ждет,
+    так что таблица не растет вместе с числом пользователей за все время работы.
+    """
+
+    def __init__(self):
+        # ключ пользователя -> [блокировка, сколько апдейтов ее держат или ждут]
+        self._locks: Dict[Hashable, List[Any]] = {}
+
+    @staticmethod
+    def _user_key(key: StorageKey) -> Hashable:
+        # Один пользователь в разных чатах тоже обрабатывается последовательно
+        return key.bot_id, key.user_id
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey) -> AsyncGenerator[None, None]:
+        user_key = self._user_key(key)
+        entry = self._locks.get(user_key)
+        if entry is None:
+            entry = self._locks[user_key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if entry[1] == 0:
+                del self._locks[user_key]
+
+    @property
+    def active_users(self) -> int:
+        return len(self._locks)
+
+    async def close(self) -> None:
+        self._locks.clear()
+
+
+class ConcurrencyLimitMiddleware(BaseMiddleware):
+    """
+    Ограничивает число апдейтов, которые обрабатываются одновременно.
+    Регистрируется на dp.update после FSM, поэтому место занимают только апдейты,
+    уже дождавшиеся своей очереди у пользователя.
+    """
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        async with self._semaphore:
+            return await handler(event, data)
+
+
+class CallbackDedupMiddleware(BaseMiddleware):
+    """
+    Отбрасывает повторную доставку одного и того же нажатия (тот же callback.id).
+    Такое бывает, когда Telegram повторяет webhook после таймаута или 503,
+    и при перезапуске бота. ID хранятся ttl секунд.
+    """
+
+    def __init__(self, ttl: float = 60.0):
+        self.ttl = ttl
+        self._seen: "OrderedDict[str, float]" = OrderedDict()
+
+    def _purge(self, now: float):
+        # ID добавляются по времени, поэтому просроченные всегда в начале
+        while self._seen:
+            callback_id, expires_at = next(iter(self._seen.items()))
+            if expires_at > now:
+                break
+            del self._seen[callback_id]
+
+    async def __call__(self, handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+                       event: TelegramObject, data: Dict[str, Any]) -> Any:
+        if not isinstance(event, CallbackQuery):
+            return await handler(event, data)
+
+        now = time.monotonic()
+        self._purge(now)
+        if event.id in self._seen:
+            logger.info(f"Повторный callback {event.id} от пользователя {event.from_user.id} пропущен.")
+            return None
+        self._seen[event.id] = now + self.ttl
+        return await handler(event, data)
@@ -0,0 +1,104 @@
+"""
+Сравнение старого формата слотов ("available_slots" — ключ на каждый день) с компактными
+правилами ("slots") на конфигурации целого сезона: размер config.json, время загрузки
+(json.load + EventRegistry) и память реестра.
+
+Запуск из папки bot_logic/transfer:
+    python benchmark_slots.py --events 40 --days 180
+"""
+import argparse
+import json
+import logging
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from registry import EventRegistry, OPTION_KEYS, SlotRule
+
+SEASON_START = datetime(2025, 5, 1)
+TIMES = ["11:00-20:00"]
+
+
+def build_season_config(events: int, days: int) -> dict:
+    """Сезонная конфигурация в компактном формате: у каждой точки интервал длиной days дней."""
+    config = {"admin_ids": [], "events": []}
+    for event_idx in range(events):
+        start = SEASON_START + timedelta(days=event_idx % 7)
+        end = start + timedelta(days=days - 1)
+        daily = SlotRule(start, end, TIMES).to_config()
+        ranged = SlotRule(start, start + timedelta(days=6), TIMES, mode="range").to_config()
+        config["events"].append({
+            "name": f"Событие {event_idx}",
+            "id": f"event_{event_idx}_2025",
+            "description": "",
+            "delivery_options": [
+                {"point_name": "Староватутинский пр. 12с13", "slots": [ranged]},
+                {"point_name": "ул. Крылатская д.10", "slots": [daily]},
+            ],
+            "pickup_options": [
+                {"point_name": "Выдача перед стартом", "slots": [daily]},
+                {"point_name": "ул. Крылатская д.10", "slots": [daily]},
+            ],
+        })
+    return config
+
+
+def to_legacy(config: dict) -> dict:
+    """Та же конфигурация в старом формате: правила развернуты в словарь по дням."""
+    legacy = json.loads(json.dumps(config))
+    for event in legacy["events"]:
+        for config_key in OPTION_KEYS.values():
+            for option in event.get(config_key, []):
+                rules = [SlotRule.from_config(data) for data in option.pop("slots")]
+                option["available_slots"] = {slot.key: slot.times for rule in rules for slot in rule.expand()}
+    return legacy
+
+
+def measure(title: str, text: str, repeats: int) -> dict:
+    started = time.perf_counter()
+    for _ in range(repeats):
+        EventRegistry(json.loads(text))
+    load_ms = (time.perf_counter() - started) / repeats * 1000
+
+    tracemalloc.start()
+    registry = EventRegistry(json.loads(text))
+    memory_kb = tracemalloc.get_traced_memory()[0] / 1024
+    tracemalloc.stop()
+
+    # Поиск слота по ключу из callback_data, как в хендлере выбора даты
+    keys = [(event["id"], slot.key) for event in registry.events()
+            for slot in registry.iter_slots(event["id"], "dropoff", 1)]
+    started = time.perf_counter()
+    for event_id, date_key in keys:
+        registry.get_slot(event_id, "dropoff", 1, date_key)
+    lookup_us = (time.perf_counter() - started) / max(len(keys), 1) * 1e6
+
+    size_kb = len(text.encode("utf-8")) / 1024
+    print(f"{title:<12} {size_kb:>10.1f} KB {load_ms:>10.2f} ms {memory_kb:>10.1f} KB {lookup_us:>8.2f} us")
+    return {"size": size_kb, "load": load_ms, "memory": memory_kb}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=40, help="число событий в сезоне")
+    parser.add_argument("--days", type=int, default=180, help="длина интервала приема/выдачи в днях")
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    compact = build_season_config(args.events, args.days)
+    legacy = to_legacy(compact)
+    # config.json пишется с indent=2, как в excel_parser.write_transfer_config
+    legacy_text = json.dumps(legacy, ensure_ascii=False, indent=2)
+    compact_text = json.dumps(compact, ensure_ascii=False, indent=2)
+
+    print(f"Событий: {args.events}, дней в интервале: {args.days}")
+    print(f"{'формат':<12} {'config.json':>13} {'загрузка':>13} {'память':>13} {'get_slot':>11}")
+    old = measure("available", legacy_text, args.repeats)
+    new = measure("slots", compact_text, args.repeats)
+    print(f"Размер меньше в {old['size'] / new['size']:.1f} раза, загрузка быстрее в "
+          f"{old['load'] / new['load']:.1f} раза, память реестра меньше в {old['memory'] / new['memory']:.1f} раза")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,13 @@
 # bot_logic/transfer/config.py
+import asyncio
 import json
+import logging
 import os
+import threading
+from typing import Callable, List, Optional, Tuple
+from oldbot.bot_logic.transfer.registry import EventRegistry, OPTION_KEYS, parse_slot_rules
+
+logger = logging.getLogger(__name__)
 
 # Получаем директорию текущего скрипта (config.py)
 # Поскольку config.json находится в той же папке, что и config.py,
@@ -8,19 +15,162 @@ import os
 current_script_dir = os.path.dirname(os.path.abspath(__file__))
 config_file_path = os.path.join(current_script_dir, 'config.json')
 
-# Переменная, которая будет хранить загруженную конфигурацию
-TRANSFER_CONFIG = {}
-
-try:
-    with open(config_file_path, 'r', encoding='utf-8') as f:
-        TRANSFER_CONFIG = json.load(f)
-    print(f"Конфигурация успешно загружена из: {config_file_path}") # Для отладки
-except FileNotFoundError:
-    print(f"ОШИБКА: Файл config.json не найден по пути: {config_file_path}. Убедитесь, что он существует.")
-    # Установите пустую или дефолтную конфигурацию в случае ошибки
-    TRANSFER_CONFIG = {"admin_ids": [], "events": []}
-except json.JSONDecodeError:
-    print(f"ОШИБКА: Неверный формат JSON в файле: {config_file_path}. Проверьте содержимое.")
-    TRANSFER_CONFIG = {"admin_ids": [], "events": []}
-
-# Теперь TRANSFER_CONFIG содержит данные из config.json и может быть импортирован другими модулями.
\ No newline at end of file
+EMPTY_CONFIG = {"admin_ids": [], "events": []}
+
+
+def validate_transfer_config(config) -> None:
+    """Проверяет структуру конфигурации трансферов. Бросает ValueError с описанием ошибки."""
+    if not isinstance(config, dict):
+        raise ValueError("корень config.json должен быть объектом")
+    if not isinstance(config.get('admin_ids', []), list):
+        raise ValueError("'admin_ids' должен быть списком")
+    _validate_capacity(config.get('default_slot_capacity'), "'default_slot_capacity'")
+    events = config.get('events')
+    if not isinstance(events, list):
+        raise ValueError("'events' должен быть списком")
+
+    seen_ids = set()
+    for event in events:
+        if not isinstance(event, dict) or 'id' not in event or 'name' not in event:
+            raise ValueError(f"у события нет 'id' или 'name': {str(event)[:100]}")
+        event_id = str(event['id'])
+        if event_id in seen_ids:
+            raise ValueError(f"повторяющийся id события '{event_id}'")
+        seen_ids.add(event_id)
+
+        for config_key in OPTION_KEYS.values():
+            for option in event.get(config_key, []):
+                if ('point_name' not in option or not isinstance(option.get('available_slots', {}), dict)
+                        or not isinstance(option.get('slots', []), list)):
+                    raise ValueError(f"некорректная точка в '{config_key}' события '{event_id}'")
+                _validate_capacity(option.get('capacity'), f"'capacity' точки '{option['point_name']}'")
+                try:
+                    parse_slot_rules(option)
+                except (KeyError, TypeError, ValueError) as e:
+                    raise ValueError(f"некорректный слот точки '{option['point_name']}' события '{event_id}': {e}")
+
+
+def _validate_capacity(value, name: str):
+    if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 0):
+        raise ValueError(f"{name} должен быть неотрицательным целым числом")
+
+
+class TransferConfigService:
+    """
+    Конфигурация трансферов с горячей перезагрузкой.
+
+    Сервис следит за mtime config.json. Новый файл читается и проверяется в отдельном
+    потоке, а затем конфигурация, реестр событий и версия подменяются одним присваиванием,
+    так что хендлеры никогда не видят половину старой и половину новой конфигурации.
+    Невалидный файл игнорируется: бот продолжает работать на последней валидной версии.
+    После подмены вызываются подписчики (например, сброс кэша клавиатур).
+    """
+
+    def __init__(self, file_path: str, poll_interval: float = 2.0):
+        self.file_path = file_path
+        self.poll_interval = poll_interval
+        self._state: Tuple[dict, EventRegistry] = (EMPTY_CONFIG, EventRegistry(EMPTY_CONFIG, version=0))
+        self._version = 0
+        self._file_stamp = None
+        self._subscribers: List[Callable[[int], None]] = []
+        self._apply_lock = threading.Lock()
+
+    @property
+    def config(self) -> dict:
+        return self._state[0]
+
+    @property
+    def registry(self) -> EventRegistry:
+        return self._state[1]
+
+    @property
+    def version(self) -> int:
+        return self.registry.version
+
+    def subscribe(self, callback: Callable[[int], None]):
+        """Регистрирует функцию, которая вызывается с новой версией после каждой подмены конфигурации."""
+        self._subscribers.append(callback)
+
+    # --- Чтение и подмена ---
+
+    def _stat_file(self):
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _read_if_changed(self, force: bool = False) -> Optional[Tuple[dict, tuple]]:
+        """Читает и проверяет файл, если он изменился. Возвращает (конфигурация, отметка файла) или None."""
+        stamp = self._stat_file()
+        if stamp is None:
+            if force:
+                logger.error(f"Файл config.json не найден по пути: {self.file_path}. Убедитесь, что он существует.")
+            return None
+        if not force and stamp == self._file_stamp:
+            return None
+
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+            validate_transfer_config(config)
+        except (OSError, ValueError) as e:
+            logger.error(f"Конфигурация {self.file_path} не применена, остается версия {self.version}: {e}")
+            # Запоминаем отметку, чтобы не разбирать тот же битый файл на каждой проверке
+            self._file_stamp = stamp
+            return None
+        return config, stamp
+
+    def _apply(self, config: dict, stamp: tuple) -> int:
+        with self._apply_lock:
+            self._version += 1
+            version = self._version
+            self._state = (config, EventRegistry(config, version=version))
+            self._file_stamp = stamp
+
+        logger.info(f"Конфигурация трансферов загружена из {self.file_path}, версия {version}.")
+        for callback in self._subscribers:
+            try:
+                callback(version)
+            except Exception as e:
+                logger.error(f"Ошибка подписчика конфигурации трансферов: {e}", exc_info=True)
+        return version
+
+    def reload(self, force: bool = False) -> bool:
+        """Синхронно перечитывает файл. Возвращает True, если применена новая версия."""
+        loaded = self._read_if_changed(force)
+        if loaded is None:
+            return False
+        self._apply(*loaded)
+        return True
+
+    async def watch(self):
+        """Фоновая задача: проверяет файл раз в poll_interval секунд и применяет изменения."""
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                loaded = await asyncio.to_thread(self._read_if_changed)
+                if loaded is not None:
+                    self._apply(*loaded)
+            except Exception as e:
+                logger.error(f"Ошибка при проверке {self.file_path}: {e}", exc_info=True)
+
+
+transfer_config_service = TransferConfigService(config_file_path)
+transfer_config_service.reload(force=True)
+
+
+def get_transfer_config() -> dict:
+    """Текущая конфигурация трансферов (содержимое config.json)."""
+    return transfer_config_service.config
+
+
+def get_event_registry() -> EventRegistry:
+    """Реестр событий текущей версии конфигурации."""
+    return transfer_config_service.registry
+
+
+def reload_transfer_config() -> int:
+    """Принудительно перечитывает config.json. Возвращает текущую версию."""
+    transfer_config_service.reload(force=True)
+    return transfer_config_service.version
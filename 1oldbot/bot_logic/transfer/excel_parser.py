@@ -1,8 +1,11 @@
 import openpyxl
+import hashlib
 import json
 import os
 import logging
-from datetime import datetime, timedelta
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
 import re
 
 # Настройка логирования
@@ -12,44 +15,99 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 EVENTS_SHEET_NAME = 'Текущие события'
 CONFIG_FILE_PATH = 'config.json'
 
+# Версия логики разбора: входит в хэши событий, при ее смене все события пересобираются
+PARSER_VERSION = 2
+
+# Словарь для маппинга названий строк на ключи в JSON
+KEY_MAPPING = {
+    'Внутреннее название события': 'description_raw',
+    'название, вид события': 'name',
+    'год договора': 'year',
+    'город в которы': 'city',
+    'даты/часы приема Староватутинский': 'starov_delivery',
+    'даты/часы приема день отъезда СтВат': 'starov_delivery_day_off',
+    'даты/часы приема Крыло': 'krylo_delivery',
+    'даты/часы приема день отъезда Крыло': 'krylo_delivery_day_off',
+    'даты/часы выдачи перед стартом': 'pre_start_pickup',
+    'даты/часы приема после финиша': 'post_finish_pickup',
+    'даты/часы выдачи Староватутинский': 'starov_pickup',
+    'даты/часы выдачи Крыло': 'krylo_pickup',
+}
+
+# Точки приема/выдачи: (название точки, ключ ячейки с датами и часами).
+# Даты и часы записаны в одной ячейке, например "27.05.2025 г. - 29.05.2025 г. с 11:00 до 20:00"
+DELIVERY_POINTS = [
+    ("Староватутинский пр. 12с13", 'starov_delivery'),
+    ("ул. Крылатская д.10", 'krylo_delivery'),
+    ("Староватутинский пр. 12с13 (день отъезда)", 'starov_delivery_day_off'),
+    ("ул. Крылатская д.10 (день отъезда)", 'krylo_delivery_day_off'),
+]
+PICKUP_POINTS = [
+    ("Выдача перед стартом", 'pre_start_pickup'),
+    ("Приём велосипеда после финиша", 'post_finish_pickup'),
+    ("Староватутинский пр. 12с13", 'starov_pickup'),
+    ("ул. Крылатская д.10", 'krylo_pickup'),
+]
+SCHEDULE_KEYS = {key for _, key in DELIVERY_POINTS + PICKUP_POINTS}
+
+# Регулярные выражения компилируются один раз при импорте модуля
+_DATE_RANGE_RE = re.compile(r'(\d{2})\.(\d{2})\.(\d{4}).*?(\d{2})\.(\d{2})\.(\d{4})')
+_DATE_RE = re.compile(r'(\d{2})\.(\d{2})\.(\d{4})')
+_TIME_RANGE_RE = re.compile(r'(\d{2}:\d{2})\s+до\s+(\d{2}:\d{2})')
+_TIME_RE = re.compile(r'(\d{2}:\d{2})')
+
+# Разобранная ячейка расписания: (даты 'YYYY-MM-DD', интервалы времени 'HH:MM-HH:MM')
+Schedule = Tuple[Tuple[str, ...], Tuple[str, ...]]
+
+
+@lru_cache(maxsize=4096)
+def _parse_dates(date_string: str) -> Tuple[str, ...]:
+    # Заменяем потенциальные ошибки форматирования
+    date_string = date_string.replace('г.', '').replace(';', '').strip()
+
+    # Дата собирается из групп регулярного выражения напрямую, без strptime
+    match = _DATE_RANGE_RE.search(date_string)
+    try:
+        if match:
+            d1, m1, y1, d2, m2, y2 = match.groups()
+            start_date = date(int(y1), int(m1), int(d1))
+            end_date = date(int(y2), int(m2), int(d2))
+            return tuple((start_date + timedelta(days=i)).isoformat()
+                         for i in range((end_date - start_date).days + 1))
+
+        single_date_match = _DATE_RE.search(date_string)
+        if single_date_match:
+            d, m, y = single_date_match.groups()
+            return (date(int(y), int(m), int(d)).isoformat(),)
+    except ValueError:
+        logging.error(f"Некорректный формат даты в строке: '{date_string}'. Пропускаю.")
+    return ()
+
+
+@lru_cache(maxsize=4096)
+def _parse_times(time_string: str) -> Tuple[str, ...]:
+    # Заменяем лишние символы для упрощения парсинга
+    time_string = time_string.replace(';', '').strip()
+
+    match = _TIME_RANGE_RE.search(time_string)
+    if match:
+        return (f"{match.group(1)}-{match.group(2)}",)
+
+    match_single = _TIME_RE.search(time_string)
+    if match_single:
+        return (f"{match_single.group(1)}-{match_single.group(1)}",)
+
+    return ()
+
 
 def _parse_date_range(date_string: str) -> list:
     """
     Разбивает строку с диапазоном дат (ДД.ММ.ГГГГ) на отдельные даты.
     Например, "27.05.2025 г. - 29.05.2025 г." -> ['2025-05-27', '2025-05-28', '2025-05-29']
     """
-    dates = []
     if not date_string:
-        return dates
-
-    # Заменяем потенциальные ошибки форматирования
-    date_string = date_string.replace('г.', '').replace(';', '').strip()
-
-    match = re.search(r'(\d{2}\.\d{2}\.\d{4}).*?(\d{2}\.\d{2}\.\d{4})', date_string)
-    if match:
-        start_date_str = match.group(1)
-        end_date_str = match.group(2)
-
-        try:
-            start_date = datetime.strptime(start_date_str, '%d.%m.%Y')
-            end_date = datetime.strptime(end_date_str, '%d.%m.%Y')
-        except ValueError:
-            logging.error(f"Некорректный формат даты в строке: '{date_string}'. Пропускаю.")
-            return dates
-
-        current_date = start_date
-        while current_date <= end_date:
-            dates.append(current_date.strftime('%Y-%m-%d'))
-            current_date += timedelta(days=1)
-    else:
-        single_date_match = re.search(r'(\d{2}\.\d{2}\.\d{4})', date_string)
-        if single_date_match:
-            try:
-                dates.append(datetime.strptime(single_date_match.group(1), '%d.%m.%Y').strftime('%Y-%m-%d'))
-            except ValueError:
-                logging.error(f"Некорректный формат даты в строке: '{date_string}'. Пропускаю.")
-
-    return dates
+        return []
+    return list(_parse_dates(date_string))
 
 
 def _parse_time_range(time_string: str) -> list:
@@ -59,21 +117,24 @@ def _parse_time_range(time_string: str) -> list:
     """
     if not time_string:
         return []
+    return list(_parse_times(time_string))
 
-    # Заменяем лишние символы для упрощения парсинга
-    time_string = time_string.replace(';', '').strip()
-
-    match = re.search(r'(\d{2}:\d{2})\s+до\s+(\d{2}:\d{2})', time_string)
-    if match:
-        start_time = match.group(1)
-        end_time = match.group(2)
-        return [f"{start_time}-{end_time}"]
-
-    match_single = re.search(r'(\d{2}:\d{2})', time_string)
-    if match_single:
-        return [f"{match_single.group(1)}-{match_single.group(1)}"]
 
-    return []
+def parse_schedules(values: Iterable) -> Dict[str, Schedule]:
+    """
+    Разбирает все ячейки расписания одним проходом.
+    Каждая уникальная строка разбирается один раз, повторы (в том числе между
+    запусками в одном процессе) берутся из кэша разобранных строк.
+    """
+    schedules = {}
+    for value in values:
+        if not value or value in schedules:
+            continue
+        if not isinstance(value, str):
+            logging.warning(f"Ячейка расписания '{value}' не является строкой. Пропускаю.")
+            continue
+        schedules[value] = (_parse_dates(value), _parse_times(value))
+    return schedules
 
 
 def _create_formatted_description(event_data: dict) -> str:
@@ -123,182 +184,272 @@ def _create_formatted_description(event_data: dict) -> str:
     return description.replace('  ', ' ')  # Убираем лишние пробелы
 
 
-def _create_available_slots(point_name: str, dates_str: str, times_str: str) -> dict:
+def _create_slots(point_name: str, parsed_dates: tuple, parsed_times: tuple) -> list:
     """
-    Создает словарь доступных слотов с особым исключением для "Староватутинский".
+    Создает компактные правила слотов точки (см. registry.SlotRule) с особым исключением для "Староватутинский".
+    Интервал дат записывается одним правилом, а не отдельным ключом на каждый день.
     """
-    if not dates_str or not times_str:
-        return {}
-
-    parsed_dates = _parse_date_range(dates_str)
-    parsed_times = _parse_time_range(times_str)
-
-    # Если даты или время не распарсились, возвращаем пустой словарь
+    # Если даты или время не распарсились, возвращаем пустой список
     if not parsed_dates or not parsed_times:
-        return {}
+        return []
 
-    # Специальная логика для Староватутинского - сохраняем как диапазон дат
-    # Используем 'Starov' для проверки, чтобы избежать проблем с русским текстом
+    # Поля со значениями по умолчанию (end = start, mode = "daily") не записываем
+    rule = {"start": parsed_dates[0], "times": list(parsed_times)}
+    if parsed_dates[-1] != parsed_dates[0]:
+        rule["end"] = parsed_dates[-1]
+    # Специальная логика для Староватутинского - один слот на весь диапазон дат,
+    # для всех остальных точек - слот на каждый день диапазона
     if "Староватутинский" in point_name:
-        date_range_string = f"{parsed_dates[0]} - {parsed_dates[-1]}"
-        return {date_range_string: parsed_times}
+        rule["mode"] = "range"
+    return [rule]
 
-    # Стандартная логика для всех остальных точек - один слот на каждый день
-    available_slots = {}
-    for date in parsed_dates:
-        available_slots[date] = parsed_times
 
-    return available_slots
+def read_event_columns(excel_file_path: str) -> Optional[List[tuple]]:
+    """
+    Читает лист "Текущие события" одним проходом в режиме read_only.
+    Возвращает список колонок: первая — названия полей, остальные — события
+    (нулевой элемент колонки события — ее заголовок). None, если листа нет.
+    """
+    workbook = openpyxl.load_workbook(excel_file_path, read_only=True, data_only=True)
+    try:
+        if EVENTS_SHEET_NAME not in workbook.sheetnames:
+            logging.error(f"Лист '{EVENTS_SHEET_NAME}' не найден в файле {excel_file_path}.")
+            return None
+        events_sheet = workbook[EVENTS_SHEET_NAME]
+        # Размеры листа в файле бывают записаны неверно, поэтому читаем строки до конца
+        events_sheet.reset_dimensions()
+        rows = list(events_sheet.iter_rows(values_only=True))
+    finally:
+        workbook.close()
+
+    if not rows:
+        return []
+    width = max(len(row) for row in rows)
+    # Строки разной длины дополняем до прямоугольника и транспонируем в колонки
+    return list(zip(*(row + (None,) * (width - len(row)) for row in rows)))
+
+
+def _map_event_fields(field_column: tuple) -> List[Tuple[int, str]]:
+    """Номера строк листа, которые попадают в данные события, и их ключи в JSON."""
+    fields = []
+    for row_idx in range(1, len(field_column)):
+        field_name = field_column[row_idx]
+        if isinstance(field_name, str):
+            json_key = KEY_MAPPING.get(field_name.strip())
+            if json_key:
+                fields.append((row_idx, json_key))
+    return fields
+
+
+def _extract_event_columns(columns: List[tuple]) -> List[Tuple[object, dict]]:
+    """Пары (заголовок колонки, данные события) для всех непустых колонок событий."""
+    if not columns:
+        return []
+    fields = _map_event_fields(columns[0])
+    if not fields:
+        return []
+    # Начинаем со второго столбца, так как первый столбец - это названия полей
+    return [(column[0], {key: column[row_idx] for row_idx, key in fields})
+            for column in columns[1:] if column[0]]
+
+
+def _event_id(event_name, event_data_map: dict) -> str:
+    # ИСПРАВЛЕНИЕ: Используем имя события из заголовка колонки для создания уникального ID
+    event_name_for_id = str(event_name).lower().replace(" ", "_").replace(":", "").replace("/", "")
+    return f"{event_name_for_id}_{event_data_map.get('year', '')}"
+
+
+def _event_hash(event_name, event_data_map: dict) -> str:
+    """Хэш содержимого колонки события. Включает PARSER_VERSION, чтобы смена логики разбора пересобирала все."""
+    payload = json.dumps([PARSER_VERSION, str(event_name), event_data_map],
+                         ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def build_event(event_name, event_data_map: dict, schedules: Dict[str, Schedule]) -> dict:
+    """Собирает событие для config.json из данных колонки и разобранных ячеек расписания."""
+    def options(points):
+        result = []
+        for point_name, key in points:
+            parsed_dates, parsed_times = schedules.get(event_data_map.get(key), ((), ()))
+            slots = _create_slots(point_name, parsed_dates, parsed_times)
+            # Пустые опции не добавляем
+            if slots:
+                result.append({"point_name": point_name, "slots": slots})
+        return result
+
+    return {
+        "name": event_data_map.get('name', ''),
+        "id": _event_id(event_name, event_data_map),
+        # Генерируем красивое описание
+        "description": _create_formatted_description(event_data_map),
+        "delivery_options": options(DELIVERY_POINTS),
+        "pickup_options": options(PICKUP_POINTS),
+    }
+
+
+def _build_event_list(event_columns: List[Tuple[object, dict]]) -> List[dict]:
+    # Ячейки расписания всех пересобираемых событий разбираются одним пакетом
+    schedules = parse_schedules(event_data_map.get(key)
+                                for _, event_data_map in event_columns
+                                for key in SCHEDULE_KEYS)
+    return [build_event(event_name, event_data_map, schedules) for event_name, event_data_map in event_columns]
+
+
+def build_events(columns: List[tuple]) -> List[dict]:
+    """Собирает все события листа. Ячейки расписания всех событий разбираются одним пакетом."""
+    return _build_event_list(_extract_event_columns(columns))
+
+
+class ConfigDiff:
+    """Отчет об изменениях конфигурации после пересборки: ID добавленных, измененных и удаленных событий."""
+
+    def __init__(self):
+        self.added: List[str] = []
+        self.changed: List[str] = []
+        self.removed: List[str] = []
+        self.unchanged = 0
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+    def __str__(self):
+        lines = [f"добавлено {len(self.added)}, изменено {len(self.changed)}, "
+                 f"удалено {len(self.removed)}, без изменений {self.unchanged}"]
+        for title, ids in (("+", self.added), ("~", self.changed), ("-", self.removed)):
+            lines.extend(f"  {title} {event_id}" for event_id in ids)
+        return "\n".join(lines)
 
 
-def update_transfer_config(excel_file_path: str, config_file_path: str):
+def _hashes_path(config_file_path: str) -> str:
+    return f"{config_file_path}.hashes.json"
+
+
+def _load_json(path: str, default):
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+    except ValueError as e:
+        logging.warning(f"Файл {path} поврежден ({e}), он будет пересоздан.")
+        return default
+
+
+def _write_json_atomic(path: str, data):
+    # Пишем во временный файл и подменяем целиком: работающий бот следит за config.json
+    # и не должен увидеть его недописанным
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, path)
+
+
+# Ключи верхнего уровня, которые задаются вручную и переносятся из старого config.json при пересборке
+PRESERVED_CONFIG_KEYS = ("admin_ids", "default_slot_capacity")
+OPTION_LISTS = ("delivery_options", "pickup_options")
+
+
+def write_transfer_config(config_file_path: str, events: List[dict], admin_ids: Optional[list] = None,
+                          old_config: Optional[dict] = None):
+    """
+    Записывает config.json. admin_ids и default_slot_capacity, если не переданы,
+    сохраняются из old_config (по умолчанию — из старого файла).
+    """
+    if old_config is None:
+        old_config = _load_json(config_file_path, {})
+    config = {key: old_config[key] for key in PRESERVED_CONFIG_KEYS if key in old_config}
+    # Сохраняем или обновляем admin_ids из старого конфига
+    config["admin_ids"] = admin_ids if admin_ids is not None else old_config.get("admin_ids", [])
+    config["events"] = events
+    _write_json_atomic(config_file_path, config)
+
+
+def _keep_point_capacities(event: dict, old_event: Optional[dict]):
+    """Переносит заданную вручную вместимость точек (capacity) из старой версии события."""
+    if not old_event:
+        return
+    for options_key in OPTION_LISTS:
+        capacities = {option.get('point_name'): option['capacity']
+                      for option in old_event.get(options_key, []) if 'capacity' in option}
+        for option in event.get(options_key, []):
+            if option['point_name'] in capacities:
+                option['capacity'] = capacities[option['point_name']]
+
+
+def regenerate_config(columns: List[tuple], config_file_path: str, full: bool = False) -> ConfigDiff:
+    """
+    Инкрементально пересобирает config.json по колонкам листа.
+
+    Рядом с конфигурацией хранится файл <config>.hashes.json с хэшем содержимого каждой
+    колонки-события. Заново разбираются только колонки с новым хэшем, остальные события
+    берутся из текущего config.json как есть, поэтому стоимость пересборки пропорциональна
+    правке, а не числу событий. Если ничего не изменилось, файл не перезаписывается.
+    full=True пересобирает все события.
+    """
+    old_config = _load_json(config_file_path, {})
+    old_events = {event.get('id'): event for event in old_config.get('events', [])}
+    old_hashes = {} if full else _load_json(_hashes_path(config_file_path), {})
+
+    diff = ConfigDiff()
+    new_hashes = {}
+    events: List[Optional[dict]] = []
+    to_build: List[Tuple[int, object, dict]] = []
+    for event_name, event_data_map in _extract_event_columns(columns):
+        event_id = _event_id(event_name, event_data_map)
+        content_hash = _event_hash(event_name, event_data_map)
+        # Колонки с одинаковым ID нельзя различить по хэшу, их всегда пересобираем
+        if (event_id not in new_hashes and old_hashes.get(event_id) == content_hash
+                and event_id in old_events):
+            events.append(old_events[event_id])
+            diff.unchanged += 1
+        else:
+            (diff.changed if event_id in old_events else diff.added).append(event_id)
+            to_build.append((len(events), event_name, event_data_map))
+            events.append(None)
+        new_hashes[event_id] = content_hash
+
+    built = _build_event_list([(event_name, event_data_map) for _, event_name, event_data_map in to_build])
+    for (position, _, _), event in zip(to_build, built):
+        _keep_point_capacities(event, old_events.get(event['id']))
+        events[position] = event
+
+    new_ids = {event['id'] for event in events}
+    diff.removed = [event_id for event_id in old_events if event_id not in new_ids]
+
+    # Порядок событий тоже часть конфигурации: перестановка колонок без правок — тоже изменение
+    order_changed = [event['id'] for event in events] != list(old_events)
+    if diff.has_changes or order_changed or not os.path.exists(config_file_path):
+        write_transfer_config(config_file_path, events, old_config=old_config)
+    if new_hashes != old_hashes:
+        _write_json_atomic(_hashes_path(config_file_path), new_hashes)
+    return diff
+
+
+def update_transfer_config(excel_file_path: str, config_file_path: str, full: bool = False) -> Optional[ConfigDiff]:
     """
     Обновляет JSON-конфигурацию бота, считывая данные из Excel-файла
     используя новый формат таблицы с несколькими событиями.
+    Лист читается один раз, пересобираются только изменившиеся события.
+    Возвращает отчет об изменениях или None при ошибке.
     """
     logging.info("Начинаю обновление конфигурации бота из Excel.")
 
     try:
-        workbook = openpyxl.load_workbook(excel_file_path, data_only=True)
-        if EVENTS_SHEET_NAME not in workbook.sheetnames:
-            logging.error(f"Лист '{EVENTS_SHEET_NAME}' не найден в файле {excel_file_path}.")
-            return
+        columns = read_event_columns(excel_file_path)
+        if columns is None:
+            return None
 
-        events_sheet = workbook[EVENTS_SHEET_NAME]
-
-        # Получаем заголовки (названия событий) из первой строки
-        headers = [cell.value for cell in events_sheet[1]]
-
-        # Словарь для маппинга названий строк на ключи в JSON
-        key_mapping = {
-            'Внутреннее название события': 'description_raw',
-            'название, вид события': 'name',
-            'год договора': 'year',
-            'город в которы': 'city',
-            'даты/часы приема Староватутинский': 'starov_delivery',
-            'даты/часы приема день отъезда СтВат': 'starov_delivery_day_off',
-            'даты/часы приема Крыло': 'krylo_delivery',
-            'даты/часы приема день отъезда Крыло': 'krylo_delivery_day_off',
-            'даты/часы выдачи перед стартом': 'pre_start_pickup',
-            'даты/часы приема после финиша': 'post_finish_pickup',
-            'даты/часы выдачи Староватутинский': 'starov_pickup',
-            'даты/часы выдачи Крыло': 'krylo_pickup',
-        }
-
-        new_events = []
-        # Начинаем итерацию со второго столбца (индекс 1), так как первый столбец - это названия полей
-        for col_idx in range(1, len(headers)):
-            event_name = headers[col_idx]
-            if not event_name:
-                continue
-
-            event_data_map = {}
-            for row in events_sheet.iter_rows(min_row=2):
-                field_name = row[0].value
-                field_value = row[col_idx].value
-
-                if field_name:
-                    json_key = key_mapping.get(field_name.strip(), None)
-                    if json_key:
-                        event_data_map[json_key] = field_value
-
-            if not event_data_map:
-                continue
-
-            # ИСПРАВЛЕНИЕ: Используем имя события из заголовка колонки для создания уникального ID
-            event_name_for_id = event_name.lower().replace(" ", "_").replace(":", "").replace("/", "")
-            event_year = event_data_map.get('year', '')
-            event_id = f"{event_name_for_id}_{event_year}"
-
-            event_json = {
-                "name": event_data_map.get('name', ''),
-                "id": event_id,
-                # Генерируем красивое описание
-                "description": _create_formatted_description(event_data_map),
-                "delivery_options": [
-                    {
-                        "point_name": "Староватутинский пр. 12с13",
-                        # Используем новую вспомогательную функцию для создания слотов
-                        "available_slots": _create_available_slots("Староватутинский пр. 12с13",
-                                                                   event_data_map.get('starov_delivery', ''),
-                                                                   event_data_map.get('starov_delivery', ''))
-                    },
-                    {
-                        "point_name": "ул. Крылатская д.10",
-                        "available_slots": _create_available_slots("ул. Крылатская д.10",
-                                                                   event_data_map.get('krylo_delivery', ''),
-                                                                   event_data_map.get('krylo_delivery', ''))
-                    },
-                    # Добавляем новые точки, если в них есть данные
-                    {
-                        "point_name": "Староватутинский пр. 12с13 (день отъезда)",
-                        "available_slots": _create_available_slots("Староватутинский пр. 12с13 (день отъезда)",
-                                                                   event_data_map.get('starov_delivery_day_off', ''),
-                                                                   event_data_map.get('starov_delivery_day_off', ''))
-                    },
-                    {
-                        "point_name": "ул. Крылатская д.10 (день отъезда)",
-                        "available_slots": _create_available_slots("ул. Крылатская д.10 (день отъезда)",
-                                                                   event_data_map.get('krylo_delivery_day_off', ''),
-                                                                   event_data_map.get('krylo_delivery_day_off', ''))
-                    }
-                ],
-                "pickup_options": [
-                    {
-                        "point_name": "Выдача перед стартом",
-                        "available_slots": _create_available_slots("Выдача перед стартом",
-                                                                   event_data_map.get('pre_start_pickup', ''),
-                                                                   event_data_map.get('pre_start_pickup', ''))
-                    },
-                    {
-                        "point_name": "Приём велосипеда после финиша",
-                        "available_slots": _create_available_slots("Приём велосипеда после финиша",
-                                                                   event_data_map.get('post_finish_pickup', ''),
-                                                                   event_data_map.get('post_finish_pickup', ''))
-                    },
-                    {
-                        "point_name": "Староватутинский пр. 12с13",
-                        "available_slots": _create_available_slots("Староватутинский пр. 12с13",
-                                                                   event_data_map.get('starov_pickup', ''),
-                                                                   event_data_map.get('starov_pickup', ''))
-                    },
-                    {
-                        "point_name": "ул. Крылатская д.10",
-                        "available_slots": _create_available_slots("ул. Крылатская д.10",
-                                                                   event_data_map.get('krylo_pickup', ''),
-                                                                   event_data_map.get('krylo_pickup', ''))
-                    },
-                ]
-            }
-            # Удаляем пустые опции
-            event_json["delivery_options"] = [opt for opt in event_json["delivery_options"] if opt["available_slots"]]
-            event_json["pickup_options"] = [opt for opt in event_json["pickup_options"] if opt["available_slots"]]
-
-            new_events.append(event_json)
-
-        new_config = {
-            "admin_ids": [],
-            "events": new_events
-        }
-
-        # Сохраняем или обновляем admin_ids из старого конфига
-        if os.path.exists(config_file_path):
-            with open(config_file_path, 'r', encoding='utf-8') as f:
-                old_config = json.load(f)
-                new_config["admin_ids"] = old_config.get("admin_ids", [])
-
-        with open('config2.json', 'w', encoding='utf-8') as f:
-            json.dump(new_config, f, ensure_ascii=False, indent=2)
-
-        logging.info("Конфигурация бота успешно обновлена.")
+        diff = regenerate_config(columns, config_file_path, full=full)
+        logging.info(f"Конфигурация бота успешно обновлена: {diff}")
+        return diff
 
     except FileNotFoundError:
         logging.error(f"Файл Excel '{excel_file_path}' не найден.")
     except Exception as e:
         logging.error(f"Произошла ошибка при обработке файла: {e}")
-    finally:
-        if 'workbook' in locals():
-            workbook.close()
+    return None
 
 
 def main():
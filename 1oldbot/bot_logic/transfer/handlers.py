@@ -22,9 +22,10 @@ from oldbot.bot_logic.registration import keyboards as registration_kb
 
 # Импорты для базы данных
 from oldbot.database import db_stubs
+from oldbot.database.slot_capacity import SlotFullError
 
 # Импорт конфигурации трансфера
-from oldbot.bot_logic.transfer.config import TRANSFER_CONFIG as config
+from oldbot.bot_logic.transfer.config import get_event_registry
 
 # Импорт утилит
 from oldbot.bot_logic.utils.utils import format_application_summary
@@ -36,39 +37,21 @@ logger = logging.getLogger(__name__)
 # Вспомогательная функция для получения данных события/точки
 def get_event_data(event_id: str):
     """Возвращает словарь с данными события по его ID."""
-    if not config or 'events' not in config:
-        logger.error("TRANSFER_CONFIG или ключ 'events' не найден. Проверьте config.json и config.py")
-        return None
-    for event in config['events']:
-        # Убедимся, что сравниваем строки, чтобы избежать проблем с типами
-        if str(event.get('id')) == str(event_id):
-            return event
-    logger.warning(f"Событие с ID '{event_id}' не найдено в конфигурации TRANSFER_CONFIG.")
-    return None
-
-
-def get_option_data(event_data: dict, option_type: str, point_index: int):
+    event = get_event_registry().get_event(event_id)
+    if event is None:
+        logger.warning(f"Событие с ID '{event_id}' не найдено в реестре событий (config.json).")
+    return event
+
+
+def get_option_data(event_id: str, option_type: str, point_index: int):
     """
     Возвращает словарь с данными точки (сдачи или получения) по типу и индексу.
-    Исправлена ошибка KeyError, связанная с несоответствием названия ключей в config.json
-    (drop_off_options вместо dropoff_options).
+    Тип "dropoff" соответствует ключу delivery_options в config.json (см. registry.OPTION_KEYS).
     """
-    actual_option_key = ""
-    if option_type == "dropoff":
-        actual_option_key = "drop_off_options"  # Правильный ключ из config.json
-    elif option_type == "pickup":
-        actual_option_key = "pickup_options"  # Правильный ключ из config.json
-    else:
-        logger.error(f"Неизвестный тип опции: {option_type}")
-        return None
-
-    try:
-        # Теперь используем правильный ключ actual_option_key
-        return event_data[actual_option_key][point_index]
-    except (IndexError, KeyError) as e:
-        logger.error(f"Ошибка получения опции '{option_type}' по индексу {point_index} из данных события, "
-                     f"используя ключ '{actual_option_key}': {e}", exc_info=True)
-        return None
+    option = get_event_registry().get_option(event_id, option_type, point_index)
+    if option is None:
+        logger.error(f"Опция '{option_type}' с индексом {point_index} не найдена для события '{event_id}'.")
+    return option
 
 
 # --- ОБРАБОТЧИК КНОПКИ "Подать заявку на трансфер" (ИЗ ГЛАВНОГО МЕНЮ) ---
@@ -79,15 +62,16 @@ async def start_transfer_flow(callback: CallbackQuery, state: FSMContext):
     selected_event_id = None
     event_description = "Выберите событие из списка ниже, чтобы увидеть его описание."
 
-    if config and 'events' in config and config['events']:
+    events = get_event_registry().events()
+    if events:
         # Если есть события, выбираем первое по умолчанию
-        first_event = config['events'][0]
+        first_event = events[0]
         selected_event_id = first_event.get('id')
         event_description = first_event.get('description', event_description)
         logger.debug(f"Первое событие в конфиге: ID={selected_event_id}, Описание: {event_description[:50]}...")
     else:
         event_description = "В данный момент нет доступных событий для трансфера. Пожалуйста, попробуйте позже."
-        logger.warning("Нет доступных событий в TRANSFER_CONFIG.events.")
+        logger.warning("Нет доступных событий в реестре событий (config.json).")
 
     # Сохраняем выбранное событие в состояние (для дальнейшего использования и для галочки)
     await state.update_data(selected_event_id=selected_event_id)
@@ -256,7 +240,7 @@ async def process_combined_point_date_choice(callback: CallbackQuery, state: FSM
         await state.set_state(TransferFSM.choosing_event)  # Возвращаем на выбор события
         return
 
-    selected_point = get_option_data(event_data, option_type, point_index)
+    selected_point = get_option_data(event_id, option_type, point_index)
     if not selected_point:
         logger.error(f"Точка '{point_index}' типа '{option_type}' не найдена для события '{event_id}'.")
         await callback.answer("Ошибка: точка сдачи/получения не найдена.", show_alert=True)
@@ -274,7 +258,8 @@ async def process_combined_point_date_choice(callback: CallbackQuery, state: FSM
     )
     logger.debug(f"Сохранено в FSM: point_name='{selected_point['point_name']}', date='{selected_date}'")
 
-    available_times = selected_point['available_slots'].get(selected_date, [])
+    selected_slot = get_event_registry().get_slot(event_id, option_type, point_index, selected_date)
+    available_times = selected_slot.times if selected_slot else []
     logger.debug(f"Доступные времена для {selected_date}: {available_times}")
 
     if not available_times:
@@ -508,8 +493,18 @@ async def confirm_application(update: Message | CallbackQuery, state: FSMContext
     user_id = update.from_user.id
     user_data = await state.get_data()
 
+    # Вместимость выбранного слота берется из config.json ("capacity" точки или "default_slot_capacity")
+    slot_capacity = get_event_registry().get_capacity(
+        user_data.get('event_id'), user_data.get('current_option_type'), user_data.get('selected_point_index'))
+
     # Здесь должна быть логика сохранения заявки в БД и генерации договора
-    application_id = await db_stubs.create_application(user_id, user_data)  # Имитация сохранения
+    try:
+        application_id = await db_stubs.create_application(user_id, user_data, slot_capacity=slot_capacity)
+    except SlotFullError:
+        logger.info(f"Слот {user_data.get('selected_date')} точки {user_data.get('selected_point_name')} "
+                    f"заполнен, пользователь {user_id} выбирает другую дату.")
+        await _offer_another_slot(update, state, user_data)
+        return
     # TODO: Добавить логику генерации Word-договора и отправки его в чат
     # Пока просто сообщение о завершении
 
@@ -538,6 +533,22 @@ async def confirm_application(update: Message | CallbackQuery, state: FSMContext
     await state.set_state(CommonFSM.main_menu)  # Возвращаемся в главное меню
 
 
+async def _offer_another_slot(update: Message | CallbackQuery, state: FSMContext, user_data: dict):
+    """Места в выбранном слоте закончились: возвращаем пользователя к выбору места и даты."""
+    await state.update_data(selected_date=None, selected_time=None)
+    text_to_send = (
+        "😔 На выбранную дату места закончились, пока вы оформляли заявку.\n"
+        f"Пожалуйста, выберите другое место или дату сдачи для события <b>{user_data.get('event_name', '')}</b>:"
+    )
+    reply_markup = transfer_kb.get_combined_point_date_keyboard(user_data.get('event_id'))
+    if isinstance(update, CallbackQuery):
+        await update.message.edit_text(text_to_send, parse_mode="HTML", reply_markup=reply_markup)
+        await update.answer()
+    else:
+        await update.answer(text_to_send, parse_mode="HTML", reply_markup=reply_markup)
+    await state.set_state(TransferFSM.choosing_combined_point_date)
+
+
 # Отдельная функция для показа сводки, которая может быть вызвана из разных мест
 # Принимает либо CallbackQuery, либо Message
 async def show_final_summary(update: Message | CallbackQuery, state: FSMContext):
@@ -3,12 +3,37 @@
 from aiogram.types import InlineKeyboardButton, InlineKeyboardMarkup
 from aiogram.utils.keyboard import InlineKeyboardBuilder
 from oldbot.bot_logic.utils.utils import _add_back_button # Убедитесь, что _add_back_button доступна
-from .config import TRANSFER_CONFIG # Импортируем из локального config.py
-from datetime import datetime # Для сортировки и форматирования дат
+from .config import get_event_registry, transfer_config_service # Реестр событий из локального config.py
+from oldbot.database.db_stubs import slot_tracker
 import logging # Добавим логирование
 
 logger = logging.getLogger(__name__)
 
+# Готовые клавиатуры, зависящие только от конфигурации и аргументов.
+# Кэш действует в пределах одной версии конфигурации и сбрасывается при ее перезагрузке.
+_keyboard_cache = {}
+_keyboard_cache_version = None
+
+
+def _cached_keyboard(key: tuple, build):
+    """Возвращает клавиатуру (или то, что строит build()) из кэша, строя ее при первом обращении."""
+    global _keyboard_cache_version
+    version = get_event_registry().version
+    if version != _keyboard_cache_version:
+        _keyboard_cache.clear()
+        _keyboard_cache_version = version
+
+    markup = _keyboard_cache.get(key)
+    if markup is None:
+        markup = build()
+        _keyboard_cache[key] = markup
+    return markup
+
+
+# Старые клавиатуры освобождаем сразу после загрузки новой конфигурации
+transfer_config_service.subscribe(lambda version: _keyboard_cache.clear())
+
+
 # --- Клавиатуры для флоу трансфера ---
 
 def get_events_keyboard(selected_event_id: str = None) -> InlineKeyboardMarkup:
@@ -16,12 +41,20 @@ def get_events_keyboard(selected_event_id: str = None) -> InlineKeyboardMarkup:
     Возвращает клавиатуру для выбора события с галочкой и кнопками Назад/Далее.
     :param selected_event_id: ID выбранного события, чтобы поставить галочку.
     """
+    # Неизвестный ID не ставит галочку, поэтому не плодим под него отдельные записи кэша
+    registry = get_event_registry()
+    selected_key = str(selected_event_id) if registry.get_event(selected_event_id) else None
+    return _cached_keyboard(("events", selected_key), lambda: _build_events_keyboard(selected_key))
+
+
+def _build_events_keyboard(selected_event_id: str = None) -> InlineKeyboardMarkup:
     builder = InlineKeyboardBuilder()
-    if not TRANSFER_CONFIG or 'events' not in TRANSFER_CONFIG:
-        logger.error("TRANSFER_CONFIG или ключ 'events' не найден в keyboards.py.")
+    events = get_event_registry().events()
+    if not events:
+        logger.error("В реестре событий нет событий (проверьте config.json).")
         return InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="Нет доступных событий", callback_data="no_events")]])
 
-    for event in TRANSFER_CONFIG['events']:
+    for event in events:
         button_text = f"✅ {event['name']}" if str(event.get('id')) == str(selected_event_id) else event['name']
         builder.row(InlineKeyboardButton(text=button_text, callback_data=f"select_event_{event['id']}"))
 
@@ -40,26 +73,35 @@ def get_combined_point_date_keyboard(event_id: str, add_back_button: bool = True
     Возвращает клавиатуру для выбора места сдачи/получения и даты в одном шаге.
     Кнопки будут иметь формат "ДД.ММ [Краткое название точки]" или "ДД.ММ - ДД.ММ [Краткое название точки]".
     """
-    builder = InlineKeyboardBuilder()
-    event_data = None
-    if not TRANSFER_CONFIG or 'events' not in TRANSFER_CONFIG:
-        logger.error("TRANSFER_CONFIG или ключ 'events' не найден в keyboards.py для combined keyboard.")
+    registry = get_event_registry()
+    if not registry.events():
+        logger.error("В реестре событий нет событий (проверьте config.json) для combined keyboard.")
         return InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="Нет доступных опций", callback_data="no_options_config_error")]])
 
-    for event in TRANSFER_CONFIG['events']:
-        if str(event.get('id')) == str(event_id): # Убедимся, что сравниваем строки
-            event_data = event
-            break
-
-    if not event_data:
+    if not registry.get_event(event_id):
         logger.error(f"Событие с ID '{event_id}' не найдено в конфигурации для get_combined_point_date_keyboard.")
         return InlineKeyboardMarkup(inline_keyboard=[[InlineKeyboardButton(text="Нет доступных опций", callback_data="no_options_event_not_found")]])
 
+    # Кэшируется одна клавиатура на событие со всеми слотами; заполненные слоты
+    # отфильтровываются при каждом показе по счетчикам мест
+    markup, options = _cached_keyboard(
+        ("combined_point_date", str(event_id), add_back_button),
+        lambda: _build_combined_point_date_keyboard(str(event_id), add_back_button),
+    )
+    full = {option['callback_data'] for option in options
+            if option['capacity'] and slot_tracker.count(option['slot_key']) >= option['capacity']}
+    if not full:
+        return markup
+    return _combined_markup([option for option in options if option['callback_data'] not in full], add_back_button)
+
+
+def _build_combined_point_date_keyboard(event_id: str, add_back_button: bool):
+    """Клавиатура со всеми слотами сдачи события и описание ее кнопок (для фильтра заполненных слотов)."""
+    registry = get_event_registry()
     all_combined_options = []
 
-    # Добавляем опции сдачи
-    drop_off_options = event_data.get('delivery_options', []) # ИСПРАВЛЕНИЕ: Используем 'delivery_options' вместо 'drop_off_options'
-    for point_idx, point in enumerate(drop_off_options):
+    # Добавляем опции сдачи; правила слотов уже разобраны реестром
+    for point_idx, point in registry.get_options(event_id, "dropoff"):
         point_name_short = point['point_name'].split('(')[0].strip() # Берем только часть до скобок
         if "Староватутинский" in point_name_short:
             point_name_short = "Староватутинский пр-д 12с13"
@@ -67,55 +109,28 @@ def get_combined_point_date_keyboard(event_id: str, add_back_button: bool = True
             point_name_short = "Крылатская д.10, Велотрек"
         elif "по вашему адресу" in point_name_short:
             point_name_short = "Доставка"
-
-        for date_str, times in point['available_slots'].items():
-            if times: # Убедимся, что есть доступные слоты на эту дату
-                try:
-                    # ИСПРАВЛЕНИЕ: Новая логика для обработки одного диапазона дат
-                    if " - " in date_str:
-                        # Обрабатываем диапазон дат
-                        start_date_str, end_date_str = date_str.split(' - ')
-                        formatted_text = (
-                            f"{datetime.strptime(start_date_str, '%Y-%m-%d').strftime('%d.%m')} - "
-                            f"{datetime.strptime(end_date_str, '%Y-%m-%d').strftime('%d.%m')} "
-                            f"{point_name_short}"
-                        )
-                    else:
-                        # Обрабатываем одиночную дату, как и раньше
-                        formatted_text = f"{datetime.strptime(date_str, '%Y-%m-%d').strftime('%d.%m')} {point_name_short}"
-
-                    all_combined_options.append({
-                        "text": formatted_text,
-                        "callback_data": f"select_combined_dropoff_{event_id}_{point_idx}_{date_str}"
-                    })
-                except ValueError as ve:
-                    logger.error(f"Ошибка форматирования даты '{date_str}' в config.json для события {event_id}, точки {point_idx}: {ve}")
-                    continue
-
-    # Сортируем опции по дате для лучшей читаемости
-    def sort_key(option):
-        try:
-            full_callback_data = option['callback_data']
-            # Извлекаем дату, используя rsplit('_', 1) для надежного получения последней части
-            date_part_from_callback = full_callback_data.rsplit('_', 1)[1]
-
-            # ИСПРАВЛЕНИЕ: Теперь мы можем получать либо одиночную дату, либо диапазон.
-            # Для сортировки нам нужна только начальная дата диапазона.
-            if " - " in date_part_from_callback:
-                date_part_from_callback = date_part_from_callback.split(' - ')[0]
-
-            return datetime.strptime(date_part_from_callback, "%Y-%m-%d")
-        except (ValueError, IndexError) as e:
-            logger.error(f"sort_key: Ошибка парсинга даты из callback_data '{option['callback_data']}': {e}", exc_info=True)
-            return datetime(1900, 1, 1)
-        except Exception as e:
-            logger.error(f"sort_key: Неожиданная ошибка при сортировке из callback_data '{option['callback_data']}': {e}", exc_info=True)
-            return datetime(1900, 1, 1)
-
-    all_combined_options.sort(key=sort_key)
-
-
-    for option in all_combined_options:
+        capacity = registry.get_capacity(event_id, "dropoff", point_idx)
+
+        # Дни разворачиваются из компактных правил прямо при переборе
+        for slot in registry.iter_slots(event_id, "dropoff", point_idx):
+            # Убедимся, что есть доступные слоты на эту дату
+            if slot.times:
+                all_combined_options.append({
+                    "text": f"{slot.label()} {point_name_short}",
+                    "callback_data": f"select_combined_dropoff_{event_id}_{point_idx}_{slot.key}",
+                    "start": slot.start,
+                    "slot_key": (event_id, point['point_name'], slot.key),
+                    "capacity": capacity,
+                })
+
+    # Сортируем опции по дате начала слота для лучшей читаемости
+    all_combined_options.sort(key=lambda option: option['start'])
+    return _combined_markup(all_combined_options, add_back_button), all_combined_options
+
+
+def _combined_markup(options: list, add_back_button: bool) -> InlineKeyboardMarkup:
+    builder = InlineKeyboardBuilder()
+    for option in options:
         builder.button(text=option['text'], callback_data=option['callback_data'])
 
     builder.adjust(1) # Кнопки в один столбец для лучшей читаемости
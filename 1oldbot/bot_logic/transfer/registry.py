@@ -0,0 +1,271 @@
+# bot_logic/transfer/registry.py
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DATE_FORMAT = '%Y-%m-%d'
+DATE_RANGE_SEPARATOR = ' - '
+
+# Режимы компактного правила слотов
+SLOT_MODE_DAILY = "daily"
+SLOT_MODE_RANGE = "range"
+SLOT_MODES = (SLOT_MODE_DAILY, SLOT_MODE_RANGE)
+
+# Тип опции в callback_data -> ключ списка точек в config.json
+OPTION_KEYS = {
+    "dropoff": "delivery_options",
+    "pickup": "pickup_options",
+}
+
+
+class Slot:
+    """
+    Слот точки приема/выдачи: ключ даты из config.json ("2025-05-27" или
+    "2025-05-27 - 2025-05-29"), разобранные даты начала/конца и интервалы времени.
+    """
+    __slots__ = ('key', 'start', 'end', 'times')
+
+    def __init__(self, key: str, times: list, start: Optional[datetime] = None, end: Optional[datetime] = None):
+        self.key = key
+        if start is None:
+            parts = key.split(DATE_RANGE_SEPARATOR)
+            start = datetime.strptime(parts[0], DATE_FORMAT)
+            end = datetime.strptime(parts[-1], DATE_FORMAT)
+        self.start = start
+        self.end = end if end is not None else start
+        self.times = list(times)
+
+    @property
+    def is_range(self) -> bool:
+        return self.start != self.end
+
+    def label(self) -> str:
+        """Дата для кнопки: "ДД.ММ" или "ДД.ММ - ДД.ММ"."""
+        if self.is_range:
+            return f"{self.start.strftime('%d.%m')} - {self.end.strftime('%d.%m')}"
+        return self.start.strftime('%d.%m')
+
+
+class SlotRule:
+    """
+    Компактное описание слотов точки: интервал дат, интервалы времени и исключения.
+
+    В config.json записывается в списке "slots" точки:
+    {"start": "2025-05-27", "end": "2025-05-29", "times": ["11:00-20:00"], "mode": "daily", "except": ["2025-05-28"]}
+    "end" по умолчанию равен "start", "mode" — "daily", "except" — пустой.
+    mode "daily" — отдельный слот на каждый день интервала, кроме дат из "except";
+    mode "range" — один слот на весь интервал (например, прием на Староватутинском).
+    Дни разворачиваются в Slot только по запросу, поиск слота по ключу идет без разворачивания.
+    """
+    __slots__ = ('start', 'end', 'times', 'mode', 'exceptions')
+
+    def __init__(self, start: datetime, end: datetime, times: list, mode: str = SLOT_MODE_DAILY,
+                 exceptions: Iterable[datetime] = ()):
+        if mode not in SLOT_MODES:
+            raise ValueError(f"неизвестный mode слота '{mode}'")
+        if end < start:
+            raise ValueError(f"конец интервала {end:%Y-%m-%d} раньше начала {start:%Y-%m-%d}")
+        self.start = start
+        self.end = end
+        self.times = list(times)
+        self.mode = mode
+        self.exceptions = frozenset(exceptions)
+
+    @classmethod
+    def from_config(cls, data: dict) -> 'SlotRule':
+        """Правило из элемента списка "slots". ValueError, если даты или mode некорректны."""
+        start = datetime.strptime(data['start'], DATE_FORMAT)
+        end = datetime.strptime(data.get('end', data['start']), DATE_FORMAT)
+        times = data.get('times', [])
+        if not isinstance(times, list):
+            raise ValueError("'times' должен быть списком")
+        exceptions = [datetime.strptime(day, DATE_FORMAT) for day in data.get('except', [])]
+        return cls(start, end, times, data.get('mode', SLOT_MODE_DAILY), exceptions)
+
+    @classmethod
+    def from_legacy(cls, date_key: str, times: list) -> 'SlotRule':
+        """Правило из старого формата "available_slots": {"2025-05-27 - 2025-05-29": [...]}"""
+        slot = Slot(date_key, times)
+        # Ключ с разделителем остается одним слотом, даже если начало и конец совпадают
+        mode = SLOT_MODE_RANGE if DATE_RANGE_SEPARATOR in date_key else SLOT_MODE_DAILY
+        return cls(slot.start, slot.end, slot.times, mode)
+
+    def to_config(self) -> dict:
+        # Значения по умолчанию (end = start, mode = daily) не записываем
+        data = {"start": self.start.strftime(DATE_FORMAT), "times": self.times}
+        if self.end != self.start:
+            data["end"] = self.end.strftime(DATE_FORMAT)
+        if self.mode != SLOT_MODE_DAILY:
+            data["mode"] = self.mode
+        if self.exceptions:
+            data["except"] = sorted(day.strftime(DATE_FORMAT) for day in self.exceptions)
+        return data
+
+    @property
+    def days(self) -> int:
+        return (self.end - self.start).days + 1
+
+    def expand(self) -> Iterator[Slot]:
+        """Слоты правила по порядку дат."""
+        if self.mode == SLOT_MODE_RANGE:
+            key = f"{self.start.strftime(DATE_FORMAT)}{DATE_RANGE_SEPARATOR}{self.end.strftime(DATE_FORMAT)}"
+            yield Slot(key, self.times, self.start, self.end)
+            return
+        for offset in range(self.days):
+            day = self.start + timedelta(days=offset)
+            if day not in self.exceptions:
+                yield Slot(day.strftime(DATE_FORMAT), self.times, day, day)
+
+    def find(self, start: datetime, end: datetime, is_range_key: bool) -> Optional[Slot]:
+        """Слот по разобранному ключу даты (см. parse_date_key) или None, если ключ не из этого правила."""
+        if self.mode == SLOT_MODE_RANGE:
+            if is_range_key and start == self.start and end == self.end:
+                return next(self.expand())
+            return None
+        if not is_range_key and self.start <= start <= self.end and start not in self.exceptions:
+            return Slot(start.strftime(DATE_FORMAT), self.times, start, start)
+        return None
+
+    def extend_with(self, rule: 'SlotRule') -> bool:
+        """Присоединяет следующий день с теми же часами. Возвращает False, если правила не склеиваются."""
+        if (self.mode != SLOT_MODE_DAILY or rule.mode != SLOT_MODE_DAILY or rule.days != 1
+                or rule.start != self.end + timedelta(days=1) or rule.times != self.times):
+            return False
+        self.end = rule.end
+        return True
+
+
+def parse_date_key(date_key: str) -> Optional[Tuple[datetime, datetime, bool]]:
+    """Ключ даты из callback_data -> (начало, конец, ключ диапазона ли) или None, если ключ не разбирается."""
+    parts = date_key.split(DATE_RANGE_SEPARATOR)
+    try:
+        return (datetime.strptime(parts[0], DATE_FORMAT), datetime.strptime(parts[-1], DATE_FORMAT),
+                len(parts) == 2)
+    except ValueError:
+        return None
+
+
+def merge_daily_rules(rules: List[SlotRule]) -> List[SlotRule]:
+    """Склеивает идущие подряд однодневные правила с одинаковыми часами (старый формат по дням)."""
+    merged: List[SlotRule] = []
+    for rule in rules:
+        if not merged or not merged[-1].extend_with(rule):
+            merged.append(rule)
+    return merged
+
+
+def parse_slot_rules(option: dict) -> List[SlotRule]:
+    """
+    Правила слотов точки из config.json. Понимает и компактный список "slots",
+    и старый словарь "available_slots" с отдельным ключом на каждый день.
+    """
+    rules = [SlotRule.from_config(data) for data in option.get('slots', [])]
+    rules.extend(merge_daily_rules([SlotRule.from_legacy(date_key, times)
+                                    for date_key, times in option.get('available_slots', {}).items()]))
+    return rules
+
+
+class EventRegistry:
+    """
+    Индексы по конфигурации трансферов, построенные один раз при загрузке config.json.
+    Хендлеры и клавиатуры ищут события, точки и слоты по ключу, а не перебором списков.
+    version — версия конфигурации, по которой зависимые кэши понимают, что их пора сбросить.
+    """
+
+    def __init__(self, config: dict, version: int = 0):
+        self.config = config or {}
+        self.version = version
+        self._events: List[dict] = []
+        self._by_id: Dict[str, dict] = {}
+        self._options: Dict[Tuple[str, str, int], dict] = {}
+        self._option_lists: Dict[Tuple[str, str], List[Tuple[int, dict]]] = {}
+        # Слоты хранятся компактными правилами и разворачиваются по дням только по запросу
+        self._slot_rules: Dict[Tuple[str, str, int], List[SlotRule]] = {}
+
+        for event in self.config.get('events', []):
+            self._index_event(event)
+        logger.info(f"Реестр событий построен: событий {len(self._events)}, точек {len(self._options)}")
+
+    def _index_event(self, event: dict):
+        event_id = str(event.get('id'))
+        self._events.append(event)
+        self._by_id[event_id] = event
+
+        for option_type, config_key in OPTION_KEYS.items():
+            options = []
+            for point_index, option in enumerate(event.get(config_key, [])):
+                key = (event_id, option_type, point_index)
+                options.append((point_index, option))
+                self._options[key] = option
+                self._slot_rules[key] = self._parse_slot_rules(event_id, option_type, point_index, option)
+            self._option_lists[(event_id, option_type)] = options
+
+    @staticmethod
+    def _parse_slot_rules(event_id: str, option_type: str, point_index: int, option: dict) -> List[SlotRule]:
+        # Некорректное правило пропускается, остальные слоты точки остаются доступны
+        rules, legacy_rules = [], []
+        items = [(data, SlotRule.from_config, rules) for data in option.get('slots', [])]
+        items += [((date_str, times), lambda item: SlotRule.from_legacy(*item), legacy_rules)
+                  for date_str, times in option.get('available_slots', {}).items()]
+        for data, parse, target in items:
+            try:
+                target.append(parse(data))
+            except (KeyError, TypeError, ValueError) as e:
+                logger.error(f"Ошибка формата слота {data} в config.json для события {event_id}, "
+                             f"точки {option_type}/{point_index}: {e}")
+        # Старый формат хранит каждый день отдельно; в памяти подряд идущие дни становятся одним правилом
+        return rules + merge_daily_rules(legacy_rules)
+
+    # --- Поиск ---
+
+    @property
+    def admin_ids(self) -> list:
+        return self.config.get('admin_ids', [])
+
+    def events(self) -> List[dict]:
+        """События в порядке config.json."""
+        return self._events
+
+    def get_event(self, event_id) -> Optional[dict]:
+        return self._by_id.get(str(event_id))
+
+    def get_options(self, event_id, option_type: str) -> List[Tuple[int, dict]]:
+        """Точки события заданного типа вместе с их индексами."""
+        return self._option_lists.get((str(event_id), option_type), [])
+
+    def get_option(self, event_id, option_type: str, point_index: int) -> Optional[dict]:
+        return self._options.get((str(event_id), option_type, point_index))
+
+    def get_capacity(self, event_id, option_type: str, point_index: int) -> Optional[int]:
+        """
+        Сколько заявок вмещает один слот точки: "capacity" точки или общий "default_slot_capacity".
+        None или 0 — без ограничения.
+        """
+        option = self.get_option(event_id, option_type, point_index)
+        if option is None:
+            return None
+        return option.get('capacity', self.config.get('default_slot_capacity'))
+
+    def get_slot_rules(self, event_id, option_type: str, point_index: int) -> List[SlotRule]:
+        return self._slot_rules.get((str(event_id), option_type, point_index), [])
+
+    def iter_slots(self, event_id, option_type: str, point_index: int) -> Iterator[Slot]:
+        """Слоты точки, развернутые из правил по мере перебора."""
+        for rule in self.get_slot_rules(event_id, option_type, point_index):
+            yield from rule.expand()
+
+    def get_slots(self, event_id, option_type: str, point_index: int) -> List[Slot]:
+        return list(self.iter_slots(event_id, option_type, point_index))
+
+    def get_slot(self, event_id, option_type: str, point_index: int, date_key: str) -> Optional[Slot]:
+        """Слот по ключу даты из callback_data. Правила проверяются без разворачивания по дням."""
+        parsed_key = parse_date_key(date_key)
+        if parsed_key is None:
+            return None
+        for rule in self.get_slot_rules(event_id, option_type, point_index):
+            slot = rule.find(*parsed_key)
+            if slot is not None:
+                return slot
+        return None
@@ -48,4 +48,4 @@ def format_application_summary(user_data: dict) -> str:
         else:
             summary_parts.append(f"<b>Предварительный ремонт:</b> {hbold('Нет')}")
 
-    return "\\n".join(summary_parts)
+    return "\n".join(summary_parts)
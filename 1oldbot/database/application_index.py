@@ -0,0 +1,159 @@
+# database/application_index.py
+import bisect
+import logging
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from oldbot.database.journal import OP_CREATE, OP_DELETE, OP_STATUS
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STATUS = "Новая"
+# Статусы, которые админ выставляет заявке; порядковый номер статуса передается в callback_data
+APPLICATION_STATUSES = (DEFAULT_STATUS, "Подтверждена", "Выполнена", "Отменена")
+
+# Поля заявки, которые хранит индекс: хватает для строки списка, полная заявка читается по ID
+SUMMARY_FIELDS = ("id", "user_id", "timestamp", "event_id", "event_name", "point_name",
+                  "selected_date", "selected_time", "status")
+
+# Направление курсора: "a" — заявки старше курсора (следующая страница), "b" — новее (предыдущая)
+CURSOR_OLDER = "a"
+CURSOR_NEWER = "b"
+
+
+def encode_cursor(direction: str, app_id: int) -> str:
+    """Курсор для callback_data: направление и ID граничной заявки, например 'a1234'."""
+    return f"{direction}{app_id}"
+
+
+def decode_cursor(cursor: Optional[str]) -> Tuple[str, Optional[int]]:
+    """(направление, ID) из курсора. Пустой или испорченный курсор — первая страница."""
+    if cursor and cursor[0] in (CURSOR_OLDER, CURSOR_NEWER) and cursor[1:].isdigit():
+        return cursor[0], int(cursor[1:])
+    return CURSOR_OLDER, None
+
+
+class ApplicationPage:
+    """Страница списка заявок от новых к старым и курсоры соседних страниц (None, если их нет)."""
+
+    def __init__(self, items: List[Dict[str, Any]], next_cursor: Optional[str],
+                 prev_cursor: Optional[str], total: int):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+
+
+class ApplicationIndex:
+    """
+    Индекс заявок для постраничного просмотра.
+
+    Как и SlotCapacityTracker, восстанавливается по журналу через replay() и дальше меняется
+    вместе с каждой записью в журнал. Для каждого фильтра (событие, статус), включая
+    "без фильтра", хранится отсортированный список ID. ID заявок растут со временем, поэтому
+    страница — это срез этого списка по бинарному поиску от ID-курсора (keyset-пагинация):
+    стоимость страницы не зависит от номера страницы и не требует перебора всех заявок.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[int, Dict[str, Any]] = {}
+        # (event_id или None, статус или None) -> ID заявок по возрастанию
+        self._ids: Dict[Tuple[Optional[str], Optional[str]], List[int]] = {}
+
+    def replay(self, records: Iterable[dict]):
+        """Восстанавливает индекс по записям журнала (создания, надгробия и смены статуса)."""
+        with self._lock:
+            self._entries.clear()
+            self._ids.clear()
+            for record in records:
+                op = record.get('op')
+                if op == OP_CREATE:
+                    self._add(record.get('id'), record.get('data') or {})
+                elif op == OP_DELETE:
+                    self._remove(record.get('id'))
+                elif op == OP_STATUS:
+                    self._set_status(record.get('id'), (record.get('data') or {}).get('status'))
+        logger.info(f"Индекс заявок восстановлен по журналу: заявок {len(self._entries)}")
+
+    @staticmethod
+    def _filter_keys(entry: Dict[str, Any]):
+        event_id = str(entry['event_id']) if entry.get('event_id') is not None else None
+        status = entry['status']
+        keys = [(None, None), (None, status)]
+        if event_id is not None:
+            keys += [(event_id, None), (event_id, status)]
+        return keys
+
+    def _add(self, app_id, data: dict):
+        # Курсоры сравнивают ID как числа; заявки db_stubs всегда получают числовой ID
+        if not isinstance(app_id, int):
+            return
+        self._remove(app_id)
+        entry = {field: data.get(field) for field in SUMMARY_FIELDS}
+        entry['id'] = app_id
+        # В старых заявках название точки записано в поле 'date', статуса нет
+        entry['point_name'] = entry['point_name'] or data.get('date')
+        entry['status'] = entry['status'] or DEFAULT_STATUS
+        self._entries[app_id] = entry
+        for key in self._filter_keys(entry):
+            ids = self._ids.setdefault(key, [])
+            if not ids or ids[-1] < app_id:
+                ids.append(app_id)
+            else:
+                bisect.insort(ids, app_id)
+
+    def _remove(self, app_id) -> bool:
+        entry = self._entries.pop(app_id, None)
+        if entry is None:
+            return False
+        for key in self._filter_keys(entry):
+            ids = self._ids[key]
+            del ids[bisect.bisect_left(ids, app_id)]
+            if not ids:
+                del self._ids[key]
+        return True
+
+    def _set_status(self, app_id, status: Optional[str]) -> bool:
+        entry = self._entries.get(app_id)
+        if entry is None or not status:
+            return False
+        self._add(app_id, dict(entry, status=status))
+        return True
+
+    def add(self, app_id, data: dict):
+        with self._lock:
+            self._add(app_id, data)
+
+    def set_status(self, app_id, status: str) -> bool:
+        with self._lock:
+            return self._set_status(app_id, status)
+
+    def get(self, app_id) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(app_id)
+            return dict(entry) if entry is not None else None
+
+    def remove(self, app_id) -> bool:
+        with self._lock:
+            return self._remove(app_id)
+
+    def page(self, event_id: Optional[str] = None, status: Optional[str] = None,
+             cursor: Optional[str] = None, limit: int = 10) -> ApplicationPage:
+        """Страница заявок после курсора (от новых к старым) с учетом фильтров."""
+        direction, cursor_id = decode_cursor(cursor)
+        key = (str(event_id) if event_id is not None else None, status)
+        with self._lock:
+            ids = self._ids.get(key, [])
+            if direction == CURSOR_NEWER:
+                start = bisect.bisect_right(ids, cursor_id)
+                end = min(start + limit, len(ids))
+            else:
+                end = len(ids) if cursor_id is None else bisect.bisect_left(ids, cursor_id)
+                start = max(end - limit, 0)
+            chunk = ids[start:end][::-1]
+            items = [dict(self._entries[app_id]) for app_id in chunk]
+            total = len(ids)
+
+        next_cursor = encode_cursor(CURSOR_OLDER, chunk[-1]) if chunk and start > 0 else None
+        prev_cursor = encode_cursor(CURSOR_NEWER, chunk[0]) if chunk and end < total else None
+        return ApplicationPage(items, next_cursor, prev_cursor, total)
@@ -0,0 +1,148 @@
+# database/application_stats.py
+import itertools
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+from oldbot.database.application_index import DEFAULT_STATUS
+from oldbot.database.journal import OP_CREATE, OP_DELETE, OP_STATUS
+
+logger = logging.getLogger(__name__)
+
+# (точка, дата, статус); None в любой позиции — "все значения"
+CounterKey = Tuple[Optional[str], Optional[str], Optional[str]]
+
+
+class ApplicationStats:
+    """
+    Счетчики заявок по событию × точка × дата × статус и число заявок с предварительным ремонтом.
+
+    Как SlotCapacityTracker и ApplicationIndex, восстанавливаются по журналу через replay()
+    и дальше меняются вместе с каждой записью в журнал (создание, удаление, смена статуса).
+    Для заявки увеличиваются счетчики всех 8 сочетаний (точка | все) × (дата | все) × (статус | все),
+    поэтому любой запрос вида "сколько заявок на 27-е на Крылатской" — один поиск в словаре.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # ID события -> (точка, дата, статус) -> число заявок
+        self._counts: Dict[str, Dict[CounterKey, int]] = {}
+        # ID события -> число заявок с предварительным ремонтом
+        self._pre_repair: Dict[str, int] = {}
+        self._event_names: Dict[str, str] = {}
+        # ID заявки -> (событие, точка, дата, статус, нужен ли ремонт)
+        self._applications: Dict[Any, Tuple[str, str, str, str, bool]] = {}
+
+    def replay(self, records: Iterable[dict]):
+        """Восстанавливает счетчики по записям журнала."""
+        with self._lock:
+            self._counts.clear()
+            self._pre_repair.clear()
+            self._event_names.clear()
+            self._applications.clear()
+            for record in records:
+                op = record.get('op')
+                if op == OP_CREATE:
+                    self._add(record.get('id'), record.get('data') or {})
+                elif op == OP_DELETE:
+                    self._remove(record.get('id'))
+                elif op == OP_STATUS:
+                    self._set_status(record.get('id'), (record.get('data') or {}).get('status'))
+        logger.info(f"Счетчики заявок восстановлены по журналу: заявок {len(self._applications)}")
+
+    def _apply(self, entry: Tuple[str, str, str, str, bool], delta: int):
+        event_id, point, date, status, pre_repair = entry
+        counts = self._counts.setdefault(event_id, {})
+        # set(): при пустой точке или дате сочетания совпадают, а заявка считается один раз
+        for key in set(itertools.product((point, None), (date, None), (status, None))):
+            counts[key] = counts.get(key, 0) + delta
+            if not counts[key]:
+                del counts[key]
+        if pre_repair:
+            self._pre_repair[event_id] = self._pre_repair.get(event_id, 0) + delta
+            if not self._pre_repair[event_id]:
+                del self._pre_repair[event_id]
+        if not counts:
+            del self._counts[event_id]
+
+    def _add(self, app_id, data: dict):
+        event_id = data.get('event_id')
+        if app_id is None or event_id is None:
+            return
+        self._remove(app_id)
+        event_id = str(event_id)
+        if data.get('event_name'):
+            self._event_names[event_id] = data['event_name']
+        # В старых заявках название точки записано в поле 'date', статуса нет
+        entry = (event_id, data.get('point_name') or data.get('date'), data.get('selected_date'),
+                 data.get('status') or DEFAULT_STATUS, bool(data.get('pre_repair')))
+        self._applications[app_id] = entry
+        self._apply(entry, 1)
+
+    def _remove(self, app_id) -> bool:
+        entry = self._applications.pop(app_id, None)
+        if entry is None:
+            return False
+        self._apply(entry, -1)
+        return True
+
+    def _set_status(self, app_id, status: Optional[str]) -> bool:
+        entry = self._applications.get(app_id)
+        if entry is None or not status:
+            return False
+        self._apply(entry, -1)
+        entry = entry[:3] + (status,) + entry[4:]
+        self._applications[app_id] = entry
+        self._apply(entry, 1)
+        return True
+
+    def add(self, app_id, data: dict):
+        with self._lock:
+            self._add(app_id, data)
+
+    def remove(self, app_id) -> bool:
+        with self._lock:
+            return self._remove(app_id)
+
+    def set_status(self, app_id, status: str) -> bool:
+        with self._lock:
+            return self._set_status(app_id, status)
+
+    # --- Запросы ---
+
+    def count(self, event_id, point: Optional[str] = None, date: Optional[str] = None,
+              status: Optional[str] = None) -> int:
+        """Число заявок события; point, date и status сужают выборку (None — без фильтра)."""
+        return self._counts.get(str(event_id), {}).get((point, date, status), 0)
+
+    def pre_repair_count(self, event_id) -> int:
+        return self._pre_repair.get(str(event_id), 0)
+
+    def event_ids(self) -> list:
+        with self._lock:
+            return list(self._counts)
+
+    def event_name(self, event_id) -> Optional[str]:
+        return self._event_names.get(str(event_id))
+
+    def event_summary(self, event_id) -> Dict[str, Any]:
+        """
+        Сводка события: всего, по статусам, с ремонтом и по слотам (точка, дата) -> число заявок.
+        Перебирает только счетчики события (их столько, сколько занятых слотов), а не заявки.
+        """
+        event_id = str(event_id)
+        with self._lock:
+            counts = dict(self._counts.get(event_id, {}))
+            pre_repair = self._pre_repair.get(event_id, 0)
+        by_status = {}
+        by_slot = {}
+        for (point, date, status), value in counts.items():
+            if point is None and date is None and status is not None:
+                by_status[status] = value
+            elif point is not None and date is not None and status is None:
+                by_slot[(point, date)] = value
+        return {
+            "total": counts.get((None, None, None), 0),
+            "by_status": by_status,
+            "by_slot": by_slot,
+            "pre_repair": pre_repair,
+        }
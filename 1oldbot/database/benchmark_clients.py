@@ -0,0 +1,111 @@
+"""
+Сравнение прежнего и текущего доступа к базе клиентов (clients_excel_db.py) на большом листе:
+поиск пользователя (get_user) и обновление профиля (create_or_update_user).
+
+Прежние реализации приведены ниже как эталон: полная загрузка книги с объектами всех ячеек
+и поиск заголовка перебором маппинга для каждого поля.
+
+Запуск из папки database:
+    python benchmark_clients.py --rows 50000
+"""
+import argparse
+import logging
+import os
+import shutil
+import tempfile
+import time
+
+import openpyxl
+
+from clients_excel_db import CLIENTS_SHEET_NAME, ClientsExcelManager
+
+
+def build_clients_file(path: str, rows: int, manager: ClientsExcelManager):
+    workbook = openpyxl.Workbook(write_only=True)
+    sheet = workbook.create_sheet(CLIENTS_SHEET_NAME)
+    sheet.append(list(manager._header_mapping.keys()))
+    for user_id in range(1, rows + 1):
+        sheet.append([user_id, f"Клиент {user_id}", f"+7900{user_id:07d}", f"45 {user_id:06d}",
+                      "ОВД района", "01.01.2015", f"г. Москва, ул. Примерная, д. {user_id % 200}",
+                      None, 0, None, "крыло"])
+    workbook.save(path)
+
+
+def legacy_get_user(manager: ClientsExcelManager, user_id: int):
+    workbook = openpyxl.load_workbook(manager.file_path)
+    try:
+        sheet = workbook[CLIENTS_SHEET_NAME]
+        headers = [cell.value for cell in sheet[1]]
+        for row in sheet.iter_rows(min_row=2):
+            if row[0].value == user_id:
+                return {manager._header_mapping[headers[i]]: cell.value
+                        for i, cell in enumerate(row) if headers[i] in manager._header_mapping}
+        return None
+    finally:
+        workbook.close()
+
+
+def legacy_update_user(manager: ClientsExcelManager, user_id: int, data: dict, target_path: str):
+    workbook = openpyxl.load_workbook(manager.file_path)
+    try:
+        sheet = workbook[CLIENTS_SHEET_NAME]
+        for row_index, row in enumerate(sheet.iter_rows(min_row=2), start=2):
+            if row[0].value == user_id:
+                for python_key, value in data.items():
+                    excel_header = next(
+                        (header for header, key in manager._header_mapping.items() if key == python_key), None)
+                    if excel_header:
+                        headers = [cell.value for cell in sheet[1]]
+                        sheet.cell(row=row_index, column=headers.index(excel_header) + 1, value=value)
+                break
+        workbook.save(target_path)
+    finally:
+        workbook.close()
+
+
+def timed(func, *args, repeats: int = 1) -> tuple:
+    """Среднее время вызова в секундах и результат последнего вызова."""
+    started = time.perf_counter()
+    for _ in range(repeats):
+        result = func(*args)
+    elapsed = (time.perf_counter() - started) / repeats
+    return elapsed, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=50000, help="число клиентов на листе")
+    parser.add_argument("--repeats", type=int, default=1)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    work_dir = tempfile.mkdtemp(prefix="clients_benchmark_")
+    try:
+        path = os.path.join(work_dir, "clients.xlsx")
+        manager = ClientsExcelManager(path)
+        build_clients_file(path, args.rows, manager)
+        print(f"Клиентов: {args.rows}, файл {os.path.getsize(path) / 1024 / 1024:.1f} MB")
+
+        print(f"{'операция':<36} {'прежде':>10} {'сейчас':>10}")
+        for title, user_id in (("get_user, первая строка", 1), ("get_user, середина", args.rows // 2),
+                               ("get_user, последняя строка", args.rows), ("get_user, нет в базе", -1)):
+            old, old_result = timed(legacy_get_user, manager, user_id, repeats=args.repeats)
+            new, new_result = timed(manager.get_user, user_id, repeats=args.repeats)
+            assert old_result == new_result, (old_result, new_result)
+            print(f"{title:<36} {old * 1000:>8.0f}ms {new * 1000:>8.0f}ms")
+
+        fields = ("full_name", "phone_number")
+        new, _ = timed(manager.get_user, args.rows, fields, repeats=args.repeats)
+        print(f"{'get_user, 2 поля, последняя строка':<36} {'':>10} {new * 1000:>8.0f}ms")
+
+        update = {"full_name": "Новое Имя", "phone_number": "+79990000000", "comment": "обновлено"}
+        old, _ = timed(legacy_update_user, manager, args.rows // 2, update, os.path.join(work_dir, "legacy.xlsx"))
+        new, _ = timed(manager.create_or_update_user, args.rows // 2, update)
+        assert manager.get_user(args.rows // 2, update.keys()) == update
+        print(f"{'create_or_update_user, середина':<36} {old * 1000:>8.0f}ms {new * 1000:>8.0f}ms")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
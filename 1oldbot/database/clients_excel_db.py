@@ -1,15 +1,22 @@
 import openpyxl
 import os
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Iterable, Iterator, List, Tuple
 
 logger = logging.getLogger(__name__)
 
+CLIENTS_SHEET_NAME = "Клиенты"
+
 
 class ClientsExcelManager:
     """
     Класс для управления базой клиентов в Excel-файле.
     Отвечает за чтение и запись данных клиентов.
+
+    Расположение колонок (какой ключ в каком столбце) вычисляется по строке заголовков
+    один раз для каждой версии файла (mtime + размер) и переиспользуется всеми запросами.
+    Поиск пользователя читает файл в режиме read_only потоком строк, берет из строки только
+    нужные столбцы и останавливается на первой найденной строке.
     """
 
     def __init__(self, file_path: str):
@@ -28,6 +35,10 @@ class ClientsExcelManager:
             "Комментарий": "comment",
             "крыло/стар": "dropoff_point",
         }
+        # Обратное сопоставление: ключ из кода -> заголовок Excel
+        self._key_to_header = {key: header for header, key in self._header_mapping.items()}
+        # (отметка файла, {ключ из кода: индекс столбца с 0})
+        self._columns_cache: Optional[Tuple[tuple, Dict[str, int]]] = None
         # Убираем загрузку рабочей книги из __init__
         # Она будет загружаться и закрываться в каждом методе
 
@@ -35,35 +46,78 @@ class ClientsExcelManager:
         """
         Инициализирует лист "Клиенты" с заголовками.
         """
-        sheet = workbook.create_sheet("Клиенты")
+        sheet = workbook.create_sheet(CLIENTS_SHEET_NAME)
         # Записываем заголовки из ключей словаря-маппинга
         headers = list(self._header_mapping.keys())
         # Записываем заголовки в первую строку
         sheet.append(headers)
 
-    def get_user(self, user_id: int) -> Optional[Dict[str, Any]]:
+    # --- Расположение колонок ---
+
+    def _file_stamp(self) -> tuple:
+        stat = os.stat(self.file_path)
+        return stat.st_mtime_ns, stat.st_size
+
+    def _resolve_columns(self, headers: Iterable) -> Dict[str, int]:
+        """Ключ из кода -> индекс столбца по строке заголовков."""
+        columns = {}
+        for index, header in enumerate(headers):
+            python_key = self._header_mapping.get(header)
+            if python_key and python_key not in columns:
+                columns[python_key] = index
+        return columns
+
+    def _get_columns(self) -> Dict[str, int]:
+        """
+        Расположение колонок текущей версии файла. Строка заголовков перечитывается
+        только после изменения файла.
+        """
+        stamp = self._file_stamp()
+        cached = self._columns_cache
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+
+        workbook = openpyxl.load_workbook(self.file_path, read_only=True)
+        try:
+            header_row = next(workbook[CLIENTS_SHEET_NAME].iter_rows(max_row=1, values_only=True), ())
+        finally:
+            workbook.close()
+        columns = self._resolve_columns(header_row)
+        self._columns_cache = (stamp, columns)
+        return columns
+
+    def _id_column(self, columns: Dict[str, int]) -> int:
+        # Если заголовка ID нет, ID по-прежнему ищется в первом столбце
+        return columns.get("user_id", 0)
+
+    # --- Чтение ---
+
+    def get_user(self, user_id: int, fields: Optional[Iterable[str]] = None) -> Optional[Dict[str, Any]]:
         """
         Проверяет, есть ли пользователь в базе.
         Открывает, читает и закрывает файл.
+        fields — ключи, которые нужно вернуть (по умолчанию все известные столбцы).
         """
         if not os.path.exists(self.file_path):
             logger.warning(f"Файл {self.file_path} не найден. Пользователь не может быть найден.")
             return None
 
         try:
-            workbook = openpyxl.load_workbook(self.file_path)
-            sheet = workbook["Клиенты"]
-            headers = [cell.value for cell in sheet[1]]
+            columns = self._get_columns()
+            id_column = self._id_column(columns)
+            if fields is not None:
+                fields = set(fields)
+                columns = {key: index for key, index in columns.items() if key in fields}
             logger.info(f"Проверка пользователя {user_id} в Excel-БД.")
 
-            for row in sheet.iter_rows(min_row=2):
-                if row[0].value == user_id:
-                    user_data = {}
-                    for i, cell in enumerate(row):
-                        header = headers[i]
-                        python_key = self._header_mapping.get(header)
-                        if python_key:
-                            user_data[python_key] = cell.value
+            # Читаем только столбцы до последнего нужного, значения без объектов ячеек
+            max_col = max(list(columns.values()) + [id_column]) + 1
+            workbook = openpyxl.load_workbook(self.file_path, read_only=True)
+            sheet = workbook[CLIENTS_SHEET_NAME]
+            for row in sheet.iter_rows(min_row=2, max_col=max_col, values_only=True):
+                if len(row) > id_column and row[id_column] == user_id:
+                    user_data = {key: row[index] if index < len(row) else None
+                                 for key, index in columns.items()}
                     logger.debug(f"Пользователь ID:{user_id} найден.")
                     return user_data
 
@@ -77,6 +131,41 @@ class ClientsExcelManager:
             if 'workbook' in locals():
                 workbook.close()
 
+    def iter_user_ids(self, chunk_size: int = 1000) -> Iterator[List[int]]:
+        """
+        ID всех клиентов пачками по chunk_size в порядке строк листа.
+        Читается только столбец ID в режиме read_only, весь список в память не загружается.
+        """
+        if not os.path.exists(self.file_path):
+            return
+        id_column = self._id_column(self._get_columns())
+        workbook = openpyxl.load_workbook(self.file_path, read_only=True)
+        try:
+            chunk = []
+            for (user_id,) in workbook[CLIENTS_SHEET_NAME].iter_rows(
+                    min_row=2, min_col=id_column + 1, max_col=id_column + 1, values_only=True):
+                if isinstance(user_id, int):
+                    chunk.append(user_id)
+                    if len(chunk) >= chunk_size:
+                        yield chunk
+                        chunk = []
+            if chunk:
+                yield chunk
+        finally:
+            workbook.close()
+
+    # --- Запись ---
+
+    def _row_values(self, columns: Dict[str, int], user_profile_data: dict):
+        """(индекс столбца, значение) для известных ключей профиля."""
+        for python_key, value in user_profile_data.items():
+            index = columns.get(python_key)
+            if index is None:
+                if python_key in self._key_to_header:
+                    logger.error(f"Заголовок '{self._key_to_header[python_key]}' не найден в таблице.")
+                continue
+            yield index, value
+
     def create_or_update_user(self, user_id: int, user_profile_data: dict) -> bool:
         """
         Создает нового пользователя или обновляет существующего в БД.
@@ -85,60 +174,43 @@ class ClientsExcelManager:
         workbook = None
         try:
             if os.path.exists(self.file_path):
+                columns = self._get_columns()
                 workbook = openpyxl.load_workbook(self.file_path)
-                sheet = workbook["Клиенты"]
+                sheet = workbook[CLIENTS_SHEET_NAME]
+                id_column = self._id_column(columns)
 
                 user_found = False
-                for row_index, row in enumerate(sheet.iter_rows(min_row=2), start=2):
-                    if row[0].value == user_id:
-                        for python_key, value in user_profile_data.items():
-                            excel_header = next(
-                                (header for header, key in self._header_mapping.items() if key == python_key), None)
-                            if excel_header:
-                                try:
-                                    headers = [cell.value for cell in sheet[1]]
-                                    col_index = headers.index(excel_header) + 1
-                                    sheet.cell(row=row_index, column=col_index, value=value)
-                                except ValueError:
-                                    logger.error(f"Заголовок '{excel_header}' не найден в таблице.")
+                for row_index, (cell_value,) in enumerate(
+                        sheet.iter_rows(min_row=2, min_col=id_column + 1, max_col=id_column + 1, values_only=True),
+                        start=2):
+                    if cell_value == user_id:
+                        for index, value in self._row_values(columns, user_profile_data):
+                            sheet.cell(row=row_index, column=index + 1, value=value)
                         user_found = True
                         logger.info(f"Обновлены данные пользователя ID:{user_id} в Excel-БД.")
                         break
 
                 if not user_found:
-                    headers = [cell.value for cell in sheet[1]]
-                    new_row_data = [None] * len(headers)
-                    for python_key, value in user_profile_data.items():
-                        excel_header = next(
-                            (header for header, key in self._header_mapping.items() if key == python_key), None)
-                        if excel_header:
-                            try:
-                                col_index = headers.index(excel_header)
-                                new_row_data[col_index] = value
-                            except ValueError:
-                                logger.error(f"Заголовок '{excel_header}' не найден в таблице.")
+                    new_row_data = [None] * sheet.max_column
+                    for index, value in self._row_values(columns, user_profile_data):
+                        new_row_data[index] = value
                     sheet.append(new_row_data)
                     logger.info(f"Создан новый пользователь ID:{user_id} в Excel-БД.")
             else:
                 workbook = openpyxl.Workbook()
                 self._setup_clients_sheet(workbook)
-                sheet = workbook["Клиенты"]
-
-                headers = [cell.value for cell in sheet[1]]
-                new_row_data = [None] * len(headers)
-                for python_key, value in user_profile_data.items():
-                    excel_header = next((header for header, key in self._header_mapping.items() if key == python_key),
-                                        None)
-                    if excel_header:
-                        try:
-                            col_index = headers.index(excel_header)
-                            new_row_data[col_index] = value
-                        except ValueError:
-                            logger.error(f"Заголовок '{excel_header}' не найден в таблице.")
+                sheet = workbook[CLIENTS_SHEET_NAME]
+                columns = self._resolve_columns(self._header_mapping.keys())
+
+                new_row_data = [None] * len(columns)
+                for index, value in self._row_values(columns, user_profile_data):
+                    new_row_data[index] = value
                 sheet.append(new_row_data)
                 logger.info(f"Создан новый пользователь ID:{user_id} в Excel-БД.")
 
             workbook.save(self.file_path)
+            # Заголовки при записи не меняются: переносим расположение колонок на новую версию файла
+            self._columns_cache = (self._file_stamp(), columns)
             return True
 
         except (KeyError, FileNotFoundError) as e:
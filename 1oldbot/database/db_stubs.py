@@ -1,22 +1,58 @@
 # database/db_stubs.py
-import random
+import asyncio
 import logging
-import json
 import os
 from datetime import datetime
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+import config
+from services.id_generator import next_id
+from services.io_executor import IOExecutor
+from oldbot.database.application_index import ApplicationIndex, ApplicationPage, DEFAULT_STATUS
+from oldbot.database.application_stats import ApplicationStats
 from oldbot.database.clients_excel_db import ClientsExcelManager # Импортируем наш новый класс
+from oldbot.database.journal import ApplicationJournal, OP_CREATE, OP_DELETE
+from oldbot.database.slot_capacity import SlotCapacityTracker, slot_key_for
+from oldbot.database.user_cache import MISSING, TTLLRUCache
 
 logger = logging.getLogger(__name__)
 clients_db = ClientsExcelManager(file_path='database/data/clients.xlsx')
+# Профили клиентов между шагами диалога берутся из кэша, а не перечитываются из clients.xlsx
+user_cache = TTLLRUCache(maxsize=config.USER_CACHE_SIZE, ttl=config.USER_CACHE_TTL)
+
+# Блокирующие операции с Excel и JSON-файлами выполняются в отдельных потоках,
+# чтобы медленное сохранение не останавливало обработку апдейтов других пользователей
+io_executor = IOExecutor(read_workers=config.IO_READ_WORKERS)
 
 # Define file paths for persistence
 _DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
-_APPLICATIONS_DIR = os.path.join(_DATA_DIR, 'applications')
+_JOURNAL_DIR = os.path.join(_DATA_DIR, 'journal')
+# Прогресс и отчеты рассылок (services/broadcast.py)
+BROADCAST_DIR = os.path.join(_DATA_DIR, 'broadcasts')
 
-# Ensure the data directory and applications directory exist
+# Ensure the data directory exists
 os.makedirs(_DATA_DIR, exist_ok=True)
-os.makedirs(_APPLICATIONS_DIR, exist_ok=True)
+
+# Заявки дописываются в append-only журнал вместо отдельного JSON-файла на каждую
+journal = ApplicationJournal(_JOURNAL_DIR)
+
+# Занятые места в слотах, индекс для постраничного списка заявок и счетчики для сводки;
+# восстанавливаются по журналу при старте
+slot_tracker = SlotCapacityTracker()
+application_index = ApplicationIndex()
+application_stats = ApplicationStats()
+# ID заявки -> позиция ее записи о создании в журнале: заявка по ID читается одной строкой
+_application_positions: Dict[Any, Tuple[int, int]] = {}
+_journal_records = []
+for _position, _record in journal.read_indexed():
+    _journal_records.append(_record)
+    if _record.get('op') == OP_CREATE:
+        _application_positions[_record.get('id')] = _position
+    elif _record.get('op') == OP_DELETE:
+        _application_positions.pop(_record.get('id'), None)
+slot_tracker.replay(_journal_records)
+application_index.replay(_journal_records)
+application_stats.replay(_journal_records)
+del _journal_records
 
 # ====================
 # ФАСАД ДЛЯ КЛИЕНТОВ
@@ -28,10 +64,19 @@ async def get_user(user_id: int) -> Optional[Dict[str, Any]]:
     Возвращает данные пользователя или None.
 
     Эта функция теперь является фасадом для ClientsExcelManager.
+    Результат (в том числе "не найден") кэшируется в user_cache на config.USER_CACHE_TTL секунд.
     """
+    cached = user_cache.get(user_id)
+    if cached is not MISSING:
+        # Копия, чтобы изменения словаря в хендлере не попали в кэш
+        return dict(cached) if cached is not None else None
+
     logger.info(f"Проверка пользователя {user_id} в БД (через Excel-файл).")
+    generation = user_cache.generation
     # Перенаправляем вызов к новому классу
-    return clients_db.get_user(user_id)
+    user_data = await io_executor.read(clients_db.get_user, user_id)
+    user_cache.put(user_id, user_data, generation)
+    return dict(user_data) if user_data is not None else None
 
 
 async def create_or_update_user(user_id: int, user_profile_data: dict) -> bool:
@@ -42,21 +87,51 @@ async def create_or_update_user(user_id: int, user_profile_data: dict) -> bool:
     Эта функция теперь является фасадом для ClientsExcelManager.
     """
     logger.info(f"Создание/обновление пользователя ID:{user_id} в БД (через Excel-файл).")
-    # Перенаправляем вызов к новому классу
-    return clients_db.create_or_update_user(user_id, user_profile_data)
+    try:
+        # Перенаправляем вызов к новому классу
+        return await io_executor.write(clients_db.create_or_update_user, user_id, user_profile_data)
+    finally:
+        # Сбрасываем и при ошибке: файл мог успеть измениться
+        user_cache.invalidate(user_id)
+
+
+def iter_client_id_chunks(chunk_size: int = 1000):
+    """
+    ID всех клиентов пачками — источник получателей для рассылок.
+    Блокирующая функция: выполнять через io_executor.read.
+    """
+    return clients_db.iter_user_ids(chunk_size)
 
 
 # ====================
 # ФАСАД ДЛЯ ЗАЯВОК
 # ====================
 
-async def create_application(user_id: int, data: dict):
+def _find_application(app_id) -> Optional[Dict[str, Any]]:
+    """Текущее состояние заявки: None, если ее нет или она удалена. Читает из журнала одну строку."""
+    position = _application_positions.get(app_id)
+    if position is None:
+        return None
+    record = journal.read_at(position)
+    if record is None or record.get('id') != app_id:
+        logger.error(f"Запись заявки #{app_id} в журнале не найдена по позиции {position}.")
+        return None
+    found = record.get('data')
+    # Статус меняется отдельными записями журнала, текущий хранит индекс
+    entry = application_index.get(app_id)
+    if entry is not None and found is not None:
+        found = dict(found, status=entry['status'])
+    return found
+
+
+async def create_application(user_id: int, data: dict, slot_capacity: Optional[int] = None):
     """
-    Сохраняет новую заявку в отдельный JSON-файл.
-    Возвращает номер созданной заявки.
+    Дописывает новую заявку в журнал заявок и занимает место в выбранном слоте.
+    slot_capacity — сколько заявок вмещает слот (None или 0 — без ограничения).
+    Возвращает номер созданной заявки. Бросает SlotFullError, если мест в слоте нет.
     """
-    # Генерируем уникальный ID на основе timestamp и случайного числа
-    app_id = int(datetime.now().timestamp() * 1000) + random.randint(1, 1000)
+    # ID уникален между процессами бота и растет со временем (services/id_generator.py)
+    app_id = next_id()
 
     application_data = {
         "id": app_id,
@@ -68,51 +143,91 @@ async def create_application(user_id: int, data: dict):
         "current_option_type": data.get('current_option_type'),
         "selected_point_index": data.get('selected_point_index'),
         "date": data.get('selected_point_name'),
+        "point_name": data.get('selected_point_name'),
         "selected_date": data.get('selected_date'),
         "selected_time": data.get('selected_time'),
         "pre_repair": data.get('pre_repair'),
         "pre_repair_comment": data.get('pre_repair_comment'),
+        "status": DEFAULT_STATUS,
     }
 
-    file_path = os.path.join(_APPLICATIONS_DIR, f"app_{app_id}.json")
+    # Место занимается до записи в журнал: проверка и занятие идут одним шагом под блокировкой
+    slot_key = slot_key_for(application_data)
+    if slot_key is not None:
+        slot_tracker.reserve(app_id, slot_key, slot_capacity)
+
     try:
-        with open(file_path, 'w', encoding='utf-8') as f:
-            json.dump(application_data, f, ensure_ascii=False, indent=4)
-        logger.info(f"Создана заявка #{app_id} для пользователя {user_id} в файле {file_path}")
+        # Журнал сам упорядочивает записи, а одновременные заявки из разных потоков делят один fsync
+        position = await asyncio.to_thread(journal.append_application, app_id, application_data)
+        _application_positions[app_id] = position
+        application_index.add(app_id, application_data)
+        application_stats.add(app_id, application_data)
+        logger.info(f"Создана заявка #{app_id} для пользователя {user_id} в журнале {_JOURNAL_DIR}")
         return app_id
     except Exception as e:
-        logger.error(f"Ошибка при сохранении заявки #{app_id} в файл {file_path}: {e}")
+        slot_tracker.release(app_id)
+        logger.error(f"Ошибка при сохранении заявки #{app_id} в журнал {_JOURNAL_DIR}: {e}")
         return None
 
+async def list_applications(event_id: Optional[str] = None, status: Optional[str] = None,
+                            cursor: Optional[str] = None, limit: int = 10) -> ApplicationPage:
+    """
+    Страница заявок от новых к старым с фильтрами по событию и статусу.
+    cursor — next_cursor или prev_cursor предыдущей страницы (None — первая страница);
+    курсор короткий и передается в callback_data как есть.
+    """
+    return application_index.page(event_id, status, cursor, limit)
+
 async def get_application_by_id(app_id: int):
     """
-    Возвращает данные заявки из соответствующего файла.
+    Возвращает данные заявки из журнала.
     """
-    file_path = os.path.join(_APPLICATIONS_DIR, f"app_{app_id}.json")
-    if not os.path.exists(file_path):
-        logger.warning(f"Файл заявки {file_path} не найден.")
-        return None
     try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        application = await io_executor.read(_find_application, app_id)
     except Exception as e:
-        logger.error(f"Ошибка при чтении файла заявки {file_path}: {e}")
+        logger.error(f"Ошибка при чтении журнала заявок {_JOURNAL_DIR}: {e}")
         return None
+    if application is None:
+        logger.warning(f"Заявка #{app_id} не найдена в журнале.")
+    return application
 
 async def delete_application(app_id: int):
     """
-    Удаляет файл заявки по ID.
-    """
-    file_path = os.path.join(_APPLICATIONS_DIR, f"app_{app_id}.json")
-    if os.path.exists(file_path):
-        try:
-            os.remove(file_path)
-            logger.info(f"Файл заявки {file_path} успешно удален.")
-            return True
-        except OSError as e:
-            logger.error(f"Ошибка при удалении файла заявки {file_path}: {e}")
-            return False
-    else:
-        logger.warning(f"Файл заявки {file_path} не найден для удаления.")
+    Удаляет заявку: дописывает в журнал запись-надгробие.
+    """
+    if await get_application_by_id(app_id) is None:
+        logger.warning(f"Заявка #{app_id} не найдена для удаления.")
+        return False
+    try:
+        await asyncio.to_thread(journal.append_tombstone, app_id)
+        _application_positions.pop(app_id, None)
+        slot_tracker.release(app_id)
+        application_index.remove(app_id)
+        application_stats.remove(app_id)
+        logger.info(f"Заявка #{app_id} помечена удаленной в журнале.")
+        return True
+    except OSError as e:
+        logger.error(f"Ошибка при удалении заявки #{app_id}: {e}")
         return False
 
+async def set_application_status(app_id: int, status: str) -> bool:
+    """
+    Меняет статус заявки: дописывает в журнал запись о смене статуса
+    и обновляет индекс и счетчики сводки.
+    """
+    if application_index.get(app_id) is None:
+        logger.warning(f"Заявка #{app_id} не найдена для смены статуса.")
+        return False
+    try:
+        await asyncio.to_thread(journal.append_status, app_id, status)
+    except OSError as e:
+        logger.error(f"Ошибка при смене статуса заявки #{app_id}: {e}")
+        return False
+    application_index.set_status(app_id, status)
+    application_stats.set_status(app_id, status)
+    logger.info(f"Статус заявки #{app_id} изменен на '{status}'.")
+    return True
+
+def get_applications_summary(event_id) -> Dict[str, Any]:
+    """Сводка заявок события из счетчиков (см. ApplicationStats.event_summary), без чтения журнала."""
+    return application_stats.event_summary(event_id)
@@ -1,10 +1,12 @@
-import xlwings as xw
 import os
 import sys
 import json
 import logging
 import time
 import shutil
+from abc import ABC, abstractmethod
+
+from journal import ApplicationJournal, OP_CREATE, OP_DELETE
 
 # Настройка логирования для вывода в консоль
 logging.basicConfig(
@@ -15,12 +17,245 @@ logging.basicConfig(
 
 
 
+class ExcelBackend(ABC):
+    """
+    Интерфейс движка, через который ExcelManager работает с книгой.
+    Лист — непрозрачный объект движка; строки и столбцы нумеруются с 1.
+    """
+
+    @abstractmethod
+    def open(self, file_path: str) -> bool:
+        """Открывает книгу или создает новую, если файла нет."""
+        pass
+
+    @abstractmethod
+    def save(self, file_path: str):
+        pass
+
+    @abstractmethod
+    def close(self):
+        pass
+
+    @abstractmethod
+    def sheet_names(self) -> list:
+        pass
+
+    @abstractmethod
+    def get_sheet(self, sheet_name: str):
+        """Возвращает лист по имени или None."""
+        pass
+
+    @abstractmethod
+    def add_sheet(self, sheet_name: str):
+        pass
+
+    @abstractmethod
+    def copy_sheet(self, source_sheet_name: str, new_sheet_name: str):
+        pass
+
+    @abstractmethod
+    def delete_sheet(self, sheet_name: str):
+        pass
+
+    @abstractmethod
+    def sheet_name(self, sheet) -> str:
+        pass
+
+    @abstractmethod
+    def last_row(self, sheet) -> int:
+        """Номер последней строки используемого диапазона."""
+        pass
+
+    @abstractmethod
+    def read_values(self, sheet) -> list:
+        """Значения листа от A1 до конца используемого диапазона в виде списка строк."""
+        pass
+
+    @abstractmethod
+    def write_rows(self, sheet, start_row: int, rows: list):
+        """Записывает строки начиная с ячейки (start_row, 1)."""
+        pass
+
+
+def value_runs(row: list) -> list:
+    """Делит строку на непрерывные куски без None: [(номер первого столбца с 1, значения), ...]."""
+    runs = []
+    current = None
+    for col_idx, value in enumerate(row, start=1):
+        if value is None:
+            current = None
+        elif current is None:
+            current = [value]
+            runs.append((col_idx, current))
+        else:
+            current.append(value)
+    return runs
+
+
+class XlwingsBackend(ExcelBackend):
+    """Движок поверх запущенного Excel (xlwings). Нужен Windows или macOS с установленным Excel."""
+
+    def __init__(self):
+        self.app = None
+        self.workbook = None
+
+    def open(self, file_path: str) -> bool:
+        import xlwings as xw
+
+        self.app = xw.App(visible=False, add_book=False)
+        self.app.display_alerts = False
+        self.app.screen_updating = False
+
+        if os.path.exists(file_path):
+            self.workbook = self.app.books.open(file_path)
+            logging.debug(f"Успешно открыт файл: {file_path}")
+        else:
+            self.workbook = self.app.books.add()
+            logging.info(f"Файл не найден по пути: {file_path}. Создана новая книга.")
+        return True
+
+    def save(self, file_path: str):
+        self.workbook.save(file_path)
+
+    def close(self):
+        if self.workbook:
+            try:
+                self.workbook.close()
+            except Exception as e:
+                logging.error(f"Ошибка при закрытии книги: {e}")
+        if self.app:
+            try:
+                self.app.quit()
+            except Exception as e:
+                logging.error(f"Ошибка при выходе из приложения Excel: {e}")
+        logging.info("Экземпляр Excel закрыт.")
+
+    def sheet_names(self) -> list:
+        return [s.name for s in self.workbook.sheets]
+
+    def get_sheet(self, sheet_name: str):
+        for sheet in self.workbook.sheets:
+            if sheet.name == sheet_name:
+                return sheet
+        return None
+
+    def add_sheet(self, sheet_name: str):
+        return self.workbook.sheets.add(sheet_name)
+
+    def copy_sheet(self, source_sheet_name: str, new_sheet_name: str):
+        self.workbook.sheets[source_sheet_name].copy(name=new_sheet_name)
+
+    def delete_sheet(self, sheet_name: str):
+        self.workbook.sheets[sheet_name].delete()
+
+    def sheet_name(self, sheet) -> str:
+        return sheet.name
+
+    def last_row(self, sheet) -> int:
+        return sheet.used_range.last_cell.row
+
+    def read_values(self, sheet) -> list:
+        # ndim=2: одна строка или одна ячейка тоже приходят списком строк
+        return sheet.range((1, 1), sheet.used_range.last_cell).options(ndim=2).value
+
+    def write_rows(self, sheet, start_row: int, rows: list):
+        # Присваивание диапазона записало бы None в пустые ячейки и стерло формулы шаблона,
+        # поэтому пишем только непрерывные куски значений — как OpenpyxlBackend
+        for row_idx, row in enumerate(rows, start=start_row):
+            for col_idx, values in value_runs(row):
+                sheet.range((row_idx, col_idx)).value = values
+
+
+class OpenpyxlBackend(ExcelBackend):
+    """
+    Движок на openpyxl: работает без Excel, в том числе на Linux-сервере.
+    Книга открывается с keep_vba=True, поэтому макросы .xlsm сохраняются.
+    Формулы не пересчитываются — это сделает Excel при следующем открытии файла.
+    """
+
+    def __init__(self):
+        self.workbook = None
+
+    def open(self, file_path: str) -> bool:
+        import openpyxl
+
+        if os.path.exists(file_path):
+            self.workbook = openpyxl.load_workbook(file_path, keep_vba=True)
+            logging.debug(f"Успешно открыт файл: {file_path}")
+        else:
+            self.workbook = openpyxl.Workbook()
+            logging.info(f"Файл не найден по пути: {file_path}. Создана новая книга.")
+        return True
+
+    def save(self, file_path: str):
+        self.workbook.save(file_path)
+
+    def close(self):
+        if self.workbook:
+            self.workbook.close()
+        logging.debug("Книга openpyxl закрыта.")
+
+    def sheet_names(self) -> list:
+        return self.workbook.sheetnames
+
+    def get_sheet(self, sheet_name: str):
+        if sheet_name in self.workbook.sheetnames:
+            return self.workbook[sheet_name]
+        return None
+
+    def add_sheet(self, sheet_name: str):
+        return self.workbook.create_sheet(sheet_name)
+
+    def copy_sheet(self, source_sheet_name: str, new_sheet_name: str):
+        new_sheet = self.workbook.copy_worksheet(self.workbook[source_sheet_name])
+        new_sheet.title = new_sheet_name
+
+    def delete_sheet(self, sheet_name: str):
+        self.workbook.remove(self.workbook[sheet_name])
+
+    def sheet_name(self, sheet) -> str:
+        return sheet.title
+
+    def last_row(self, sheet) -> int:
+        return sheet.max_row
+
+    def read_values(self, sheet) -> list:
+        return [list(row) for row in sheet.iter_rows(values_only=True)]
+
+    def write_rows(self, sheet, start_row: int, rows: list):
+        for row_idx, row in enumerate(rows, start=start_row):
+            for col_idx, value in enumerate(row, start=1):
+                # Пустые значения не затирают оформление и формулы шаблона
+                if value is not None:
+                    sheet.cell(row=row_idx, column=col_idx, value=value)
+
+
+EXCEL_BACKENDS = {
+    'xlwings': XlwingsBackend,
+    'openpyxl': OpenpyxlBackend,
+}
+# Без Excel (Linux-сервер) по умолчанию работаем через openpyxl
+DEFAULT_EXCEL_BACKEND = os.getenv(
+    'EXCEL_BACKEND', 'xlwings' if sys.platform in ('win32', 'darwin') else 'openpyxl'
+)
+
+
+def create_backend(backend=None) -> ExcelBackend:
+    """Возвращает движок по имени ('xlwings', 'openpyxl') или готовый экземпляр ExcelBackend."""
+    if isinstance(backend, ExcelBackend):
+        return backend
+    name = (backend or DEFAULT_EXCEL_BACKEND).lower()
+    if name not in EXCEL_BACKENDS:
+        raise ValueError(f"Неизвестный движок Excel: {name}")
+    return EXCEL_BACKENDS[name]()
+
+
 class ExcelManager:
-    """Класс для управления Excel-файлами с использованием xlwings."""
+    """Класс для управления Excel-файлами через подключаемый движок (xlwings или openpyxl)."""
 
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, backend=None):
         self.file_path = file_path
-        self.app = None
+        self.backend = create_backend(backend)
         self.workbook = None
 
         # Проверка, не заблокирован ли файл
@@ -50,20 +285,10 @@ class ExcelManager:
         return letter
 
     def _load_workbook(self):
-        """Загружает или создает рабочую книгу, запуская Excel."""
+        """Загружает или создает рабочую книгу выбранным движком."""
         try:
-            self.app = xw.App(visible=False, add_book=False)
-            self.app.display_alerts = False
-            self.app.screen_updating = False
-
-            if os.path.exists(self.file_path):
-                workbook = self.app.books.open(self.file_path)
-                logging.debug(f"Успешно открыт файл: {self.file_path}")
-            else:
-                workbook = self.app.books.add()
-                logging.info(f"Файл не найден по пути: {self.file_path}. Создана новая книга.")
-
-            return workbook
+            self.backend.open(self.file_path)
+            return self.backend.workbook
 
         except Exception as e:
             logging.error(f"Ошибка при запуске Excel или загрузке файла {self.file_path}: {e}")
@@ -77,7 +302,7 @@ class ExcelManager:
         """
         if self.workbook:
             try:
-                self.workbook.save(self.file_path)
+                self.backend.save(self.file_path)
                 logging.info(f"Файл '{self.file_path}' успешно сохранен.")
                 return True
             except Exception as e:
@@ -86,18 +311,14 @@ class ExcelManager:
         return False
 
     def close(self):
-        """Корректно закрывает книгу и выходит из приложения Excel."""
-        if self.workbook:
-            try:
-                self.workbook.close()
-            except Exception as e:
-                logging.error(f"Ошибка при закрытии книги: {e}")
-        if self.app:
-            try:
-                self.app.quit()
-            except Exception as e:
-                logging.error(f"Ошибка при выходе из приложения Excel: {e}")
-        logging.info("Экземпляр Excel закрыт.")
+        """Корректно закрывает книгу и освобождает ресурсы движка."""
+        self.backend.close()
+
+    def sheet_names(self) -> list:
+        """Имена всех листов книги."""
+        if not self.workbook:
+            return []
+        return self.backend.sheet_names()
 
     def get_sheet(self, sheet_name: str, create_if_not_exists: bool = False):
         """
@@ -106,15 +327,14 @@ class ExcelManager:
         if not self.workbook:
             return None
 
-        for sheet in self.workbook.sheets:
-            if sheet.name == sheet_name:
-                return sheet
+        sheet = self.backend.get_sheet(sheet_name)
+        if sheet is not None:
+            return sheet
 
         if create_if_not_exists:
             logging.info(f"Лист '{sheet_name}' не найден, создаем новый.")
             try:
-                new_sheet = self.workbook.sheets.add(sheet_name)
-                return new_sheet
+                return self.backend.add_sheet(sheet_name)
             except Exception as e:
                 logging.error(f"Не удалось создать новый лист '{sheet_name}': {e}")
                 return None
@@ -123,14 +343,25 @@ class ExcelManager:
 
     def copy_and_rename_sheet(self, source_sheet_name: str, new_sheet_name: str):
         """Копирует существующий лист и переименовывает его."""
-        if not self.workbook or source_sheet_name not in [s.name for s in self.workbook.sheets]:
+        if not self.workbook or source_sheet_name not in self.sheet_names():
             logging.error(f"Ошибка: Исходный лист '{source_sheet_name}' не найден.")
             return False
 
-        source_sheet = self.workbook.sheets[source_sheet_name]
-        source_sheet.copy(name=new_sheet_name)
+        self.backend.copy_sheet(source_sheet_name, new_sheet_name)
         return True
 
+    def last_row(self, sheet) -> int:
+        """Номер последней заполненной строки листа."""
+        return self.backend.last_row(sheet)
+
+    def read_values(self, sheet) -> list:
+        """Значения листа от A1 в виде списка строк."""
+        return self.backend.read_values(sheet) or []
+
+    def write_rows(self, sheet, start_row: int, rows: list):
+        """Записывает строки начиная с первого столбца строки start_row."""
+        self.backend.write_rows(sheet, start_row, rows)
+
     def find_cell(self, sheet_name: str, search_value):
         """Ищет ячейку по значению и возвращает её координаты (столбец-буква, строка-номер)."""
         sheet = self.get_sheet(sheet_name)
@@ -138,7 +369,7 @@ class ExcelManager:
             logging.error(f"Ошибка: Лист '{sheet_name}' не найден.")
             return None
 
-        data = sheet.used_range.value
+        data = self.read_values(sheet)
         if not data:
             return None
 
@@ -152,13 +383,28 @@ class ExcelManager:
         logging.info(f"Значение '{search_value}' не найдено на листе '{sheet_name}'.")
         return None
 
+    def append_rows(self, sheet, rows: list) -> bool:
+        """
+        Дописывает строки в конец листа одним вызовом write_rows, пустые ячейки не затираются.
+        Строка последней заполненной ячейки вычисляется один раз на всю пачку.
+        """
+        if not rows:
+            return True
+        try:
+            next_row = self.last_row(sheet) + 1
+            self.write_rows(sheet, next_row, rows)
+            return True
+        except Exception as e:
+            logging.error(f"Ошибка при записи {len(rows)} строк на лист '{self.backend.sheet_name(sheet)}': {e}")
+            return False
+
     def delete_sheet(self, sheet_name: str):
         """Удаляет лист."""
-        if not self.workbook or sheet_name not in [s.name for s in self.workbook.sheets]:
+        if not self.workbook or sheet_name not in self.sheet_names():
             logging.error(f"Ошибка: Лист '{sheet_name}' не найден.")
             return False
 
-        self.workbook.sheets[sheet_name].delete()
+        self.backend.delete_sheet(sheet_name)
         return True
 
     def read_sheet_to_dict(self, sheet_name: str, key_column: str = 'A'):
@@ -173,13 +419,13 @@ class ExcelManager:
 
         key_col_index = ord(key_column.upper()) - ord('A')
         data = {}
-        all_values = sheet.used_range.value
+        all_values = self.read_values(sheet)
 
-        if not all_values or not isinstance(all_values, list) or len(all_values) < 2:
+        if len(all_values) < 2:
             return data
 
         for row in all_values[1:]:
-            if isinstance(row, list) and len(row) > key_col_index:
+            if len(row) > key_col_index:
                 key = row[key_col_index]
                 if key:
                     data[key] = tuple(row)
@@ -193,18 +439,23 @@ class ExcelManager:
 TEMPLATE_STRUCTURE_SHEET_NAME = "Структура шаблона"
 TEMPLATE_SHEET_NAME = "Шаблон события"
 EVENTS_SHEET_NAME = "Текущие события"
-PID_FILE = 'excel_manager.pid'
-# APPLICATIONS_DIR = os.path.join('C:/Users/Nikolay/PycharmProjects/transfer_tg_bot/database/data/applications')
-APPLICATIONS_DIR = os.path.join('D:/sync/2 way BikeFit Lab - nikolay mac/transfer/transfer_tg_bot/database/data/applications')
+# Файл блокировки рядом со скриптом: его видят и ручной запуск, и фоновый обработчик бота
+LOCK_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'excel_manager.lock')
+# Пути берутся из окружения; по умолчанию — каталог data рядом со скриптом
+DATA_DIR = os.getenv('APPLICATIONS_DATA_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data'))
+APPLICATIONS_DIR = os.getenv('APPLICATIONS_DIR', os.path.join(DATA_DIR, 'applications'))
 PROCESSED_APPLICATIONS_DIR = os.path.join(APPLICATIONS_DIR, 'applications_done')
+EXCEL_FILE = os.getenv('APPLICATIONS_EXCEL_FILE', os.path.join(DATA_DIR, 'applications.xlsm'))
+# Журнал заявок, который пишет бот; книга Excel — его потребитель со своим чекпойнтом
+JOURNAL_DIR = os.getenv('APPLICATIONS_JOURNAL_DIR', os.path.join(DATA_DIR, 'journal'))
+JOURNAL_CONSUMER = 'excel'
 
 
 def setup_base_sheets(manager: ExcelManager):
     """Настраивает базовые листы."""
     logging.info("Настройка базовых листов...")
     template_struct_sheet = manager.get_sheet(TEMPLATE_STRUCTURE_SHEET_NAME, create_if_not_exists=True)
-    if template_struct_sheet and template_struct_sheet.used_range.last_cell.row <= 1:
-        template_struct_sheet.range('A1').value = ['Номер столбца', 'Кодовое название', 'Название (рус)']
+    if template_struct_sheet and manager.last_row(template_struct_sheet) <= 1:
         structure_data = [
             (1, 'appNumber', 'номер заявки'), (2, 'fullName', 'фио'), (3, 'phone', 'телефон'),
             (4, 'email', 'почта'), (5, 'telegramID', 'телеграм id'), (6, 'pasportNumber', 'паспорт номер'),
@@ -214,7 +465,8 @@ def setup_base_sheets(manager: ExcelManager):
             (13, 'pickupPlace', 'место забора'), (14, 'maintenanceNeeded', 'надо ТО'),
             (15, 'comment', 'комментарии'), (16, 'generalComment', 'общий комментарий'),
         ]
-        template_struct_sheet.range('A2').value = structure_data
+        header = ('Номер столбца', 'Кодовое название', 'Название (рус)')
+        manager.write_rows(template_struct_sheet, 1, [header] + structure_data)
         logging.info("Лист 'Структура шаблона' инициализирован.")
 
     events_sheet = manager.get_sheet(EVENTS_SHEET_NAME, create_if_not_exists=True)
@@ -229,9 +481,10 @@ def create_event_sheet(manager: ExcelManager, event_name: str, template_structur
     if manager.copy_and_rename_sheet(TEMPLATE_SHEET_NAME, event_name):
         event_sheet = manager.get_sheet(event_name)
         if event_sheet:
+            header = build_request_row({}, template_structure)
             for col_num, row_data in template_structure.items():
-                col_name_ru = row_data[2]
-                event_sheet.range(1, int(col_num)).value = col_name_ru
+                header[int(col_num) - 1] = row_data[2]
+            manager.write_rows(event_sheet, 1, [header])
             return True
     return False
 
@@ -243,16 +496,23 @@ def init_excel_project(manager: ExcelManager, template_structure: dict):
     """
     logging.info("Запуск инициализации проекта...")
 
-    if 'Текущие события' not in [s.name for s in manager.workbook.sheets]:
+    events_sheet = manager.get_sheet(EVENTS_SHEET_NAME)
+    if not events_sheet:
         logging.error("Ошибка: Лист 'Текущие события' не найден. Невозможно инициализировать проект.")
         return False
 
-    events_sheet = manager.workbook.sheets['Текущие события']
-    last_col = events_sheet.range('A1').expand('right').last_cell.column
+    # Лист читается целиком за одно обращение; события идут подряд в первой строке начиная с B
+    values = manager.read_values(events_sheet)
+    names_row = values[0] if values else []
+    years_row = values[2] if len(values) > 2 else []
+    last_col = 0
+    while last_col < len(names_row) and names_row[last_col] not in (None, ''):
+        last_col += 1
+    existing_sheets = set(manager.sheet_names())
 
-    for col_index in range(2, last_col + 1):
-        event_name = events_sheet.range(1, col_index).value
-        event_year_value = events_sheet.range(3, col_index).value
+    for col_index in range(1, last_col):
+        event_name = names_row[col_index]
+        event_year_value = years_row[col_index] if col_index < len(years_row) else None
 
         if not event_name or not event_year_value:
             continue
@@ -266,138 +526,259 @@ def init_excel_project(manager: ExcelManager, template_structure: dict):
 
         sheet_title = f"{event_name} {event_year}"
 
-        if sheet_title in [s.name for s in manager.workbook.sheets]:
+        if sheet_title in existing_sheets:
             logging.info(f"Лист для события '{sheet_title}' уже существует. Пропускаем.")
         else:
             logging.info(f"Создаем новый лист для события: '{sheet_title}'...")
-            if not create_event_sheet(manager, sheet_title, template_structure):
+            if create_event_sheet(manager, sheet_title, template_structure):
+                existing_sheets.add(sheet_title)
+            else:
                 logging.error(f"Не удалось создать и заполнить лист '{sheet_title}'.")
 
     logging.info("Инициализация проекта завершена.")
     return True
 
 
+def build_request_row(request_data: dict, template_structure: dict) -> list:
+    """Строит строку листа события из данных заявки по структуре шаблона."""
+    columns = {int(col_num): row_data[1] for col_num, row_data in template_structure.items()}
+    row = [None] * max(columns)
+    for col_num, key_name in columns.items():
+        row[col_num - 1] = request_data.get(key_name)
+    return row
+
+
+def process_delivery_requests(manager: ExcelManager, applications: list, template_structure: dict) -> list:
+    """
+    Записывает пачку заявок на листы событий: по одной записи диапазона на каждый лист.
+    applications — список пар (имя JSON-файла, данные заявки).
+    Возвращает имена успешно записанных заявок.
+    """
+    rows_by_sheet = {}
+    for json_file_name, request_data in applications:
+        event_name = request_data.get('event_name')
+        if not event_name:
+            logging.error(f"Ошибка: В данных заявки {json_file_name} отсутствует 'event_name'.")
+            continue
+        rows_by_sheet.setdefault(event_name, []).append(
+            (json_file_name, build_request_row(request_data, template_structure))
+        )
+
+    processed = []
+    for event_name, named_rows in rows_by_sheet.items():
+        event_sheet = manager.get_sheet(event_name)
+        if not event_sheet:
+            logging.error(f"Ошибка: Лист '{event_name}' не найден. Заявки не могут быть обработаны.")
+            continue
+
+        if manager.append_rows(event_sheet, [row for _, row in named_rows]):
+            processed.extend(json_file_name for json_file_name, _ in named_rows)
+            logging.info(f"Добавлено заявок на лист '{event_name}': {len(named_rows)}.")
+
+    return processed
+
+
 def process_new_delivery_request(manager: ExcelManager, request_data: dict, template_structure: dict):
     """Обрабатывает новую заявку, записывая её в нужный лист."""
-    event_name = request_data.get('event_name')
-    if not event_name:
-        logging.error("Ошибка: В данных заявки отсутствует 'event_name'.")
-        return False
+    return bool(process_delivery_requests(manager, [(None, request_data)], template_structure))
 
-    event_sheet = manager.get_sheet(event_name)
-    if not event_sheet:
-        logging.error(f"Ошибка: Лист '{event_name}' не найден. Заявка не может быть обработана.")
-        return False
 
-    next_row = event_sheet.used_range.last_cell.row + 1
+class InstanceLock:
+    """
+    Эксклюзивная блокировка книги заявок между процессами: блокировка файла LOCK_FILE
+    средствами ОС (msvcrt.locking в Windows, fcntl.flock в остальных системах).
+    Блокировку держит открытый файл, поэтому после падения процесса ОС снимает ее сама
+    и устаревших блокировок не бывает. Чужие процессы не проверяются и не затрагиваются.
+    """
 
-    for col_num, row_data in template_structure.items():
-        key_name = row_data[1]
-        value = request_data.get(key_name)
-        if value is not None:
-            event_sheet.range(next_row, int(col_num)).value = value
+    def __init__(self, path: str = None):
+        self.path = path or LOCK_FILE
+        self._file = None
+
+    def acquire(self) -> bool:
+        """Берет блокировку без ожидания. False, если книгу уже обрабатывает другой процесс или поток."""
+        lock_file = open(self.path, 'a+')
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._file = lock_file
+        return True
+
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            if os.name == 'nt':
+                import msvcrt
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+
+
+def ensure_applications_dirs():
+    """Создает папки для новых и обработанных заявок, если их нет."""
+    if not os.path.exists(APPLICATIONS_DIR):
+        os.makedirs(APPLICATIONS_DIR, exist_ok=True)
+        logging.info(f"Создана директория для заявок: {APPLICATIONS_DIR}")
+
+    if not os.path.exists(PROCESSED_APPLICATIONS_DIR):
+        os.makedirs(PROCESSED_APPLICATIONS_DIR, exist_ok=True)
+        logging.info(f"Создана директория для обработанных заявок: {PROCESSED_APPLICATIONS_DIR}")
 
-    logging.info(f"Новая заявка успешно добавлена на лист '{event_name}'.")
-    return True
 
+def migrate_legacy_inbox(journal: ApplicationJournal) -> int:
+    """
+    Переносит в журнал JSON-файлы заявок, оставшиеся в APPLICATIONS_DIR от прежней схемы.
+    Перенесенные файлы отправляются в PROCESSED_APPLICATIONS_DIR.
+    """
+    if not os.path.exists(APPLICATIONS_DIR):
+        return 0
 
-def is_another_instance_running():
-    """Проверяет, запущен ли уже другой экземпляр этого скрипта."""
-    if os.path.exists(PID_FILE):
+    migrated = 0
+    json_files = [f for f in os.listdir(APPLICATIONS_DIR) if f.endswith('.json')]
+    for json_file_name in json_files:
+        json_file_path = os.path.join(APPLICATIONS_DIR, json_file_name)
         try:
-            with open(PID_FILE, 'r') as f:
-                pid = int(f.read().strip())
-            try:
-                os.kill(pid, 0)
-                logging.info(f"Другой экземпляр с PID {pid} уже запущен.")
-                return True
-            except OSError:
-                logging.warning(f"Найден устаревший PID-файл ({PID_FILE}). Удаляем.")
-                os.remove(PID_FILE)
-                return False
-        except (ValueError, FileNotFoundError):
-            if os.path.exists(PID_FILE):
-                os.remove(PID_FILE)
-            return False
-    return False
+            with open(json_file_path, 'r', encoding='utf-8') as f:
+                request_data = json.load(f)
+        except (json.JSONDecodeError, FileNotFoundError) as e:
+            logging.error(f"Ошибка при чтении файла {json_file_name}: {e}. Файл будет переименован.")
+            os.rename(json_file_path, json_file_path + ".error")
+            continue
 
+        journal.append_application(os.path.splitext(json_file_name)[0], request_data)
+        ensure_applications_dirs()
+        shutil.move(json_file_path, os.path.join(PROCESSED_APPLICATIONS_DIR, json_file_name))
+        migrated += 1
 
-def create_pid_file():
-    """Создает PID-файл с PID текущего процесса."""
-    try:
-        with open(PID_FILE, 'w') as f:
-            f.write(str(os.getpid()))
-    except Exception as e:
-        logging.error(f"Не удалось создать PID-файл: {e}")
-        sys.exit(1)
+    if migrated:
+        logging.info(f"Перенесено заявок из папки в журнал: {migrated}.")
+    return migrated
 
 
-def main():
-    """Основная функция-обработчик."""
-    if is_another_instance_running():
-        sys.exit(0)
+def collect_applications(records: list) -> list:
+    """
+    Сворачивает записи журнала в список пар (номер заявки, данные заявки).
+    Надгробие убирает заявку, если она еще не попала в книгу.
+    """
+    applications = {}
+    for record in records:
+        app_id = record.get('id')
+        if record.get('op') == OP_CREATE:
+            applications[app_id] = record.get('data') or {}
+        elif record.get('op') == OP_DELETE:
+            if applications.pop(app_id, None) is None:
+                logging.warning(f"Заявка {app_id} удалена в боте, но уже есть в книге. Удалите строку вручную.")
+    return list(applications.items())
+
+
+def prepare_workbook(manager: ExcelManager):
+    """
+    Готовит книгу к приему заявок: базовые листы, структура шаблона и листы событий.
+    Возвращает структуру шаблона или None, если ее не удалось прочитать.
+    """
+    setup_base_sheets(manager)
 
-    create_pid_file()
+    template_structure_data = manager.read_sheet_to_dict(TEMPLATE_STRUCTURE_SHEET_NAME, key_column='A')
+    if not template_structure_data:
+        logging.error("Не удалось считать структуру шаблона. Заявки не будут обработаны.")
+        return None
 
-    manager = None
+    init_excel_project(manager, template_structure_data)
+    return template_structure_data
+
+
+def ingest_journal(journal: ApplicationJournal = None, excel_file: str = None, backend=None) -> int:
+    """
+    Добавляет на листы событий все заявки из хвоста журнала за один цикл открытия/сохранения книги.
+    Чекпойнт журнала сдвигается только после сохранения книги. Заявки, которые не удалось
+    разложить по листам, откладываются в rejected.jsonl журнала.
+    excel_file — книга заявок, по умолчанию EXCEL_FILE.
+    backend — движок Excel ('xlwings', 'openpyxl'), по умолчанию DEFAULT_EXCEL_BACKEND.
+    Возвращает количество добавленных заявок.
+    RuntimeError означает, что книга не сохранена и хвост будет прочитан повторно.
+    """
+    lock = InstanceLock()
+    if not lock.acquire():
+        raise RuntimeError("Книга заявок уже обрабатывается другим процессом.")
     try:
-        if not os.path.exists(APPLICATIONS_DIR):
-            os.makedirs(APPLICATIONS_DIR, exist_ok=True)
-            logging.info(f"Создана директория для заявок: {APPLICATIONS_DIR}")
+        return _ingest_journal_locked(journal or ApplicationJournal(JOURNAL_DIR), excel_file or EXCEL_FILE, backend)
+    finally:
+        lock.release()
 
-        if not os.path.exists(PROCESSED_APPLICATIONS_DIR):
-            os.makedirs(PROCESSED_APPLICATIONS_DIR, exist_ok=True)
-            logging.info(f"Создана директория для обработанных заявок: {PROCESSED_APPLICATIONS_DIR}")
 
-        # excel_file = 'C:/Users/Nikolay/PycharmProjects/transfer_tg_bot/database/data/applications.xlsm'
-        excel_file = 'D:/sync/2 way BikeFit Lab - nikolay mac/transfer/transfer_tg_bot/database/data/applications.xlsm'
-        manager = ExcelManager(excel_file)
+def _ingest_journal_locked(journal: ApplicationJournal, excel_file: str, backend) -> int:
+    """ingest_journal под уже взятой InstanceLock."""
+    manager = None
+    try:
+        records, checkpoint = journal.read_tail(JOURNAL_CONSUMER)
+        applications = collect_applications(records)
+        if not applications:
+            journal.commit_checkpoint(JOURNAL_CONSUMER, checkpoint)
+            logging.info("Нет новых заявок для обработки.")
+            return 0
 
-        if not manager.workbook:
-            logging.error("Не удалось загрузить рабочую книгу Excel. Завершение работы.")
-            sys.exit(1)
+        # Без этой проверки движок молча создал бы пустую книгу без шаблона и листов событий
+        if not os.path.isfile(excel_file):
+            raise RuntimeError(f"Книга заявок {excel_file} не найдена.")
 
-        setup_base_sheets(manager)
+        manager = ExcelManager(excel_file, backend=backend)
+        if not manager.workbook:
+            raise RuntimeError("Не удалось загрузить рабочую книгу Excel.")
 
-        template_structure_data = manager.read_sheet_to_dict(TEMPLATE_STRUCTURE_SHEET_NAME, key_column='A')
+        template_structure_data = prepare_workbook(manager)
         if not template_structure_data:
-            logging.error("Не удалось считать структуру шаблона. Заявки не будут обработаны.")
             manager.save()
-            sys.exit(1)
+            raise RuntimeError("Не удалось считать структуру шаблона.")
 
-        init_excel_project(manager, template_structure_data)
+        processed = set(process_delivery_requests(manager, applications, template_structure_data))
 
-        json_files = [f for f in os.listdir(APPLICATIONS_DIR) if f.endswith('.json')]
-        if not json_files:
-            logging.info("Нет новых заявок для обработки.")
-        else:
-            for json_file_name in json_files:
-                json_file_path = os.path.join(APPLICATIONS_DIR, json_file_name)
-                logging.info(f"Найдена новая заявка: {json_file_name}. Начинаем обработку.")
-                try:
-                    with open(json_file_path, 'r', encoding='utf-8') as f:
-                        request_data = json.load(f)
-
-                    if process_new_delivery_request(manager, request_data, template_structure_data):
-                        processed_file_path = os.path.join(PROCESSED_APPLICATIONS_DIR, json_file_name)
-                        shutil.move(json_file_path, processed_file_path)
-                        logging.info(
-                            f"Заявка {json_file_name} успешно обработана и перемещена в '{PROCESSED_APPLICATIONS_DIR}'.")
-                    else:
-                        logging.error(f"Не удалось обработать заявку {json_file_name}.")
-                except (json.JSONDecodeError, FileNotFoundError, shutil.Error) as e:
-                    logging.error(
-                        f"Ошибка при чтении или перемещении файла {json_file_name}: {e}. Файл будет переименован.")
-                    os.rename(json_file_path, json_file_path + ".error")
-
-        manager.save()
+        if not manager.save():
+            raise RuntimeError(f"Не удалось сохранить файл {excel_file}.")
+
+        for app_id, request_data in applications:
+            if app_id not in processed:
+                logging.error(f"Не удалось обработать заявку {app_id}, она отложена в журнале.")
+                journal.reject(json.dumps({'id': app_id, 'data': request_data}, ensure_ascii=False, default=str))
+        journal.commit_checkpoint(JOURNAL_CONSUMER, checkpoint)
+        return len(processed)
 
     finally:
         if manager:
             manager.close()
-        if os.path.exists(PID_FILE):
-            os.remove(PID_FILE)
-            logging.info("PID-файл удален. Процесс завершен.")
+
+
+def main():
+    """Основная функция-обработчик."""
+    lock = InstanceLock()
+    if not lock.acquire():
+        logging.info("Книга заявок уже обрабатывается другим процессом.")
+        sys.exit(0)
+
+    journal = ApplicationJournal(JOURNAL_DIR)
+    try:
+        migrate_legacy_inbox(journal)
+        _ingest_journal_locked(journal, EXCEL_FILE, None)
+    except RuntimeError as e:
+        logging.error(f"{e} Завершение работы.")
+        sys.exit(1)
+    finally:
+        journal.close()
+        lock.release()
+    logging.info("Процесс завершен.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,256 @@
+import json
+import logging
+import os
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SEGMENT_SUFFIX = '.jsonl'
+REJECTED_FILE = 'rejected.jsonl'
+
+# Типы записей журнала
+OP_CREATE = 'create'
+OP_DELETE = 'delete'
+OP_STATUS = 'status'
+
+
+class ApplicationJournal:
+    """
+    Журнал заявок: append-only JSONL-сегменты в одной папке.
+
+    Каждая запись — одна строка {"op": ..., "id": ..., "data": {...}}. Удаление заявки
+    записывается отдельной записью-надгробием (op = "delete"), смена статуса — записью
+    op = "status" с data = {"status": ...}; старые строки не меняются.
+    Одновременные append из разных потоков разделяют один fsync (групповая фиксация).
+    Когда сегмент дорастает до segment_max_bytes, открывается следующий.
+
+    Потребители (например, выгрузка в Excel) читают только хвост журнала после
+    своего чекпойнта — пары (номер сегмента, смещение в байтах) — и фиксируют новый
+    чекпойнт после успешной обработки.
+
+    В одну папку журнала должен писать только один процесс; читать можно из любого.
+    """
+
+    def __init__(self, journal_dir: str, segment_max_bytes: int = 8 * 1024 * 1024):
+        self.journal_dir = journal_dir
+        self.segment_max_bytes = segment_max_bytes
+        os.makedirs(self.journal_dir, exist_ok=True)
+
+        self._lock = threading.Lock()       # порядок записей и ротация сегментов
+        self._sync_lock = threading.Lock()  # один fsync на группу записей
+        self._file = None
+        self._segment = None
+        self._size = 0
+        self._written = 0  # номер последней записанной строки
+        self._synced = 0   # номер последней строки, прошедшей fsync
+        # Потребитель -> испорченные строки последнего read_tail: (позиция за строкой, строка)
+        self._pending_rejects: Dict[str, List[Tuple[Tuple[int, int], str]]] = {}
+
+    # --- Сегменты ---
+
+    def _segment_path(self, segment: int) -> str:
+        return os.path.join(self.journal_dir, f"{segment:06d}{SEGMENT_SUFFIX}")
+
+    def segments(self) -> List[int]:
+        """Номера существующих сегментов по возрастанию."""
+        numbers = []
+        for name in os.listdir(self.journal_dir):
+            stem = name[:-len(SEGMENT_SUFFIX)]
+            if name.endswith(SEGMENT_SUFFIX) and stem.isdigit():
+                numbers.append(int(stem))
+        return sorted(numbers)
+
+    def _open_segment(self, segment: int):
+        path = self._segment_path(segment)
+        self._file = open(path, 'ab')
+        self._segment = segment
+        self._size = self._file.tell()
+
+    def _open_for_append(self):
+        """Открывает последний сегмент, отрезая недописанную строку после аварийной остановки."""
+        segments = self.segments()
+        segment = segments[-1] if segments else 1
+        path = self._segment_path(segment)
+        if os.path.exists(path):
+            with open(path, 'rb+') as f:
+                data = f.read()
+                valid_size = data.rfind(b'\n') + 1
+                if valid_size < len(data):
+                    logger.warning(f"Отрезан недописанный хвост сегмента {path}: {len(data) - valid_size} байт.")
+                    f.truncate(valid_size)
+        self._open_segment(segment)
+
+    def _rotate(self):
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        # Все строки закрытого сегмента уже на диске
+        self._synced = self._written
+        self._open_segment(self._segment + 1)
+        logger.info(f"Журнал заявок: открыт новый сегмент {self._segment_path(self._segment)}")
+
+    # --- Запись ---
+
+    def append(self, op: str, record_id, data: Optional[dict] = None) -> Tuple[int, int]:
+        """
+        Дописывает запись и возвращает управление только после fsync.
+        Возвращает позицию записи (сегмент, смещение) для read_at.
+        """
+        line = json.dumps({'op': op, 'id': record_id, 'data': data}, ensure_ascii=False, default=str)
+        payload = (line + '\n').encode('utf-8')
+
+        with self._lock:
+            if self._file is None:
+                self._open_for_append()
+            elif self._size and self._size + len(payload) > self.segment_max_bytes:
+                self._rotate()
+            position = (self._segment, self._size)
+            self._file.write(payload)
+            self._file.flush()
+            self._size += len(payload)
+            self._written += 1
+            seq = self._written
+
+        self._sync(seq)
+        return position
+
+    def _sync(self, seq: int):
+        with self._sync_lock:
+            # Пока мы ждали, fsync другого потока мог уже покрыть нашу запись
+            if self._synced >= seq:
+                return
+            with self._lock:
+                target = self._written
+                # Копия дескриптора переживет ротацию сегмента во время fsync
+                fd = os.dup(self._file.fileno())
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+            self._synced = max(self._synced, target)
+
+    def append_application(self, app_id, data: dict) -> Tuple[int, int]:
+        return self.append(OP_CREATE, app_id, data)
+
+    def append_tombstone(self, app_id) -> Tuple[int, int]:
+        return self.append(OP_DELETE, app_id)
+
+    def append_status(self, app_id, status: str) -> Tuple[int, int]:
+        return self.append(OP_STATUS, app_id, {'status': status})
+
+    def close(self):
+        with self._lock:
+            if self._file:
+                self._file.flush()
+                os.fsync(self._file.fileno())
+                self._file.close()
+                self._file = None
+
+    # --- Чтение ---
+
+    def _checkpoint_path(self, consumer: str) -> str:
+        return os.path.join(self.journal_dir, f"checkpoint_{consumer}.json")
+
+    def load_checkpoint(self, consumer: str) -> Tuple[int, int]:
+        """Позиция, до которой потребитель уже обработал журнал: (сегмент, смещение)."""
+        try:
+            with open(self._checkpoint_path(consumer), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return int(data['segment']), int(data['offset'])
+        except FileNotFoundError:
+            return 0, 0
+
+    def commit_checkpoint(self, consumer: str, checkpoint: Tuple[int, int]):
+        """Атомарно сохраняет чекпойнт потребителя."""
+        path = self._checkpoint_path(consumer)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'segment': checkpoint[0], 'offset': checkpoint[1]}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+        # Испорченные строки до чекпойнта потребитель больше не прочитает: откладываем их один раз
+        pending = self._pending_rejects.pop(consumer, [])
+        for position, line in pending:
+            if position <= checkpoint:
+                self.reject(line)
+        remaining = [item for item in pending if item[0] > checkpoint]
+        if remaining:
+            self._pending_rejects[consumer] = remaining
+
+    def _lines(self, checkpoint: Tuple[int, int]) -> Iterator[Tuple[Tuple[int, int], Tuple[int, int], bytes]]:
+        """Полные строки после checkpoint: (позиция строки, позиция сразу за ней, строка)."""
+        start_segment, offset = checkpoint
+        for segment in [s for s in self.segments() if s >= start_segment]:
+            if segment != start_segment:
+                offset = 0
+            with open(self._segment_path(segment), 'rb') as f:
+                f.seek(offset)
+                data = f.read()
+            # Недописанная последняя строка будет прочитана в следующий раз
+            data = data[:data.rfind(b'\n') + 1]
+
+            for raw_line in data.splitlines(keepends=True):
+                start = (segment, offset)
+                offset += len(raw_line)
+                yield start, (segment, offset), raw_line
+
+    def read_from(self, checkpoint: Tuple[int, int] = (0, 0), limit: Optional[int] = None,
+                  corrupt: Optional[list] = None) -> Tuple[List[dict], Tuple[int, int]]:
+        """
+        Последовательно читает полные строки после checkpoint.
+        Возвращает записи и позицию сразу за последней прочитанной строкой.
+        Испорченные строки пропускаются; если передан список corrupt, в него добавляются
+        пары (позиция за строкой, строка).
+        """
+        records = []
+        position = checkpoint
+        for start, end, raw_line in self._lines(checkpoint):
+            if limit is not None and len(records) >= limit:
+                break
+            position = end
+            try:
+                records.append(json.loads(raw_line))
+            except ValueError as e:
+                logger.error(f"Испорченная строка в сегменте {start[0]} журнала (смещение {start[1]}): {e}")
+                if corrupt is not None:
+                    corrupt.append((end, raw_line.decode('utf-8', errors='replace').rstrip('\n')))
+        return records, position
+
+    def read_indexed(self, checkpoint: Tuple[int, int] = (0, 0)) -> List[Tuple[Tuple[int, int], dict]]:
+        """Записи после checkpoint вместе с позицией каждой строки (для read_at). Испорченные пропускаются."""
+        indexed = []
+        for start, _, raw_line in self._lines(checkpoint):
+            try:
+                indexed.append((start, json.loads(raw_line)))
+            except ValueError as e:
+                logger.error(f"Испорченная строка в сегменте {start[0]} журнала (смещение {start[1]}): {e}")
+        return indexed
+
+    def read_at(self, position: Tuple[int, int]) -> Optional[dict]:
+        """Одна запись по позиции из append или read_indexed; None, если строка не читается."""
+        segment, offset = position
+        try:
+            with open(self._segment_path(segment), 'rb') as f:
+                f.seek(offset)
+                return json.loads(f.readline())
+        except (OSError, ValueError) as e:
+            logger.error(f"Не удалось прочитать запись журнала в сегменте {segment} (смещение {offset}): {e}")
+            return None
+
+    def read_tail(self, consumer: str, limit: Optional[int] = None) -> Tuple[List[dict], Tuple[int, int]]:
+        """
+        Читает записи, еще не обработанные потребителем consumer.
+        Испорченные строки откладываются в rejected.jsonl, когда commit_checkpoint сдвинет чекпойнт за них.
+        """
+        corrupt = []
+        records, position = self.read_from(self.load_checkpoint(consumer), limit, corrupt)
+        self._pending_rejects[consumer] = corrupt
+        return records, position
+
+    def reject(self, line: str):
+        """Откладывает запись, которую потребитель не смог обработать, в rejected.jsonl."""
+        with open(os.path.join(self.journal_dir, REJECTED_FILE), 'a', encoding='utf-8') as f:
+            f.write(line + '\n')
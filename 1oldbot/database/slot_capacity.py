@@ -0,0 +1,102 @@
+# database/slot_capacity.py
+import logging
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+from oldbot.database.journal import OP_CREATE, OP_DELETE
+
+logger = logging.getLogger(__name__)
+
+# (ID события, название точки, ключ даты слота)
+SlotKey = Tuple[str, str, str]
+
+
+class SlotFullError(Exception):
+    """На выбранный слот не осталось мест."""
+
+    def __init__(self, slot_key: SlotKey, capacity: int):
+        super().__init__(f"Слот {slot_key} заполнен (мест: {capacity})")
+        self.slot_key = slot_key
+        self.capacity = capacity
+
+
+def slot_key_for(application: dict) -> Optional[SlotKey]:
+    """Ключ слота заявки или None, если в заявке нет события, точки или даты."""
+    event_id = application.get('event_id')
+    # В старых заявках название точки записано в поле 'date'
+    point_name = application.get('point_name') or application.get('date')
+    date_key = application.get('selected_date')
+    if not event_id or not point_name or not date_key:
+        return None
+    return str(event_id), point_name, date_key
+
+
+class SlotCapacityTracker:
+    """
+    Счетчики занятых мест по (событие, точка, дата).
+
+    Источник истины — журнал заявок: при старте счетчики восстанавливаются через replay(),
+    а дальше меняются вместе с каждой записью в журнал. reserve() проверяет и занимает место
+    одним шагом под блокировкой, поэтому одновременные подтверждения не превышают лимит.
+    Бронь привязана к ID заявки, так что повторное освобождение одной заявки ничего не меняет.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # ID события -> (точка, дата) -> число заявок
+        self._counts: Dict[str, Dict[Tuple[str, str], int]] = {}
+        self._reservations: Dict[Any, SlotKey] = {}
+
+    def replay(self, records: Iterable[dict]):
+        """Восстанавливает счетчики по записям журнала (создания и надгробия заявок)."""
+        with self._lock:
+            self._counts.clear()
+            self._reservations.clear()
+            for record in records:
+                if record.get('op') == OP_CREATE:
+                    key = slot_key_for(record.get('data') or {})
+                    if key is not None:
+                        self._add(record.get('id'), key)
+                elif record.get('op') == OP_DELETE:
+                    self._remove(record.get('id'))
+        logger.info(f"Счетчики мест восстановлены по журналу: заявок со слотом {len(self._reservations)}")
+
+    def _add(self, app_id, key: SlotKey):
+        self._remove(app_id)
+        self._reservations[app_id] = key
+        event_counts = self._counts.setdefault(key[0], {})
+        event_counts[key[1:]] = event_counts.get(key[1:], 0) + 1
+
+    def _remove(self, app_id) -> bool:
+        key = self._reservations.pop(app_id, None)
+        if key is None:
+            return False
+        event_counts = self._counts[key[0]]
+        event_counts[key[1:]] -= 1
+        if not event_counts[key[1:]]:
+            del event_counts[key[1:]]
+            if not event_counts:
+                del self._counts[key[0]]
+        return True
+
+    def reserve(self, app_id, key: SlotKey, capacity: Optional[int]):
+        """
+        Занимает место в слоте под заявку app_id. capacity None или 0 — без ограничения.
+        Бросает SlotFullError, если мест нет.
+        """
+        with self._lock:
+            if capacity and self.count(key) >= capacity:
+                raise SlotFullError(key, capacity)
+            self._add(app_id, key)
+
+    def release(self, app_id) -> bool:
+        """Освобождает место заявки. Возвращает False, если у заявки не было брони."""
+        with self._lock:
+            return self._remove(app_id)
+
+    def count(self, key: SlotKey) -> int:
+        return self._counts.get(key[0], {}).get(key[1:], 0)
+
+    def booked(self, event_id) -> Dict[Tuple[str, str], int]:
+        """Занятые места события: (точка, дата) -> число заявок."""
+        with self._lock:
+            return dict(self._counts.get(str(event_id), {}))
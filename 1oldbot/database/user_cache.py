@@ -0,0 +1,77 @@
+# database/user_cache.py
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional, Tuple
+
+# Признак промаха: None в кэше — это закэшированное "пользователя нет"
+MISSING = object()
+
+
+class TTLLRUCache:
+    """
+    Кэш с ограничением по времени жизни записи (ttl, секунды) и по размеру (maxsize, вытесняется
+    давно не использованная запись). Кэширует и отсутствие значения (None).
+
+    Защита от гонки "чтение с диска — запись — кэш": invalidate() увеличивает поколение кэша,
+    а put() с поколением, полученным до чтения, игнорируется, если за это время была запись.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: float = 600.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def generation(self) -> int:
+        return self._generation
+
+    def get(self, key: Hashable) -> Any:
+        """Значение из кэша или MISSING."""
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and item[0] > time.monotonic():
+                self._data.move_to_end(key)
+                self.hits += 1
+                return item[1]
+            if item is not None:
+                del self._data[key]
+            self.misses += 1
+            return MISSING
+
+    def put(self, key: Hashable, value: Any, generation: Optional[int] = None):
+        """Кладет значение. generation — поколение на момент начала чтения (см. описание класса)."""
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key: Hashable):
+        with self._lock:
+            self._generation += 1
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / requests, 3) if requests else 0.0,
+            }
@@ -1,27 +1,47 @@
 import asyncio
+import contextlib
 import logging
 from aiogram import Bot, Dispatcher
-from aiogram.fsm.storage.memory import MemoryStorage  # Пока Memory, потом Redis подключим
 
 # Импорты наших модулей
 import config
-from database.excel_impl import ExcelRepository
+from database.excel_export import export_applications, run_periodic_export
+from database.factory import create_repository
+from database.sqlite_impl import SQLiteRepository
+from services.fsm_storage import create_fsm_storage
+from services.io_executor import IOExecutor
+from services.webhook import run_webhook
 
 # Настройка логирования
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-async def main():
+async def create_bot_runtime(worker_id: int = 0):
+    """
+    Создает бота, диспетчер и зависимости одного процесса.
+    Возвращает (bot, dp, cleanup), где cleanup — корутина корректного завершения.
+    Фоновые задачи, которые должны идти в одном экземпляре, запускает только воркер 0.
+    """
     logger.info("Инициализация бота...")
 
     # 1. Инициализация Базы Данных
-    # Бот создает экземпляр репозитория один раз и передает его в хендлеры
-    repo = ExcelRepository(config.EXCEL_DB_PATH)
+    # Бот создает экземпляр репозитория один раз и передает его в хендлеры.
+    # Блокирующий I/O репозитория выполняется в отдельных потоках, а не в event loop
+    io_executor = IOExecutor(read_workers=config.IO_READ_WORKERS)
+    repo = create_repository(io_executor)
+
+    # С SQLite таблица для менеджеров пересобирается из базы фоновой выгрузкой
+    export_task = None
+    if worker_id == 0 and isinstance(repo, SQLiteRepository) and config.EXCEL_EXPORT_INTERVAL > 0:
+        export_task = asyncio.create_task(
+            run_periodic_export(repo, config.EXCEL_EXPORT_PATH, config.EXCEL_EXPORT_INTERVAL)
+        )
 
     # 2. Бот и Диспетчер
     bot = Bot(token=config.BOT_TOKEN)
-    dp = Dispatcher(storage=MemoryStorage())
+    # Состояния диалогов: в памяти или в Redis (config.FSM_STORAGE)
+    dp = Dispatcher(storage=create_fsm_storage())
 
     # 3. Внедрение зависимостей (Dependency Injection)
     # Это крутая штука: теперь в любом хендлере можно получить `repo`
@@ -32,13 +52,43 @@ async def main():
     # dp.include_router(common.router)
     # dp.include_router(registration.router)
 
+    async def cleanup():
+        if export_task:
+            export_task.cancel()
+            # Дожидаемся остановки: периодическая выгрузка не должна читать репозиторий после close()
+            with contextlib.suppress(asyncio.CancelledError):
+                await export_task
+            # Финальная выгрузка, чтобы Excel содержал все заявки на момент остановки
+            try:
+                await export_applications(repo, config.EXCEL_EXPORT_PATH)
+            except Exception as e:
+                logger.error(f"Не удалось выгрузить заявки в Excel при остановке: {e}")
+        # Дописываем отложенные изменения репозитория до выхода
+        await repo.close()
+        io_executor.shutdown()
+        await dp.storage.close()
+        await bot.session.close()
+
+    return bot, dp, cleanup
+
+
+async def main():
+    bot, dp, cleanup = await create_bot_runtime()
+
     logger.info("Бот запущен!")
     await bot.delete_webhook(drop_pending_updates=True)
-    await dp.start_polling(bot)
+    try:
+        await dp.start_polling(bot)
+    finally:
+        await cleanup()
 
 
 if __name__ == "__main__":
-    try:
-        asyncio.run(main())
-    except KeyboardInterrupt:
-        logger.info("Бот остановлен")
+    if config.BOT_MODE == "webhook":
+        # Excel-репозиторий не рассчитан на запись из нескольких процессов: несколько воркеров — только с SQLite
+        run_webhook(create_bot_runtime, single_writer=config.DB_BACKEND != "sqlite")
+    else:
+        try:
+            asyncio.run(main())
+        except KeyboardInterrupt:
+            logger.info("Бот остановлен")
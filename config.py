@@ -6,10 +6,75 @@ load_dotenv()
 
 BOT_TOKEN = os.getenv("BOT_TOKEN")
 
+# Хранилище данных: "excel" (один .xlsx файл) или "sqlite"
+DB_BACKEND = os.getenv("DB_BACKEND", "excel").lower()
+
 # Путь к файлу Excel (база данных)
 # Используем raw-строку (r"path") или слеши /, чтобы не было проблем на Windows/Mac
 EXCEL_DB_PATH = os.getenv("EXCEL_DB_PATH", "database/data/clients.xlsx")
 
+# In-memory режим ExcelRepository: клиенты читаются один раз при старте,
+# а изменения записываются в файл пачкой не чаще, чем раз в EXCEL_FLUSH_INTERVAL секунд
+EXCEL_IN_MEMORY = os.getenv("EXCEL_IN_MEMORY", "false").lower() in ("1", "true", "yes")
+EXCEL_FLUSH_INTERVAL = float(os.getenv("EXCEL_FLUSH_INTERVAL", 5))
+
+# Новые строки ExcelRepository дописываются в дельту (JSONL рядом с книгой) вместо пересохранения книги.
+# Дельта переносится в книгу не чаще раза в EXCEL_COMPACT_INTERVAL секунд и при остановке бота.
+# Пустой EXCEL_DELTA_PATH отключает дельту
+EXCEL_DELTA_PATH = os.getenv("EXCEL_DELTA_PATH", "database/data/clients.delta.jsonl")
+EXCEL_COMPACT_INTERVAL = float(os.getenv("EXCEL_COMPACT_INTERVAL", 60))
+
+# SQLite-хранилище и выгрузка заявок из него в Excel для менеджеров.
+# EXCEL_EXPORT_INTERVAL — период фоновой выгрузки в секундах, 0 — только по требованию
+SQLITE_DB_PATH = os.getenv("SQLITE_DB_PATH", "database/data/bot.sqlite3")
+EXCEL_EXPORT_PATH = os.getenv("EXCEL_EXPORT_PATH", "database/data/applications_export.xlsx")
+EXCEL_EXPORT_INTERVAL = float(os.getenv("EXCEL_EXPORT_INTERVAL", 300))
+
+# Пулы потоков для файлового I/O: один поток-писатель и пул читателей
+IO_READ_WORKERS = int(os.getenv("IO_READ_WORKERS", 4))
+
 # Настройки Redis (если будем использовать)
 REDIS_HOST = os.getenv("REDIS_HOST", "localhost")
-REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
\ No newline at end of file
+REDIS_PORT = int(os.getenv("REDIS_PORT", 6379))
+REDIS_DB = int(os.getenv("REDIS_DB", 0))
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))
+
+# Хранилище состояний диалогов: "memory" или "redis" (общее для нескольких процессов бота).
+# FSM_DEFAULT_TTL — через сколько секунд без активности брошенный диалог удаляется (0 — никогда).
+# FSM_STATE_TTLS — TTL для отдельных состояний или групп, например "RegistrationFSM=3600,TransferFSM:choosing_event=600"
+FSM_STORAGE = os.getenv("FSM_STORAGE", "memory").lower()
+FSM_DEFAULT_TTL = int(os.getenv("FSM_DEFAULT_TTL", 86400))
+FSM_STATE_TTLS = os.getenv("FSM_STATE_TTLS", "")
+
+# Режим получения апдейтов: "polling" или "webhook" (входной aiohttp-сервер + процессы-обработчики).
+# WEBHOOK_URL — внешний адрес бота (https://...), по нему Telegram присылает апдейты на WEBHOOK_PATH.
+# WEBHOOK_WORKERS — число процессов-обработчиков (0 — по числу ядер, не больше 32); апдейты одного
+# пользователя всегда попадают в один процесс, поэтому обрабатываются по порядку.
+# С Excel-хранилищем и в старом боте процесс всегда один.
+BOT_MODE = os.getenv("BOT_MODE", "polling").lower()
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", 40))
+WEBAPP_HOST = os.getenv("WEBAPP_HOST", "127.0.0.1")
+WEBAPP_PORT = int(os.getenv("WEBAPP_PORT", 8080))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", 0))
+WEBHOOK_WORKER_LANES = int(os.getenv("WEBHOOK_WORKER_LANES", 16))
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", 10000))
+
+# Обработка апдейтов: разные пользователи обрабатываются параллельно, но не более
+# UPDATE_CONCURRENCY_LIMIT апдейтов одновременно; апдейты одного пользователя — по очереди.
+# CALLBACK_DEDUP_TTL — сколько секунд помнить callback.id, чтобы отбросить повторную доставку
+UPDATE_CONCURRENCY_LIMIT = int(os.getenv("UPDATE_CONCURRENCY_LIMIT", 100))
+CALLBACK_DEDUP_TTL = float(os.getenv("CALLBACK_DEDUP_TTL", 60))
+
+# Кэш профилей клиентов старого бота (db_stubs.get_user): запись живет USER_CACHE_TTL секунд,
+# не больше USER_CACHE_SIZE записей; сбрасывается при сохранении профиля
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", 1800))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", 10000))
+
+# Номер узла для генератора ID заявок (0-31): у каждого бота или сервера, пишущего заявки, свой.
+# Номер процесса берется из WORKER_ID, поэтому в webhook-режиме не больше 32 процессов-обработчиков
+ID_NODE = int(os.getenv("ID_NODE", 0))
+# Узел SimpleBot: он пишет в тот же журнал заявок одним процессом, поэтому номер должен отличаться от ID_NODE
+SIMPLEBOT_ID_NODE = int(os.getenv("SIMPLEBOT_ID_NODE", 1))
@@ -1,15 +1,27 @@
 from abc import ABC, abstractmethod
 from typing import Optional
+from services.io_executor import IOExecutor
 from models.domain import ClientProfile, TransferApplication
 
 
 class Repository(ABC):
 
+    def __init__(self, io_executor: Optional[IOExecutor] = None):
+        # Все блокирующие операции реализаций выполняются через общий IO-executor,
+        # чтобы не останавливать event loop бота
+        self._owns_io = io_executor is None
+        self.io = io_executor or IOExecutor()
+
     @abstractmethod
     async def get_user(self, user_id: int) -> Optional[ClientProfile]:
         """Получить пользователя по ID. Вернет None, если не найден."""
         pass
 
+    @abstractmethod
+    async def get_user_by_phone(self, phone_number: str) -> Optional[ClientProfile]:
+        """Получить пользователя по номеру телефона. Вернет None, если не найден."""
+        pass
+
     @abstractmethod
     async def save_user(self, user: ClientProfile) -> bool:
         """Сохранить или обновить пользователя."""
@@ -18,4 +30,9 @@ class Repository(ABC):
     @abstractmethod
     async def create_application(self, application: TransferApplication) -> bool:
         """Создать новую заявку."""
-        pass
\ No newline at end of file
+        pass
+
+    async def close(self) -> None:
+        """Завершить работу: дописать отложенные изменения и освободить ресурсы."""
+        if self._owns_io:
+            self.io.shutdown()
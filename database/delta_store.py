@@ -0,0 +1,129 @@
+import json
+import logging
+import os
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Типы записей дельты
+KIND_USER = 'user'
+KIND_APPLICATION = 'application'
+
+# (тип записи, строка листа в порядке колонок)
+DeltaRecord = Tuple[str, list]
+
+
+class DeltaStore:
+    """
+    Небольшое append-only хранилище новых строк рядом с Excel-файлом.
+
+    Каждая запись — одна строка JSONL {"kind": "user" | "application", "row": [...]}, где row —
+    строка листа в том же порядке колонок, что и в книге. Добавление записи стоит одного
+    дописывания в конец файла и не зависит от размера книги. Поверх записей держится
+    индекс клиентов (user_id -> последняя строка), чтобы чтения видели данные, которые
+    еще не перенесены в книгу.
+
+    Перенос в книгу (компакция) делает владелец: берет snapshot(), применяет записи к книге
+    и вызывает discard() с числом перенесенных записей.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._records: List[DeltaRecord] = []
+        self._users: Dict[Any, list] = {}
+        self._file = None
+        self._load()
+
+    def _load(self):
+        """Читает записи с диска, отрезая недописанную строку после аварийной остановки."""
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            valid_size = data.rfind(b'\n') + 1
+            if valid_size < len(data):
+                logger.warning(f"Отрезан недописанный хвост дельты {self.path}: {len(data) - valid_size} байт.")
+                f.truncate(valid_size)
+        for line in data[:valid_size].splitlines():
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            self._add(record['kind'], record['row'])
+        if self._records:
+            logger.info(f"В дельте {self.path} найдено записей: {len(self._records)}")
+
+    def _add(self, kind: str, row: list):
+        self._records.append((kind, row))
+        if kind == KIND_USER:
+            self._users[row[0]] = row
+
+    def _open(self):
+        if self._file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, 'ab')
+        return self._file
+
+    def append(self, kind: str, row: list):
+        """Дописывает запись и фиксирует ее на диске (fsync)."""
+        line = json.dumps({'kind': kind, 'row': row}, ensure_ascii=False, default=str) + '\n'
+        with self._lock:
+            f = self._open()
+            f.write(line.encode('utf-8'))
+            f.flush()
+            os.fsync(f.fileno())
+            self._add(kind, row)
+
+    def get_user_row(self, user_id) -> Optional[list]:
+        """Последняя строка клиента из дельты или None."""
+        with self._lock:
+            return self._users.get(user_id)
+
+    def user_rows(self) -> Dict[Any, list]:
+        with self._lock:
+            return dict(self._users)
+
+    def snapshot(self) -> List[DeltaRecord]:
+        with self._lock:
+            return list(self._records)
+
+    def discard(self, count: int):
+        """
+        Удаляет первые count записей, уже перенесенных в книгу. Оставшиеся (пришедшие
+        во время компакции) переписываются в файл дельты атомарно.
+        """
+        with self._lock:
+            rest = self._records[count:]
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+            if rest:
+                tmp_path = f"{self.path}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    for kind, row in rest:
+                        line = json.dumps({'kind': kind, 'row': row}, ensure_ascii=False, default=str) + '\n'
+                        f.write(line.encode('utf-8'))
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, self.path)
+            elif os.path.exists(self.path):
+                os.remove(self.path)
+
+            self._records = []
+            self._users = {}
+            for kind, row in rest:
+                self._add(kind, row)
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._records)
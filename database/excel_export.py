@@ -0,0 +1,112 @@
+import asyncio
+import logging
+import os
+import re
+from typing import Any, Dict, List
+import openpyxl
+
+logger = logging.getLogger(__name__)
+
+# Колонки листа события в том же порядке, что и "Структура шаблона" в applications.xlsm
+EXPORT_COLUMNS = [
+    ("номер заявки", "id"),
+    ("фио", "full_name"),
+    ("телефон", "phone_number"),
+    ("почта", None),
+    ("телеграм id", "user_id"),
+    ("паспорт номер", "passport_series_number"),
+    ("паспорт адрес", "registration_address"),
+    ("паспорт дата", "passport_date_of_issue"),
+    ("дата заявки", "created_at"),
+    ("дата сдачи", "dropoff_date"),
+    ("дата забора", None),
+    ("место сдачи", "dropoff_point"),
+    ("место забора", None),
+    ("надо ТО", "tech_service_needed"),
+    ("комментарии", "comment"),
+    ("общий комментарий", None),
+]
+EMPTY_SHEET_TITLE = "Заявки"
+
+
+def _sheet_title(event_name: str) -> str:
+    """Имя листа Excel: без запрещенных символов и не длиннее 31 символа."""
+    title = re.sub(r'[\[\]:*?/\\]', ' ', event_name or EMPTY_SHEET_TITLE).strip()
+    return title[:31] or EMPTY_SHEET_TITLE
+
+
+def _export_value(row: Dict[str, Any], key: str):
+    value = row.get(key)
+    if key == "tech_service_needed":
+        return "Да" if value else "Нет"
+    return value
+
+
+def write_applications_workbook(rows: List[Dict[str, Any]], export_path: str) -> int:
+    """
+    Строит книгу с листом на каждое событие за один проход по заявкам.
+    Файл подменяется атомарно, чтобы менеджеры не открыли недописанную книгу.
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    headers = [title for title, _ in EXPORT_COLUMNS]
+    sheets = {}
+
+    for row in rows:
+        title = _sheet_title(row.get("event_name"))
+        sheet = sheets.get(title)
+        if sheet is None:
+            sheet = workbook.create_sheet(title)
+            sheet.append(headers)
+            sheets[title] = sheet
+        sheet.append([_export_value(row, key) if key else None for _, key in EXPORT_COLUMNS])
+
+    if not sheets:
+        workbook.create_sheet(EMPTY_SHEET_TITLE).append(headers)
+
+    export_dir = os.path.dirname(export_path)
+    if export_dir:
+        os.makedirs(export_dir, exist_ok=True)
+    tmp_path = f"{export_path}.tmp"
+    workbook.save(tmp_path)
+    os.replace(tmp_path, export_path)
+    return len(rows)
+
+
+async def export_applications(repo, export_path: str) -> int:
+    """Выгружает все заявки из репозитория в Excel. Возвращает количество выгруженных заявок."""
+    rows = await repo.list_applications_for_export()
+    # Запись книги не трогает базу, поэтому не занимает поток-писатель репозитория
+    count = await asyncio.to_thread(write_applications_workbook, rows, export_path)
+    logger.info(f"Выгружено заявок в {export_path}: {count}")
+    return count
+
+
+async def run_periodic_export(repo, export_path: str, interval: float):
+    """Фоновая задача: периодически пересобирает Excel-выгрузку из базы."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await export_applications(repo, export_path)
+        except Exception as e:
+            logger.error(f"Ошибка при выгрузке заявок в Excel: {e}")
+
+
+def main():
+    """Разовая выгрузка по требованию: python -m database.excel_export"""
+    import config
+    from database.sqlite_impl import SQLiteRepository
+
+    logging.basicConfig(level=logging.INFO)
+
+    async def _run():
+        repo = SQLiteRepository(config.SQLITE_DB_PATH)
+        try:
+            await export_applications(repo, config.EXCEL_EXPORT_PATH)
+        finally:
+            await repo.close()
+
+    asyncio.run(_run())
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,75 @@
+import asyncio
+import logging
 import os
 import openpyxl
-from typing import Optional
+from typing import Dict, List, Optional, Tuple
 from database.abstract import Repository
+from database.delta_store import DeltaStore, KIND_APPLICATION, KIND_USER
+from services.io_executor import IOExecutor
 from models.domain import ClientProfile, TransferApplication
 
+logger = logging.getLogger(__name__)
+
+CLIENT_HEADERS = ["user_id", "username", "full_name", "phone", "passport", "address"]
+APPLICATION_HEADERS = ["id", "user_id", "event", "date", "service", "comment"]
+
+
+def normalize_phone(phone_number) -> str:
+    """Оставляет в номере телефона только цифры, чтобы индекс не зависел от формата ввода."""
+    return ''.join(filter(str.isdigit, str(phone_number or '')))
+
 
 class ExcelRepository(Repository):
-    def __init__(self, file_path: str):
+    """
+    Репозиторий поверх Excel-файла.
+
+    По умолчанию каждый вызов открывает файл заново. В режиме in_memory лист клиентов
+    читается один раз при старте, чтения обслуживаются из словаря, а изменения
+    копятся и записываются в файл пачкой не чаще одного раза за flush_interval секунд.
+    В этом режиме бот считается единственным владельцем файла.
+
+    Если задан delta_path, новые и измененные строки не переписывают книгу, а дописываются
+    в DeltaStore, и стоимость записи не растет с историей заявок. Чтения видят дельту поверх
+    книги. Дельта переносится в книгу (компакция) не чаще раза в compact_interval секунд,
+    по вызову compact() (например, перед тем как отдать файл менеджерам) и при остановке.
+    Незавершенная дельта после аварийной остановки переносится при старте.
+
+    Все обращения к файлу выполняются через IOExecutor: чтения в пуле читателей,
+    записи в единственном потоке-писателе.
+    """
+
+    def __init__(self, file_path: str, in_memory: bool = False, flush_interval: float = 5.0,
+                 io_executor: Optional[IOExecutor] = None, delta_path: Optional[str] = None,
+                 compact_interval: float = 60.0):
+        super().__init__(io_executor)
         self.file_path = file_path
+        self.in_memory = in_memory
+        self.flush_interval = flush_interval
+        self.compact_interval = compact_interval
         self._ensure_file_exists()
 
+        self.delta: Optional[DeltaStore] = None
+        self._compact_task: Optional[asyncio.Task] = None
+        if delta_path:
+            self.delta = DeltaStore(delta_path)
+            if len(self.delta):
+                self._compact_sync()
+
+        # Индексы in-memory режима
+        self._clients: Dict[int, ClientProfile] = {}
+        self._phone_index: Dict[str, int] = {}
+        self._row_index: Dict[int, int] = {}  # user_id -> номер строки на листе Clients
+        self._next_row = 2
+
+        # Отложенные изменения, которые ждут записи на диск
+        self._dirty_user_ids: set = set()
+        self._pending_applications: List[TransferApplication] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self._flush_lock = asyncio.Lock()
+
+        if self.in_memory:
+            self._load_clients()
+
     def _ensure_file_exists(self):
         """Создает файл Excel и заголовки, если файла нет."""
         if not os.path.exists(self.file_path):
@@ -20,15 +80,293 @@ class ExcelRepository(Repository):
             # Лист Клиентов
             ws_clients = wb.active
             ws_clients.title = "Clients"
-            ws_clients.append(["user_id", "username", "full_name", "phone", "passport", "address"])
+            ws_clients.append(CLIENT_HEADERS)
 
             # Лист Заявок
             ws_apps = wb.create_sheet("Applications")
-            ws_apps.append(["id", "user_id", "event", "date", "service", "comment"])
+            ws_apps.append(APPLICATION_HEADERS)
 
             wb.save(self.file_path)
 
+    # --- Преобразование строк Excel <-> модели ---
+
+    @staticmethod
+    def _row_to_user(row) -> ClientProfile:
+        """Превращает строку Excel обратно в объект."""
+        row = list(row) + [None] * (len(CLIENT_HEADERS) - len(row))
+        return ClientProfile(
+            user_id=row[0],
+            username=row[1],
+            full_name=row[2],
+            phone_number=str(row[3]),
+            passport_series_number=row[4],
+            registration_address=row[5]
+        )
+
+    @staticmethod
+    def _user_to_row(user: ClientProfile) -> list:
+        return [
+            user.user_id,
+            user.username,
+            user.full_name,
+            user.phone_number,
+            user.passport_series_number,
+            user.registration_address
+        ]
+
+    @staticmethod
+    def _application_to_row(application: TransferApplication) -> list:
+        return [
+            application.id,
+            application.user_id,
+            application.event_name,
+            application.dropoff_date,
+            "Да" if application.tech_service_needed else "Нет",
+            application.comment
+        ]
+
+    # --- In-memory режим: загрузка и индексы ---
+
+    def _load_clients(self):
+        """Читает лист клиентов один раз и строит индексы по user_id и телефону."""
+        wb = openpyxl.load_workbook(self.file_path, read_only=True)
+        ws = wb["Clients"]
+
+        last_row = 1
+        for row_idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
+            if not row or row[0] is None:
+                continue
+            self._index_user(self._row_to_user(row), row_idx)
+            last_row = row_idx
+
+        wb.close()
+        self._next_row = last_row + 1
+        logger.info(f"Загружено клиентов в память: {len(self._clients)}")
+
+    def _index_user(self, user: ClientProfile, row_idx: int):
+        previous = self._clients.get(user.user_id)
+        if previous:
+            old_phone = normalize_phone(previous.phone_number)
+            if self._phone_index.get(old_phone) == user.user_id:
+                del self._phone_index[old_phone]
+
+        self._clients[user.user_id] = user
+        self._row_index[user.user_id] = row_idx
+        phone = normalize_phone(user.phone_number)
+        if phone:
+            self._phone_index[phone] = user.user_id
+
+    # --- Отложенная запись (write-behind) ---
+
+    def _has_pending_changes(self) -> bool:
+        return bool(self._dirty_user_ids or self._pending_applications)
+
+    def _schedule_flush(self):
+        """Запускает отложенную запись, если она еще не запланирована."""
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        # Изменения, пришедшие во время записи, уходят следующим проходом
+        while self._has_pending_changes():
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    def _write_batch(self, dirty_rows: Dict[int, Tuple[int, list]], applications: List[TransferApplication]):
+        """Записывает накопленные изменения за одно открытие/сохранение файла (или в дельту)."""
+        if self.delta is not None:
+            for _, row_data in dirty_rows.values():
+                self.delta.append(KIND_USER, row_data)
+            for application in applications:
+                self.delta.append(KIND_APPLICATION, self._application_to_row(application))
+            return
+
+        wb = openpyxl.load_workbook(self.file_path)
+        ws_clients = wb["Clients"]
+        for row_idx, row_data in dirty_rows.values():
+            for col, value in enumerate(row_data, start=1):
+                ws_clients.cell(row=row_idx, column=col, value=value)
+
+        ws_apps = wb["Applications"]
+        for application in applications:
+            ws_apps.append(self._application_to_row(application))
+
+        wb.save(self.file_path)
+        wb.close()
+
+    async def flush(self) -> bool:
+        """Сбрасывает накопленные изменения на диск. Возвращает False при ошибке записи."""
+        async with self._flush_lock:
+            if not self._has_pending_changes():
+                return True
+
+            dirty_rows = {
+                user_id: (self._row_index[user_id], self._user_to_row(self._clients[user_id]))
+                for user_id in self._dirty_user_ids
+            }
+            applications = self._pending_applications
+            self._dirty_user_ids = set()
+            self._pending_applications = []
+
+            try:
+                await self.io.write(self._write_batch, dirty_rows, applications)
+            except Exception as e:
+                logger.error(f"Ошибка при записи изменений в {self.file_path}: {e}")
+                # Возвращаем изменения в очередь, чтобы не потерять их
+                self._dirty_user_ids.update(dirty_rows.keys())
+                self._pending_applications = applications + self._pending_applications
+                return False
+
+            logger.debug(f"Записано в Excel: клиентов {len(dirty_rows)}, заявок {len(applications)}")
+            self._schedule_compaction()
+            return True
+
+    # --- Дельта и компакция ---
+
+    def _schedule_compaction(self):
+        """Запускает отложенный перенос дельты в книгу, если он еще не запланирован."""
+        if self.delta is not None and (self._compact_task is None or self._compact_task.done()):
+            self._compact_task = asyncio.create_task(self._delayed_compaction())
+
+    async def _delayed_compaction(self):
+        while self.delta is not None and len(self.delta):
+            await asyncio.sleep(self.compact_interval)
+            if not await self.compact():
+                return
+
+    def _compact_sync(self) -> int:
+        """
+        Переносит записи дельты в книгу за одно открытие/сохранение файла.
+        Клиенты обновляются по user_id, заявки с уже записанным ID пропускаются,
+        поэтому повторный перенос после сбоя не создает дублей.
+        """
+        records = self.delta.snapshot()
+        if not records:
+            return 0
+
+        wb = openpyxl.load_workbook(self.file_path)
+        ws_clients = wb["Clients"]
+        user_rows = {}
+        for row_idx, (user_id,) in enumerate(
+                ws_clients.iter_rows(min_row=2, max_col=1, values_only=True), start=2):
+            if user_id is not None:
+                user_rows[user_id] = row_idx
+
+        ws_apps = wb["Applications"]
+        application_ids = {app_id for (app_id,) in ws_apps.iter_rows(min_row=2, max_col=1, values_only=True)}
+
+        for kind, row_data in records:
+            if kind == KIND_USER:
+                row_idx = user_rows.get(row_data[0])
+                if row_idx is None:
+                    ws_clients.append(row_data)
+                    user_rows[row_data[0]] = ws_clients.max_row
+                else:
+                    for col, value in enumerate(row_data, start=1):
+                        ws_clients.cell(row=row_idx, column=col, value=value)
+            elif kind == KIND_APPLICATION and row_data[0] not in application_ids:
+                ws_apps.append(row_data)
+                application_ids.add(row_data[0])
+
+        # Книгу подменяем атомарно: оборванное сохранение не портит файл, а дельта остается
+        tmp_path = f"{self.file_path}.tmp"
+        wb.save(tmp_path)
+        wb.close()
+        os.replace(tmp_path, self.file_path)
+
+        self.delta.discard(len(records))
+        logger.info(f"Дельта перенесена в {self.file_path}: записей {len(records)}")
+        return len(records)
+
+    async def compact(self) -> bool:
+        """Переносит дельту в книгу. Возвращает False при ошибке записи (дельта сохраняется)."""
+        if self.delta is None or not len(self.delta):
+            return True
+        try:
+            await self.io.write(self._compact_sync)
+        except Exception as e:
+            logger.error(f"Ошибка при переносе дельты в {self.file_path}: {e}")
+            return False
+        return True
+
+    async def close(self) -> None:
+        if self._flush_task and not self._flush_task.done():
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+        if not await self.flush():
+            logger.error("Не удалось сохранить отложенные изменения при остановке.")
+        if self._compact_task and not self._compact_task.done():
+            self._compact_task.cancel()
+            try:
+                await self._compact_task
+            except asyncio.CancelledError:
+                pass
+        if self.delta is not None:
+            if not await self.compact():
+                logger.error("Дельта не перенесена в книгу при остановке, перенос будет выполнен при старте.")
+            self.delta.close()
+        await super().close()
+
+    # --- Методы репозитория ---
+
     async def get_user(self, user_id: int) -> Optional[ClientProfile]:
+        if self.in_memory:
+            return self._clients.get(user_id)
+        if self.delta is not None:
+            row = self.delta.get_user_row(user_id)
+            if row is not None:
+                return self._row_to_user(row)
+        return await self.io.read(self._get_user_sync, user_id)
+
+    async def get_user_by_phone(self, phone_number: str) -> Optional[ClientProfile]:
+        phone = normalize_phone(phone_number)
+        if not phone:
+            return None
+
+        if self.in_memory:
+            user_id = self._phone_index.get(phone)
+            return self._clients.get(user_id) if user_id is not None else None
+
+        # Строки из дельты новее книги: клиенты оттуда в книге не ищутся
+        delta_users = self.delta.user_rows() if self.delta is not None else {}
+        for row in delta_users.values():
+            if normalize_phone(row[3]) == phone:
+                return self._row_to_user(row)
+        return await self.io.read(self._get_user_by_phone_sync, phone, frozenset(delta_users))
+
+    async def save_user(self, user: ClientProfile) -> bool:
+        if self.in_memory:
+            row_idx = self._row_index.get(user.user_id)
+            if row_idx is None:
+                row_idx = self._next_row
+                self._next_row += 1
+            self._index_user(user, row_idx)
+            self._dirty_user_ids.add(user.user_id)
+            self._schedule_flush()
+            return True
+        if self.delta is not None:
+            await self.io.write(self.delta.append, KIND_USER, self._user_to_row(user))
+            self._schedule_compaction()
+            return True
+        return await self.io.write(self._save_user_sync, user)
+
+    async def create_application(self, application: TransferApplication) -> bool:
+        if self.in_memory:
+            self._pending_applications.append(application)
+            self._schedule_flush()
+            return True
+        if self.delta is not None:
+            await self.io.write(self.delta.append, KIND_APPLICATION, self._application_to_row(application))
+            self._schedule_compaction()
+            return True
+        return await self.io.write(self._create_application_sync, application)
+
+    # --- Блокирующие операции с файлом (выполняются в потоках IOExecutor) ---
+
+    def _get_user_sync(self, user_id: int) -> Optional[ClientProfile]:
         wb = openpyxl.load_workbook(self.file_path, read_only=True)
         ws = wb["Clients"]
 
@@ -36,43 +374,37 @@ class ExcelRepository(Repository):
         # Пропускаем заголовок (min_row=2)
         for row in ws.iter_rows(min_row=2, values_only=True):
             if row[0] == user_id:
-                # Превращаем строку Excel обратно в объект
-                found_user = ClientProfile(
-                    user_id=row[0],
-                    username=row[1],
-                    full_name=row[2],
-                    phone_number=str(row[3]),
-                    passport_series_number=row[4],
-                    registration_address=row[5]
-                )
+                found_user = self._row_to_user(row)
                 break
 
         wb.close()
         return found_user
 
-    async def save_user(self, user: ClientProfile) -> bool:
-        wb = openpyxl.load_workbook(self.file_path)
+    def _get_user_by_phone_sync(self, phone: str, skip_user_ids: frozenset = frozenset()) -> Optional[ClientProfile]:
+        wb = openpyxl.load_workbook(self.file_path, read_only=True)
         ws = wb["Clients"]
 
-        # Ищем, есть ли уже такой юзер, чтобы обновить (простая реализация - дописываем в конец пока что)
-        # В идеале тут нужен поиск строки и перезапись.
-        # Для старта сделаем: просто добавляем новую строку (или перезапишем, если реализуем поиск индекса)
+        found_user = None
+        for row in ws.iter_rows(min_row=2, values_only=True):
+            if len(row) > 3 and row[0] not in skip_user_ids and normalize_phone(row[3]) == phone:
+                found_user = self._row_to_user(row)
+                break
 
-        # Упрощенно: ищем строку
+        wb.close()
+        return found_user
+
+    def _save_user_sync(self, user: ClientProfile) -> bool:
+        wb = openpyxl.load_workbook(self.file_path)
+        ws = wb["Clients"]
+
+        # Ищем строку пользователя, чтобы обновить ее, иначе дописываем в конец
         target_row = None
         for idx, row in enumerate(ws.iter_rows(min_row=2, values_only=True), start=2):
             if row[0] == user.user_id:
                 target_row = idx
                 break
 
-        row_data = [
-            user.user_id,
-            user.username,
-            user.full_name,
-            user.phone_number,
-            user.passport_series_number,
-            user.registration_address
-        ]
+        row_data = self._user_to_row(user)
 
         if target_row:
             # Обновляем существующую
@@ -86,19 +418,12 @@ class ExcelRepository(Repository):
         wb.close()
         return True
 
-    async def create_application(self, application: TransferApplication) -> bool:
+    def _create_application_sync(self, application: TransferApplication) -> bool:
         wb = openpyxl.load_workbook(self.file_path)
         ws = wb["Applications"]
 
-        ws.append([
-            application.id,
-            application.user_id,
-            application.event_name,
-            application.dropoff_date,
-            "Да" if application.tech_service_needed else "Нет",
-            application.comment
-        ])
+        ws.append(self._application_to_row(application))
 
         wb.save(self.file_path)
         wb.close()
-        return True
\ No newline at end of file
+        return True
@@ -0,0 +1,21 @@
+import config
+from database.abstract import Repository
+from database.excel_impl import ExcelRepository
+from database.sqlite_impl import SQLiteRepository
+from services.io_executor import IOExecutor
+
+
+def create_repository(io_executor: IOExecutor) -> Repository:
+    """Создает репозиторий, выбранный в config.DB_BACKEND."""
+    if config.DB_BACKEND == "sqlite":
+        return SQLiteRepository(config.SQLITE_DB_PATH, io_executor=io_executor)
+    if config.DB_BACKEND == "excel":
+        return ExcelRepository(
+            config.EXCEL_DB_PATH,
+            in_memory=config.EXCEL_IN_MEMORY,
+            flush_interval=config.EXCEL_FLUSH_INTERVAL,
+            io_executor=io_executor,
+            delta_path=config.EXCEL_DELTA_PATH or None,
+            compact_interval=config.EXCEL_COMPACT_INTERVAL,
+        )
+    raise ValueError(f"Неизвестный DB_BACKEND: {config.DB_BACKEND}")
@@ -0,0 +1,191 @@
+import logging
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, List, Optional
+from database.abstract import Repository
+from database.excel_impl import normalize_phone
+from services.io_executor import IOExecutor
+from models.domain import ClientProfile, TransferApplication
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS clients (
+    user_id INTEGER PRIMARY KEY,
+    username TEXT,
+    full_name TEXT NOT NULL,
+    phone_number TEXT NOT NULL,
+    phone_normalized TEXT,
+    passport_series_number TEXT,
+    passport_issued_by TEXT,
+    passport_date_of_issue TEXT,
+    registration_address TEXT,
+    registered_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_clients_phone ON clients (phone_normalized);
+
+CREATE TABLE IF NOT EXISTS applications (
+    id TEXT PRIMARY KEY,
+    user_id INTEGER NOT NULL,
+    event_id TEXT NOT NULL,
+    event_name TEXT NOT NULL,
+    dropoff_point TEXT NOT NULL,
+    dropoff_date TEXT NOT NULL,
+    tech_service_needed INTEGER NOT NULL,
+    comment TEXT,
+    created_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_applications_user_id ON applications (user_id);
+CREATE INDEX IF NOT EXISTS idx_applications_event_id ON applications (event_id);
+CREATE INDEX IF NOT EXISTS idx_applications_created_at ON applications (created_at);
+"""
+
+CLIENT_COLUMNS = (
+    "user_id", "username", "full_name", "phone_number", "passport_series_number",
+    "passport_issued_by", "passport_date_of_issue", "registration_address", "registered_at",
+)
+
+
+class SQLiteRepository(Repository):
+    """
+    Репозиторий поверх SQLite в режиме WAL.
+
+    Каждый поток IOExecutor работает со своим соединением. Запись одной заявки —
+    это один INSERT, а таблицы для менеджеров строятся отдельно экспортом
+    (см. database/excel_export.py).
+    """
+
+    def __init__(self, db_path: str, io_executor: Optional[IOExecutor] = None):
+        super().__init__(io_executor)
+        self.db_path = db_path
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+
+        db_dir = os.path.dirname(self.db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        """Возвращает соединение текущего потока, открывая его при первом обращении."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread=False только для закрытия соединений в close()
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            with self._connections_lock:
+                self._connections.append(conn)
+        return conn
+
+    @staticmethod
+    def _row_to_user(row: sqlite3.Row) -> ClientProfile:
+        return ClientProfile(**{column: row[column] for column in CLIENT_COLUMNS})
+
+    # --- Методы репозитория ---
+
+    async def get_user(self, user_id: int) -> Optional[ClientProfile]:
+        return await self.io.read(self._get_user_sync, user_id)
+
+    async def get_user_by_phone(self, phone_number: str) -> Optional[ClientProfile]:
+        phone = normalize_phone(phone_number)
+        if not phone:
+            return None
+        return await self.io.read(self._get_user_by_phone_sync, phone)
+
+    async def save_user(self, user: ClientProfile) -> bool:
+        return await self.io.write(self._save_user_sync, user)
+
+    async def create_application(self, application: TransferApplication) -> bool:
+        return await self.io.write(self._create_application_sync, application)
+
+    async def list_applications_for_export(self) -> List[Dict[str, Any]]:
+        """Все заявки вместе с данными клиентов, упорядоченные по событию и времени создания."""
+        return await self.io.read(self._list_applications_for_export_sync)
+
+    async def close(self) -> None:
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
+        await super().close()
+
+    # --- Блокирующие операции (выполняются в потоках IOExecutor) ---
+
+    def _get_user_sync(self, user_id: int) -> Optional[ClientProfile]:
+        row = self._connection().execute(
+            "SELECT * FROM clients WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        return self._row_to_user(row) if row else None
+
+    def _get_user_by_phone_sync(self, phone: str) -> Optional[ClientProfile]:
+        row = self._connection().execute(
+            "SELECT * FROM clients WHERE phone_normalized = ? LIMIT 1", (phone,)
+        ).fetchone()
+        return self._row_to_user(row) if row else None
+
+    def _save_user_sync(self, user: ClientProfile) -> bool:
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO clients (user_id, username, full_name, phone_number, phone_normalized,
+                                     passport_series_number, passport_issued_by, passport_date_of_issue,
+                                     registration_address, registered_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (user_id) DO UPDATE SET
+                    username = excluded.username,
+                    full_name = excluded.full_name,
+                    phone_number = excluded.phone_number,
+                    phone_normalized = excluded.phone_normalized,
+                    passport_series_number = excluded.passport_series_number,
+                    passport_issued_by = excluded.passport_issued_by,
+                    passport_date_of_issue = excluded.passport_date_of_issue,
+                    registration_address = excluded.registration_address
+                """,
+                (
+                    user.user_id, user.username, user.full_name, user.phone_number,
+                    normalize_phone(user.phone_number), user.passport_series_number,
+                    user.passport_issued_by, user.passport_date_of_issue,
+                    user.registration_address, user.registered_at.isoformat(),
+                ),
+            )
+        return True
+
+    def _create_application_sync(self, application: TransferApplication) -> bool:
+        conn = self._connection()
+        try:
+            with conn:
+                conn.execute(
+                    """
+                    INSERT INTO applications (id, user_id, event_id, event_name, dropoff_point, dropoff_date,
+                                              tech_service_needed, comment, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    """,
+                    (
+                        application.id, application.user_id, application.event_id, application.event_name,
+                        application.dropoff_point, application.dropoff_date,
+                        int(application.tech_service_needed), application.comment,
+                        application.created_at.isoformat(),
+                    ),
+                )
+        except sqlite3.IntegrityError as e:
+            logger.error(f"Заявка {application.id} не сохранена: {e}")
+            return False
+        return True
+
+    def _list_applications_for_export_sync(self) -> List[Dict[str, Any]]:
+        rows = self._connection().execute(
+            """
+            SELECT a.*, c.full_name, c.phone_number, c.passport_series_number,
+                   c.passport_issued_by, c.passport_date_of_issue, c.registration_address
+            FROM applications a
+            LEFT JOIN clients c ON c.user_id = a.user_id
+            ORDER BY a.event_name, a.created_at
+            """
+        ).fetchall()
+        return [dict(row) for row in rows]
@@ -2,6 +2,8 @@ from pydantic import BaseModel, Field
 from typing import Optional
 from datetime import datetime
 
+from services.id_generator import next_id
+
 
 class ClientProfile(BaseModel):
     """Модель данных клиента"""
@@ -20,7 +22,7 @@ class ClientProfile(BaseModel):
 
 class TransferApplication(BaseModel):
     """Модель заявки на трансфер"""
-    id: str  # Уникальный ID заявки
+    id: str = Field(default_factory=lambda: str(next_id()))  # Уникальный ID заявки
     user_id: int
     event_id: str
     event_name: str
@@ -0,0 +1,248 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+from aiogram.exceptions import TelegramForbiddenError
+
+from services.notifications import GLOBAL_RATE, PER_CHAT_INTERVAL, MESSAGE_LIMIT, ChatPacer, TokenBucket, send_with_retry
+
+logger = logging.getLogger(__name__)
+
+# Состояния рассылки
+STATE_PREPARING = 'preparing'  # список получателей еще выгружается
+STATE_SENDING = 'sending'
+STATE_DONE = 'done'
+
+# Сколько ошибок по отдельным чатам хранить в отчете
+MAX_REPORTED_ERRORS = 100
+
+# Источник получателей: блокирующая функция, отдающая ID пачками (например, ClientsExcelManager.iter_user_ids)
+RecipientSource = Callable[[], Iterable[List[int]]]
+
+
+class BroadcastJob:
+    """
+    Одна рассылка и ее прогресс. Прогресс хранится в <progress_dir>/<job_id>.json, а список
+    получателей, выгруженный при старте, — в <job_id>.recipients (по ID на строку).
+    offset — позиция в файле получателей, до которой все уже обработано.
+    """
+
+    def __init__(self, progress_dir: str, job_id: str, text: str, notify_chat_id: Optional[int] = None):
+        self.progress_dir = progress_dir
+        self.job_id = job_id
+        self.text = text
+        self.notify_chat_id = notify_chat_id
+        self.state = STATE_PREPARING
+        self.total = 0
+        self.offset = 0
+        self.processed = 0
+        self.delivered = 0
+        self.blocked = 0
+        self.failed = 0
+        self.errors: Dict[str, str] = {}
+        self.started_at = datetime.now().isoformat()
+        self.finished_at: Optional[str] = None
+
+    @property
+    def progress_path(self) -> str:
+        return os.path.join(self.progress_dir, f"{self.job_id}.json")
+
+    @property
+    def recipients_path(self) -> str:
+        return os.path.join(self.progress_dir, f"{self.job_id}.recipients")
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.job_id, "text": self.text, "notify_chat_id": self.notify_chat_id,
+            "state": self.state, "total": self.total, "offset": self.offset, "processed": self.processed,
+            "delivered": self.delivered, "blocked": self.blocked, "failed": self.failed,
+            "errors": self.errors, "started_at": self.started_at, "finished_at": self.finished_at,
+        }
+
+    @classmethod
+    def load(cls, progress_path: str) -> 'BroadcastJob':
+        with open(progress_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        job = cls(os.path.dirname(progress_path), data["job_id"], data["text"], data.get("notify_chat_id"))
+        for key in ("state", "total", "offset", "processed", "delivered", "blocked", "failed",
+                    "errors", "started_at", "finished_at"):
+            setattr(job, key, data.get(key, getattr(job, key)))
+        return job
+
+    def save(self):
+        """Атомарно сохраняет прогресс."""
+        tmp_path = f"{self.progress_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.progress_path)
+
+    def report(self) -> str:
+        """Отчет о доставке для админа."""
+        lines = [
+            f"Рассылка {self.job_id}: {'завершена' if self.state == STATE_DONE else 'идет'}",
+            f"Получателей: {self.total}, обработано: {self.processed}",
+            f"Доставлено: {self.delivered}",
+            f"Заблокировали бота: {self.blocked}",
+            f"Ошибок: {self.failed}",
+        ]
+        if self.errors:
+            sample = ", ".join(f"{chat_id}: {error}" for chat_id, error in list(self.errors.items())[:5])
+            lines.append(f"Примеры ошибок: {sample}")
+        return "\n".join(lines)
+
+
+class Broadcaster:
+    """
+    Массовая рассылка одного текста всем клиентам.
+
+    При старте рассылки ID получателей выгружаются из хранилища пачками в файл рядом с прогрессом:
+    список фиксируется на момент старта, и хранилище не держится открытым всю рассылку. Затем файл
+    читается пачками по chunk_size, пачка отправляется параллельно через общий TokenBucket (~25 сообщений
+    в секунду на бота) с паузой для каждого чата, и после пачки прогресс сохраняется на диск.
+    После падения рассылка продолжается с сохраненной позиции (resume_unfinished); повторно могут
+    уйти только сообщения последней незавершенной пачки.
+    """
+
+    def __init__(self, bot, progress_dir: str, rate: float = GLOBAL_RATE,
+                 per_chat_interval: float = PER_CHAT_INTERVAL, chunk_size: int = 50,
+                 bucket: Optional[TokenBucket] = None, parse_mode: Optional[str] = "HTML"):
+        self.bot = bot
+        self.progress_dir = progress_dir
+        self.chunk_size = chunk_size
+        self.parse_mode = parse_mode
+        # Общий bucket с другими отправителями бота, чтобы вместе не превысить лимит Telegram
+        self.bucket = bucket or TokenBucket(rate)
+        self.pacer = ChatPacer(per_chat_interval)
+        self._tasks: Dict[str, asyncio.Task] = {}
+        os.makedirs(self.progress_dir, exist_ok=True)
+
+    def create(self, text: str, job_id: Optional[str] = None, notify_chat_id: Optional[int] = None) -> BroadcastJob:
+        job_id = job_id or datetime.now().strftime("broadcast_%Y%m%d_%H%M%S")
+        job = BroadcastJob(self.progress_dir, job_id, text[:MESSAGE_LIMIT], notify_chat_id)
+        job.save()
+        return job
+
+    def unfinished(self) -> List[BroadcastJob]:
+        """Рассылки, прерванные остановкой или падением бота."""
+        jobs = []
+        for name in sorted(os.listdir(self.progress_dir)):
+            if not name.endswith('.json'):
+                continue
+            try:
+                job = BroadcastJob.load(os.path.join(self.progress_dir, name))
+            except (OSError, ValueError, KeyError) as e:
+                logger.error(f"Не удалось прочитать прогресс рассылки {name}: {e}")
+                continue
+            if job.state != STATE_DONE:
+                jobs.append(job)
+        return jobs
+
+    # --- Получатели ---
+
+    @staticmethod
+    def _spool_recipients(job: BroadcastJob, source: RecipientSource):
+        """Выгружает ID получателей в файл рассылки. Выполняется в потоке."""
+        total = 0
+        tmp_path = f"{job.recipients_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for chunk in source():
+                f.writelines(f"{chat_id}\n" for chat_id in chunk)
+                total += len(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, job.recipients_path)
+        job.total = total
+        job.state = STATE_SENDING
+        job.save()
+
+    @staticmethod
+    def _read_chunk(job: BroadcastJob, size: int):
+        """Следующая пачка ID после job.offset и позиция за ней."""
+        chat_ids = []
+        with open(job.recipients_path, 'rb') as f:
+            f.seek(job.offset)
+            for _ in range(size):
+                line = f.readline()
+                if not line:
+                    break
+                chat_ids.append(int(line))
+            return chat_ids, f.tell()
+
+    # --- Отправка ---
+
+    async def _deliver(self, job: BroadcastJob, chat_id: int):
+        error = await send_with_retry(self.bot, self.bucket, self.pacer, chat_id, job.text, self.parse_mode)
+        if error is None:
+            job.delivered += 1
+        elif isinstance(error, TelegramForbiddenError):
+            job.blocked += 1
+        else:
+            job.failed += 1
+            if len(job.errors) < MAX_REPORTED_ERRORS:
+                job.errors[str(chat_id)] = str(error)
+
+    async def run(self, job: BroadcastJob, source: RecipientSource,
+                  run_blocking: Callable[..., Awaitable] = asyncio.to_thread) -> BroadcastJob:
+        """
+        Выполняет (или продолжает) рассылку. run_blocking — как выполнять блокирующее чтение
+        хранилища, например io_executor.read, чтобы не пересекаться с его записью.
+        """
+        started = time.monotonic()
+        if job.state == STATE_PREPARING:
+            await run_blocking(self._spool_recipients, job, source)
+            logger.info(f"Рассылка {job.job_id}: получателей {job.total}")
+
+        while job.state == STATE_SENDING:
+            chat_ids, next_offset = await asyncio.to_thread(self._read_chunk, job, self.chunk_size)
+            if not chat_ids:
+                job.state = STATE_DONE
+                job.finished_at = datetime.now().isoformat()
+            else:
+                await asyncio.gather(*(self._deliver(job, chat_id) for chat_id in chat_ids))
+                job.offset = next_offset
+                job.processed += len(chat_ids)
+                self.pacer.prune()
+            await asyncio.to_thread(job.save)
+
+        logger.info(f"Рассылка {job.job_id} завершена за {time.monotonic() - started:.0f} с: "
+                    f"доставлено {job.delivered}, заблокировали {job.blocked}, ошибок {job.failed}")
+        if os.path.exists(job.recipients_path):
+            os.remove(job.recipients_path)
+        if job.notify_chat_id:
+            await send_with_retry(self.bot, self.bucket, self.pacer, job.notify_chat_id, job.report(), None)
+        return job
+
+    def start(self, job: BroadcastJob, source: RecipientSource,
+              run_blocking: Callable[..., Awaitable] = asyncio.to_thread) -> asyncio.Task:
+        """Запускает рассылку фоновой задачей."""
+        task = asyncio.create_task(self.run(job, source, run_blocking))
+        self._tasks[job.job_id] = task
+        task.add_done_callback(lambda t: self._on_done(job.job_id, t))
+        return task
+
+    def _on_done(self, job_id: str, task: asyncio.Task):
+        self._tasks.pop(job_id, None)
+        if not task.cancelled() and task.exception() is not None:
+            logger.error(f"Рассылка {job_id} прервана ошибкой, продолжится после перезапуска: {task.exception()}")
+
+    def resume_unfinished(self, source: RecipientSource,
+                          run_blocking: Callable[..., Awaitable] = asyncio.to_thread) -> List[BroadcastJob]:
+        """Продолжает прерванные рассылки с сохраненной позиции."""
+        jobs = [job for job in self.unfinished() if job.job_id not in self._tasks]
+        for job in jobs:
+            logger.info(f"Продолжаем рассылку {job.job_id} с позиции {job.processed}/{job.total}")
+            self.start(job, source, run_blocking)
+        return jobs
+
+    async def stop(self):
+        """Останавливает рассылки; прогресс уже на диске, и они продолжатся при следующем запуске."""
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
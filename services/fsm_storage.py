@@ -0,0 +1,114 @@
+import logging
+from typing import Dict, Optional
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, StateType, StorageKey
+from aiogram.fsm.storage.memory import MemoryStorage
+from aiogram.fsm.storage.redis import RedisStorage
+from redis.asyncio import ConnectionPool, Redis
+
+import config
+
+logger = logging.getLogger(__name__)
+
+
+def parse_state_ttls(raw: str) -> Dict[str, int]:
+    """
+    Разбирает строку вида "TransferFSM=3600,RegistrationFSM:waiting_for_passport=900".
+    Ключ — полное имя состояния или имя группы состояний, значение — TTL в секундах.
+    """
+    ttls = {}
+    for item in filter(None, (part.strip() for part in (raw or '').split(','))):
+        name, _, seconds = item.rpartition('=')
+        if not name:
+            logger.warning(f"Пропущен TTL без имени состояния: '{item}'")
+            continue
+        ttls[name.strip()] = int(seconds)
+    return ttls
+
+
+class TTLRedisStorage(RedisStorage):
+    """
+    RedisStorage с TTL, зависящим от текущего состояния диалога.
+
+    Каждая запись состояния или данных продлевает срок жизни обоих ключей пользователя,
+    поэтому активный диалог не истекает, а брошенный Redis удаляет сам.
+    TTL ищется по полному имени состояния, затем по имени группы, затем берется default_ttl.
+
+    В redis можно передать любой совместимый асинхронный клиент, например
+    fakeredis.aioredis.FakeRedis() для проверки без сервера Redis.
+    """
+
+    def __init__(self, redis: Redis, state_ttls: Optional[Dict[str, int]] = None,
+                 default_ttl: Optional[int] = None, **kwargs):
+        super().__init__(redis=redis, **kwargs)
+        self.state_ttls = state_ttls or {}
+        self.default_ttl = default_ttl
+
+    def ttl_for(self, state: Optional[str]) -> Optional[int]:
+        if state:
+            if state in self.state_ttls:
+                return self.state_ttls[state]
+            group = state.split(':', 1)[0]
+            if group in self.state_ttls:
+                return self.state_ttls[group]
+        return self.default_ttl
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        state_key = self.key_builder.build(key, "state")
+        if state is None:
+            await self.redis.delete(state_key)
+            return
+
+        state_name = state.state if isinstance(state, State) else state
+        ttl = self.ttl_for(state_name)
+        data_key = self.key_builder.build(key, "data")
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(state_key, state_name, ex=ttl)
+            if ttl:
+                # Данные живут столько же, сколько состояние
+                pipe.expire(data_key, ttl)
+            else:
+                pipe.persist(data_key)
+            await pipe.execute()
+
+    async def set_data(self, key: StorageKey, data: dict) -> None:
+        data_key = self.key_builder.build(key, "data")
+        if not data:
+            await self.redis.delete(data_key)
+            return
+
+        ttl = self.ttl_for(await self.get_state(key))
+        state_key = self.key_builder.build(key, "state")
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(data_key, self.json_dumps(data), ex=ttl)
+            if ttl:
+                pipe.expire(state_key, ttl)
+            await pipe.execute()
+
+
+def create_redis_pool() -> ConnectionPool:
+    """Общий пул соединений Redis для всех компонентов одного процесса бота."""
+    return ConnectionPool(
+        host=config.REDIS_HOST,
+        port=config.REDIS_PORT,
+        db=config.REDIS_DB,
+        max_connections=config.REDIS_MAX_CONNECTIONS,
+    )
+
+
+def create_fsm_storage(redis_pool: Optional[ConnectionPool] = None) -> BaseStorage:
+    """
+    Создает хранилище FSM, выбранное в config.FSM_STORAGE.
+    С "redis" состояние переживает перезапуск и общее для нескольких процессов бота.
+    """
+    if config.FSM_STORAGE == "memory":
+        return MemoryStorage()
+    if config.FSM_STORAGE == "redis":
+        pool = redis_pool or create_redis_pool()
+        logger.info(f"FSM хранится в Redis {config.REDIS_HOST}:{config.REDIS_PORT}/{config.REDIS_DB}")
+        return TTLRedisStorage(
+            Redis(connection_pool=pool),
+            state_ttls=parse_state_ttls(config.FSM_STATE_TTLS),
+            default_ttl=config.FSM_DEFAULT_TTL or None,
+        )
+    raise ValueError(f"Неизвестный FSM_STORAGE: {config.FSM_STORAGE}")
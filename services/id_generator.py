@@ -0,0 +1,97 @@
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+import config
+
+# Схема ID как у Snowflake: 41 бит — миллисекунды от EPOCH_MS, 5 бит — номер узла
+# (отдельного бота или сервера), 5 бит — номер процесса на узле, 12 бит — счетчик
+# в пределах миллисекунды. ID помещается в 63 бита, растет со временем и уникален
+# между процессами без обращения к общему хранилищу.
+EPOCH_MS = 1735689600000  # 2025-01-01 00:00:00 UTC
+NODE_BITS = 5
+WORKER_BITS = 5
+SEQUENCE_BITS = 12
+
+MAX_NODE_ID = (1 << NODE_BITS) - 1
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+SEQUENCE_MASK = (1 << SEQUENCE_BITS) - 1
+WORKER_SHIFT = SEQUENCE_BITS
+NODE_SHIFT = SEQUENCE_BITS + WORKER_BITS
+TIMESTAMP_SHIFT = SEQUENCE_BITS + WORKER_BITS + NODE_BITS
+
+
+class IdGenerator:
+    """
+    Генератор монотонно растущих уникальных ID.
+
+    Уникальность между процессами обеспечивает пара (node_id, worker_id): каждый процесс,
+    одновременно выдающий ID, должен иметь свою пару. Внутри процесса ID выдаются под
+    threading.Lock. Если часы отошли назад или счетчик миллисекунды исчерпан, генератор
+    продолжает от последней выданной миллисекунды, а не ждет и не повторяет ID.
+    """
+
+    def __init__(self, node_id: int = 0, worker_id: int = 0):
+        if not 0 <= node_id <= MAX_NODE_ID:
+            raise ValueError(f"node_id должен быть от 0 до {MAX_NODE_ID}, получено {node_id}")
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"worker_id должен быть от 0 до {MAX_WORKER_ID}, получено {worker_id}")
+        self.node_id = node_id
+        self.worker_id = worker_id
+        self._prefix = (node_id << NODE_SHIFT) | (worker_id << WORKER_SHIFT)
+        self._last_ms = -1
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        with self._lock:
+            now_ms = int(time.time() * 1000) - EPOCH_MS
+            if now_ms > self._last_ms:
+                self._last_ms = now_ms
+                self._sequence = 0
+            else:
+                # Та же миллисекунда или часы отошли назад: берем следующий номер
+                self._sequence = (self._sequence + 1) & SEQUENCE_MASK
+                if self._sequence == 0:
+                    self._last_ms += 1
+            return (self._last_ms << TIMESTAMP_SHIFT) | self._prefix | self._sequence
+
+
+def parse_id(value: int) -> Tuple[datetime, int, int, int]:
+    """Раскладывает ID на (время создания, node_id, worker_id, счетчик)."""
+    value = int(value)
+    created_at = datetime.fromtimestamp(((value >> TIMESTAMP_SHIFT) + EPOCH_MS) / 1000)
+    return (
+        created_at,
+        (value >> NODE_SHIFT) & MAX_NODE_ID,
+        (value >> WORKER_SHIFT) & MAX_WORKER_ID,
+        value & SEQUENCE_MASK,
+    )
+
+
+_default_generator: Optional[IdGenerator] = None
+_default_lock = threading.Lock()
+
+
+def get_id_generator() -> IdGenerator:
+    """
+    Генератор текущего процесса. Номер узла берется из config.ID_NODE, номер процесса — из WORKER_ID
+    (его выставляет webhook-режим каждому процессу-обработчику). Генератор создается при первом
+    вызове, то есть уже после того, как процесс получил свой WORKER_ID.
+    """
+    global _default_generator
+    if _default_generator is None:
+        with _default_lock:
+            if _default_generator is None:
+                _default_generator = IdGenerator(
+                    node_id=config.ID_NODE,
+                    worker_id=int(os.getenv("WORKER_ID", 0)),
+                )
+    return _default_generator
+
+
+def next_id() -> int:
+    """Следующий уникальный ID для текущего процесса."""
+    return get_id_generator().next_id()
@@ -0,0 +1,140 @@
+import asyncio
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict
+
+logger = logging.getLogger(__name__)
+
+
+class _ReadWriteLock:
+    """
+    Блокировка "много читателей / один писатель" для потоков.
+    Писатель получает приоритет, чтобы поток чтений не откладывал запись бесконечно.
+    """
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer_active = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def reading(self):
+        with self._cond:
+            while self._writer_active or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def writing(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer_active or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer_active = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer_active = False
+                self._cond.notify_all()
+
+
+class IOMetrics:
+    """Счетчики очереди одного пула: глубина очереди и время ожидания до начала выполнения."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def on_submit(self):
+        with self._lock:
+            self.queued += 1
+
+    def on_start(self, wait: float):
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def on_finish(self):
+        with self._lock:
+            self.running -= 1
+            self.completed += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            started = self.completed + self.running
+            return {
+                "queue_depth": self.queued,
+                "running": self.running,
+                "completed": self.completed,
+                "avg_wait_ms": round(self.total_wait / started * 1000, 2) if started else 0.0,
+                "max_wait_ms": round(self.max_wait * 1000, 2),
+            }
+
+
+class IOExecutor:
+    """
+    Слой выполнения блокирующего файлового I/O вне event loop.
+
+    Все изменения идут через единственный поток-писатель, поэтому записи в файл
+    никогда не пересекаются. Чтения выполняются в небольшом пуле потоков и не
+    пересекаются с записью, чтобы не читать наполовину сохраненный файл.
+    """
+
+    def __init__(self, read_workers: int = 4):
+        self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="io-writer")
+        self._readers = ThreadPoolExecutor(max_workers=max(1, read_workers), thread_name_prefix="io-reader")
+        self._rw_lock = _ReadWriteLock()
+        self.read_metrics = IOMetrics()
+        self.write_metrics = IOMetrics()
+
+    async def read(self, func: Callable, *args, **kwargs):
+        """Выполняет читающую операцию в пуле читателей."""
+        return await self._submit(self._readers, self.read_metrics, self._rw_lock.reading, func, args, kwargs)
+
+    async def write(self, func: Callable, *args, **kwargs):
+        """Выполняет изменяющую операцию в потоке-писателе."""
+        return await self._submit(self._writer, self.write_metrics, self._rw_lock.writing, func, args, kwargs)
+
+    async def _submit(self, pool: ThreadPoolExecutor, metrics: IOMetrics, lock_factory, func, args, kwargs):
+        submitted_at = time.perf_counter()
+        metrics.on_submit()
+
+        def job():
+            metrics.on_start(time.perf_counter() - submitted_at)
+            try:
+                with lock_factory():
+                    return func(*args, **kwargs)
+            finally:
+                metrics.on_finish()
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(pool, job)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """Текущие метрики очередей чтения и записи."""
+        return {"read": self.read_metrics.snapshot(), "write": self.write_metrics.snapshot()}
+
+    def shutdown(self, wait: bool = True):
+        """Дожидается выполнения поставленных задач и останавливает потоки."""
+        self._writer.shutdown(wait=wait)
+        self._readers.shutdown(wait=wait)
+        logger.info(f"IO-executor остановлен. Метрики: {self.stats()}")
@@ -0,0 +1,297 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Iterable, List, Optional, Tuple
+
+from aiogram.exceptions import TelegramAPIError, TelegramForbiddenError, TelegramNetworkError, TelegramRetryAfter
+from aiogram.methods import SendMessage
+
+logger = logging.getLogger(__name__)
+
+# Ограничения Telegram: около 30 сообщений в секунду на бота и около одного в секунду в один чат.
+# Берем с запасом
+GLOBAL_RATE = 25.0
+PER_CHAT_INTERVAL = 1.0
+MESSAGE_LIMIT = 4096
+DIGEST_SEPARATOR = "\n\n— — —\n\n"
+
+
+class TokenBucket:
+    """
+    Ограничитель частоты "ведро токенов": в среднем rate операций в секунду,
+    всплеск — не больше capacity подряд. acquire() ждет, пока появится токен.
+    По умолчанию всплесков нет: лимит Telegram считается по любому окну в секунду.
+    """
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0):
+        # Под блокировкой ожидающие получают токены по очереди, а не наперегонки
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+    def pause(self, seconds: float):
+        """Забирает токены на seconds вперед — после TelegramRetryAfter ждут все отправители."""
+        self._refill()
+        self._tokens = min(self._tokens, 0.0) - seconds * self.rate
+
+
+class ChatPacer:
+    """Не чаще одного сообщения в interval секунд в один чат."""
+
+    def __init__(self, interval: float = PER_CHAT_INTERVAL):
+        self.interval = interval
+        self._last_sent: Dict[int, float] = {}
+
+    async def wait(self, chat_id: int):
+        delay = self._last_sent.get(chat_id, 0.0) + self.interval - time.monotonic()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+    def mark(self, chat_id: int):
+        self._last_sent[chat_id] = time.monotonic()
+
+    def prune(self):
+        """Забывает чаты, в которые писали дольше interval назад (для длинных рассылок)."""
+        threshold = time.monotonic() - self.interval
+        self._last_sent = {chat_id: sent for chat_id, sent in self._last_sent.items() if sent > threshold}
+
+
+async def send_with_retry(bot, bucket: TokenBucket, pacer: ChatPacer, chat_id: int, text: str,
+                          parse_mode: Optional[str] = "HTML", max_retries: int = 5,
+                          retry_delay: float = 1.0) -> Optional[TelegramAPIError]:
+    """
+    Отправляет сообщение с учетом общего лимита и паузы для чата.
+    На TelegramRetryAfter ждет указанное время (и останавливает остальные отправки через bucket),
+    на сетевые ошибки — повторяет с растущей паузой. Возвращает None при успехе или последнюю ошибку.
+    """
+    error = None
+    for attempt in range(1, max_retries + 1):
+        await pacer.wait(chat_id)
+        await bucket.acquire()
+        try:
+            await bot.send_message(chat_id=chat_id, text=text, parse_mode=parse_mode)
+            pacer.mark(chat_id)
+            return None
+        except TelegramRetryAfter as e:
+            logger.warning(f"Telegram просит подождать {e.retry_after} с перед отправкой в чат {chat_id}.")
+            bucket.pause(e.retry_after)
+            await asyncio.sleep(e.retry_after)
+            error = e
+        except TelegramNetworkError as e:
+            logger.warning(f"Сетевая ошибка при отправке в чат {chat_id} (попытка {attempt}/{max_retries}): {e}")
+            await asyncio.sleep(retry_delay * 2 ** (attempt - 1))
+            error = e
+        except TelegramAPIError as e:
+            # Бот заблокирован, чат не найден и т.п. — повтор не поможет
+            return e
+    return error
+
+
+class ConfigAdminIds:
+    """
+    Список получателей из admin_ids файла конфигурации (config.json трансферов).
+    Файл перечитывается только после изменения, поэтому новый админ начинает получать
+    уведомления без правки кода и перезапуска.
+    """
+
+    def __init__(self, file_path: str, key: str = "admin_ids"):
+        self.file_path = file_path
+        self.key = key
+        self._stamp = None
+        self._ids: List[int] = []
+
+    def __call__(self) -> List[int]:
+        try:
+            stat = os.stat(self.file_path)
+        except FileNotFoundError:
+            logger.error(f"Файл {self.file_path} не найден, список админов пуст.")
+            return []
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        if stamp != self._stamp:
+            try:
+                with open(self.file_path, 'r', encoding='utf-8') as f:
+                    self._ids = [int(chat_id) for chat_id in json.load(f).get(self.key, [])]
+            except (OSError, ValueError, TypeError) as e:
+                logger.error(f"Не удалось прочитать {self.key} из {self.file_path}, остается прежний список: {e}")
+            self._stamp = stamp
+        return self._ids
+
+
+def parse_chat_ids(value: str) -> List[int]:
+    """Разбирает список чатов вида "123,-100456" (например, из NOTIFY_CHAT_IDS). Неверные элементы пропускает."""
+    chat_ids = []
+    for item in value.split(","):
+        item = item.strip()
+        if not item:
+            continue
+        try:
+            chat_ids.append(int(item))
+        except ValueError:
+            logger.error(f"Неверный id чата для уведомлений: {item!r}")
+    return chat_ids
+
+
+def build_digests(texts: List[str], limit: int = MESSAGE_LIMIT) -> List[str]:
+    """
+    Склеивает накопленные уведомления одного чата в сводные сообщения не длиннее limit.
+    Одно уведомление отправляется как есть, без заголовка.
+    """
+    if len(texts) == 1:
+        return [texts[0][:limit]]
+
+    digests = []
+    current: List[str] = []
+    size = 0
+    for text in texts:
+        text = text[:limit - 100]
+        added = len(text) + (len(DIGEST_SEPARATOR) if current else 0)
+        if current and size + added > limit - 100:
+            digests.append(current)
+            current, size = [], 0
+            added = len(text)
+        current.append(text)
+        size += added
+    if current:
+        digests.append(current)
+
+    return [f"<b>Уведомлений: {len(part)}</b>\n\n" + DIGEST_SEPARATOR.join(part) for part in digests]
+
+
+class NotificationDispatcher:
+    """
+    Очередь исходящих уведомлений (админам о новых заявках и т.п.).
+
+    Хендлер вызывает notify() и сразу отвечает пользователю: отправка идет в фоновой задаче.
+    Уведомления, пришедшие в течение digest_window секунд, склеиваются в одно сообщение на чат.
+    Общий поток ограничен TokenBucket с лимитом Telegram на бота, а в один чат уходит не чаще
+    одного сообщения в per_chat_interval секунд. На TelegramRetryAfter отправка ждет указанное
+    время (и останавливает остальные отправки), на сетевые ошибки — повторяет с растущей паузой.
+    """
+
+    def __init__(self, bot, recipients: Callable[[], Iterable[int]], digest_window: float = 3.0,
+                 rate: float = GLOBAL_RATE, per_chat_interval: float = PER_CHAT_INTERVAL,
+                 max_retries: int = 5, retry_delay: float = 1.0, parse_mode: Optional[str] = "HTML"):
+        self.bot = bot
+        self.recipients = recipients
+        self.digest_window = digest_window
+        self.max_retries = max_retries
+        self.retry_delay = retry_delay
+        self.parse_mode = parse_mode
+        self.bucket = TokenBucket(rate)
+        self.pacer = ChatPacer(per_chat_interval)
+        self._pending: Dict[int, Deque[str]] = {}
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+        self._task: Optional[asyncio.Task] = None
+        self.sent = 0
+        self.failed = 0
+
+    def notify(self, text: str, chat_ids: Optional[Iterable[int]] = None):
+        """Ставит уведомление в очередь. По умолчанию — всем получателям из recipients(). Не блокирует."""
+        if chat_ids is None:
+            chat_ids = self.recipients()
+        chat_ids = list(chat_ids)
+        if not chat_ids:
+            logger.warning("Список получателей уведомлений пуст, уведомление не отправлено.")
+            return
+        for chat_id in chat_ids:
+            self._pending.setdefault(chat_id, deque()).append(text)
+        self._wakeup.set()
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+        logger.info("Очередь уведомлений запущена.")
+
+    async def stop(self, timeout: float = 30.0):
+        """Отправляет накопленные уведомления и останавливает фоновую задачу."""
+        if not self._task:
+            return
+        self._stopping = True
+        self._wakeup.set()
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Очередь уведомлений не успела опустеть, не отправлено чатам: {len(self._pending)}")
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            if not self._stopping:
+                # Пауза, чтобы всплеск уведомлений ушел одним сводным сообщением
+                await asyncio.sleep(self.digest_window)
+            self._wakeup.clear()
+            try:
+                await self._drain()
+            except Exception as e:
+                # Непредвиденная ошибка не должна останавливать очередь: следующие уведомления уйдут как обычно
+                logger.error(f"Ошибка при отправке уведомлений: {e}", exc_info=True)
+            if self._stopping and not self._wakeup.is_set():
+                break
+
+    async def _drain(self):
+        batch = self._pending
+        self._pending = {}
+        for chat_id, texts in batch.items():
+            for text in build_digests(list(texts)):
+                await self._send(chat_id, text)
+
+    async def _send(self, chat_id: int, text: str) -> bool:
+        error = await send_with_retry(self.bot, self.bucket, self.pacer, chat_id, text, self.parse_mode,
+                                      self.max_retries, self.retry_delay)
+        if error is None:
+            self.sent += 1
+            return True
+        logger.error(f"Не удалось отправить уведомление в чат {chat_id}: {error}")
+        self.failed += 1
+        return False
+
+
+class FakeBot:
+    """
+    Заглушка Bot для локальной проверки уведомлений и рассылок без Telegram.
+    Запоминает отправленные сообщения в sent; retry_after_every — каждая N-я отправка
+    отвечает TelegramRetryAfter(retry_after); чаты из blocked_chat_ids отвечают
+    TelegramForbiddenError, как пользователь, заблокировавший бота.
+    """
+
+    def __init__(self, retry_after_every: int = 0, retry_after: int = 1, latency: float = 0.0,
+                 blocked_chat_ids: Iterable[int] = ()):
+        self.retry_after_every = retry_after_every
+        self.retry_after = retry_after
+        self.latency = latency
+        self.blocked_chat_ids = set(blocked_chat_ids)
+        self.calls = 0
+        self.sent: List[Tuple[float, int, str]] = []
+
+    async def send_message(self, chat_id: int, text: str, parse_mode: Optional[str] = None, **kwargs):
+        self.calls += 1
+        call = self.calls
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if self.retry_after_every and call % self.retry_after_every == 0:
+            raise TelegramRetryAfter(method=SendMessage(chat_id=chat_id, text=text), message="Too Many Requests",
+                                     retry_after=self.retry_after)
+        if chat_id in self.blocked_chat_ids:
+            raise TelegramForbiddenError(method=SendMessage(chat_id=chat_id, text=text),
+                                         message="Forbidden: bot was blocked by the user")
+        self.sent.append((time.monotonic(), chat_id, text))
+        return None
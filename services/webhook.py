@@ -0,0 +1,212 @@
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from aiogram import Bot, Dispatcher
+from aiohttp import web
+
+import config
+from services.id_generator import MAX_WORKER_ID
+
+logger = logging.getLogger(__name__)
+
+# Фабрика процесса-обработчика: по номеру воркера возвращает бота, диспетчер и корутину-завершение.
+# Должна быть функцией уровня модуля, чтобы ее можно было передать в дочерний процесс.
+RuntimeFactory = Callable[[int], Awaitable[Tuple[Bot, Dispatcher, Callable[[], Awaitable[None]]]]]
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def extract_routing_key(update: Dict[str, Any]) -> int:
+    """
+    Ключ маршрутизации апдейта: ID пользователя, а если его нет — ID чата.
+    Все апдейты одного пользователя попадают в один воркер и обрабатываются по порядку.
+    """
+    for field, payload in update.items():
+        if field == "update_id" or not isinstance(payload, dict):
+            continue
+        for owner in ("from", "user"):
+            if isinstance(payload.get(owner), dict) and "id" in payload[owner]:
+                return int(payload[owner]["id"])
+        chat = payload.get("chat")
+        if not chat and isinstance(payload.get("message"), dict):
+            chat = payload["message"].get("chat")
+        if isinstance(chat, dict) and "id" in chat:
+            return int(chat["id"])
+    return int(update.get("update_id", 0))
+
+
+# --- Процесс-обработчик ---
+
+async def _run_lane(bot: Bot, dp: Dispatcher, lane: asyncio.Queue):
+    """Обрабатывает апдейты своей полосы строго по очереди."""
+    while True:
+        update = await lane.get()
+        try:
+            await dp.feed_raw_update(bot, update)
+        except Exception as e:
+            logger.error(f"Ошибка обработки апдейта {update.get('update_id')}: {e}", exc_info=True)
+        finally:
+            lane.task_done()
+
+
+async def _worker_loop(worker_id: int, workers: int, updates: multiprocessing.Queue,
+                       runtime_factory: RuntimeFactory, lanes: int):
+    bot, dp, cleanup = await runtime_factory(worker_id)
+    # Внутри воркера пользователи раскладываются по полосам: разные пользователи
+    # обрабатываются параллельно, апдейты одного пользователя — последовательно
+    lane_queues = [asyncio.Queue() for _ in range(lanes)]
+    lane_tasks = [asyncio.create_task(_run_lane(bot, dp, lane)) for lane in lane_queues]
+    loop = asyncio.get_running_loop()
+    logger.info(f"Воркер {worker_id} (PID {os.getpid()}) готов, полос: {lanes}")
+
+    try:
+        while True:
+            item = await loop.run_in_executor(None, updates.get)
+            if item is None:
+                break
+            routing_key, update = item
+            lane_queues[(routing_key // workers) % lanes].put_nowait(update)
+
+        for lane in lane_queues:
+            await lane.join()
+    finally:
+        for task in lane_tasks:
+            task.cancel()
+        await cleanup()
+        logger.info(f"Воркер {worker_id} остановлен.")
+
+
+def _worker_main(worker_id: int, workers: int, updates: multiprocessing.Queue,
+                 runtime_factory: RuntimeFactory, lanes: int):
+    logging.basicConfig(level=logging.INFO, format=f"%(asctime)s [worker {worker_id}] %(levelname)s %(name)s: %(message)s")
+    # WORKER_ID читают компоненты, которым нужен уникальный номер процесса
+    os.environ["WORKER_ID"] = str(worker_id)
+    try:
+        asyncio.run(_worker_loop(worker_id, workers, updates, runtime_factory, lanes))
+    except KeyboardInterrupt:
+        pass
+
+
+# --- Входной процесс ---
+
+class WebhookFront:
+    """
+    Входной aiohttp-сервер для webhook-режима.
+
+    Принимает апдейты от Telegram, сразу отвечает 200 и раскладывает их по очередям
+    N процессов-обработчиков по ключу extract_routing_key. Упавший воркер перезапускается.
+    Если очередь воркера переполнена, отвечаем 503 — Telegram повторит доставку позже.
+    """
+
+    def __init__(self, runtime_factory: RuntimeFactory, workers: int, lanes: int = 16,
+                 queue_size: int = 10000, secret: Optional[str] = None):
+        self.runtime_factory = runtime_factory
+        self.workers = workers
+        self.lanes = lanes
+        self.secret = secret
+        self._ctx = multiprocessing.get_context("spawn")
+        self._queues = [self._ctx.Queue(maxsize=queue_size) for _ in range(workers)]
+        self._processes = [None] * workers
+        self._monitor_task = None
+
+    def _start_worker(self, worker_id: int):
+        process = self._ctx.Process(
+            target=_worker_main,
+            args=(worker_id, self.workers, self._queues[worker_id], self.runtime_factory, self.lanes),
+            name=f"bot-worker-{worker_id}",
+            daemon=True,
+        )
+        process.start()
+        self._processes[worker_id] = process
+
+    async def _monitor_workers(self):
+        while True:
+            await asyncio.sleep(5)
+            for worker_id, process in enumerate(self._processes):
+                if process is not None and not process.is_alive():
+                    logger.error(f"Воркер {worker_id} завершился с кодом {process.exitcode}, перезапускаем.")
+                    self._start_worker(worker_id)
+
+    async def handle_update(self, request: web.Request) -> web.Response:
+        if self.secret and request.headers.get(SECRET_HEADER) != self.secret:
+            return web.Response(status=401)
+        try:
+            update = await request.json()
+        except ValueError:
+            return web.Response(status=400)
+
+        routing_key = extract_routing_key(update)
+        try:
+            self._queues[routing_key % self.workers].put_nowait((routing_key, update))
+        except queue.Full:
+            logger.warning(f"Очередь воркера {routing_key % self.workers} переполнена, апдейт будет доставлен повторно.")
+            return web.Response(status=503)
+        return web.Response()
+
+    async def on_startup(self, app: web.Application):
+        for worker_id in range(self.workers):
+            self._start_worker(worker_id)
+        self._monitor_task = asyncio.create_task(self._monitor_workers())
+
+        if config.WEBHOOK_URL:
+            bot = Bot(token=config.BOT_TOKEN)
+            try:
+                await bot.set_webhook(
+                    f"{config.WEBHOOK_URL.rstrip('/')}{config.WEBHOOK_PATH}",
+                    secret_token=self.secret,
+                    max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+                )
+                logger.info(f"Webhook установлен: {config.WEBHOOK_URL}{config.WEBHOOK_PATH}")
+            finally:
+                await bot.session.close()
+
+    async def on_shutdown(self, app: web.Application):
+        if self._monitor_task:
+            self._monitor_task.cancel()
+        for updates in self._queues:
+            updates.put(None)
+        loop = asyncio.get_running_loop()
+        for process in self._processes:
+            if process is not None:
+                await loop.run_in_executor(None, process.join, 60)
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_post(config.WEBHOOK_PATH, self.handle_update)
+        app.on_startup.append(self.on_startup)
+        app.on_shutdown.append(self.on_shutdown)
+        return app
+
+
+def resolve_workers(workers: Optional[int] = None, single_writer: bool = False) -> int:
+    """
+    Число процессов-обработчиков: workers, иначе config.WEBHOOK_WORKERS, иначе по числу ядер.
+    single_writer — данные бота в файлах с одним писателем (Excel, журнал заявок), процесс может быть только один.
+    """
+    # По числу ядер — в пределах допустимых номеров воркеров
+    workers = workers or config.WEBHOOK_WORKERS or min(os.cpu_count() or 1, MAX_WORKER_ID + 1)
+    if single_writer and workers != 1:
+        logger.warning(f"Хранилище бота допускает только один процесс-писатель: "
+                       f"вместо {workers} воркеров запускается 1.")
+        workers = 1
+    # Номер воркера входит в ID, которые выдает IdGenerator
+    if not 1 <= workers <= MAX_WORKER_ID + 1:
+        raise ValueError(f"Число воркеров должно быть от 1 до {MAX_WORKER_ID + 1}, получено {workers}")
+    return workers
+
+
+def run_webhook(runtime_factory: RuntimeFactory, workers: Optional[int] = None, single_writer: bool = False):
+    """Запускает входной сервер и процессы-обработчики. Блокирует до остановки."""
+    workers = resolve_workers(workers, single_writer)
+    front = WebhookFront(
+        runtime_factory,
+        workers=workers,
+        lanes=config.WEBHOOK_WORKER_LANES,
+        queue_size=config.WEBHOOK_QUEUE_SIZE,
+        secret=config.WEBHOOK_SECRET or None,
+    )
+    logger.info(f"Webhook-режим: {config.WEBAPP_HOST}:{config.WEBAPP_PORT}{config.WEBHOOK_PATH}, воркеров: {workers}")
+    web.run_app(front.create_app(), host=config.WEBAPP_HOST, port=config.WEBAPP_PORT)
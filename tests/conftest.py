@@ -0,0 +1,19 @@
+import importlib.util
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LEGACY_DIR = os.path.join(ROOT, "1oldbot")
+
+# Скрипты database/ старого бота (excel_manager.py) импортируют соседние модули без пакета
+for path in (ROOT, os.path.join(LEGACY_DIR, "database")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# Старый бот импортируется как пакет oldbot, а лежит в папке 1oldbot
+if "oldbot" not in sys.modules:
+    spec = importlib.util.spec_from_file_location(
+        "oldbot", os.path.join(LEGACY_DIR, "__init__.py"), submodule_search_locations=[LEGACY_DIR])
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["oldbot"] = module
+    spec.loader.exec_module(module)
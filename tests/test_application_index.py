@@ -0,0 +1,66 @@
+from oldbot.database.application_index import ApplicationIndex, decode_cursor
+from oldbot.database.journal import OP_CREATE, OP_STATUS
+
+
+def _index(*extra):
+    """Заявки 1..7: нечетные — событие "e", четные — "f"."""
+    index = ApplicationIndex()
+    index.replay([{"op": OP_CREATE, "id": app_id, "data": {"event_id": "e" if app_id % 2 else "f"}}
+                  for app_id in range(1, 8)] + list(extra))
+    return index
+
+
+def _ids(page):
+    return [item["id"] for item in page.items]
+
+
+def test_page_next_and_prev():
+    index = _index()
+
+    first = index.page(limit=3)
+    assert _ids(first) == [7, 6, 5]
+    assert first.prev_cursor is None
+    assert first.total == 7
+
+    second = index.page(cursor=first.next_cursor, limit=3)
+    assert _ids(second) == [4, 3, 2]
+    last = index.page(cursor=second.next_cursor, limit=3)
+    assert _ids(last) == [1]
+    assert last.next_cursor is None
+
+    # Назад возвращаются те же страницы
+    assert _ids(index.page(cursor=last.prev_cursor, limit=3)) == [4, 3, 2]
+    back = index.page(cursor=second.prev_cursor, limit=3)
+    assert _ids(back) == [7, 6, 5]
+    assert back.prev_cursor is None
+
+
+def test_page_filters():
+    index = _index({"op": OP_STATUS, "id": 5, "data": {"status": "Выполнена"}})
+
+    page = index.page(event_id="e", limit=2)
+    assert _ids(page) == [7, 5]
+    assert _ids(index.page(event_id="e", cursor=page.next_cursor, limit=2)) == [3, 1]
+    assert _ids(index.page(event_id="e", status="Новая")) == [7, 3, 1]
+    assert _ids(index.page(status="Выполнена")) == [5]
+    assert index.page(event_id="missing").items == []
+
+
+def test_removal_between_pages_keeps_position():
+    index = _index()
+    first = index.page(limit=3)
+
+    # Заявки на границе и на следующей странице удалены, пока админ смотрел первую страницу
+    index.remove(5)
+    index.remove(4)
+    second = index.page(cursor=first.next_cursor, limit=3)
+    assert _ids(second) == [3, 2, 1]
+    assert second.total == 5
+
+    # Курсор — ID, а не смещение, поэтому заявки не пропускаются и не повторяются
+    assert _ids(index.page(cursor=second.prev_cursor, limit=3)) == [7, 6]
+
+
+def test_broken_cursor_opens_first_page():
+    assert decode_cursor("zzz") == decode_cursor(None)
+    assert _ids(_index().page(cursor="a", limit=2)) == [7, 6]
@@ -0,0 +1,51 @@
+from oldbot.database.application_stats import ApplicationStats
+from oldbot.database.journal import OP_CREATE, OP_DELETE, OP_STATUS
+
+
+def _create(app_id, **data):
+    return {"op": OP_CREATE, "id": app_id, "data": dict(data, event_id="e")}
+
+
+def test_full_record_counted_once():
+    stats = ApplicationStats()
+    stats.replay([_create(1, point_name="P", selected_date="27.09", pre_repair=True)])
+
+    assert stats.count("e") == 1
+    assert stats.count("e", point="P", date="27.09", status="Новая") == 1
+    assert stats.pre_repair_count("e") == 1
+
+
+def test_missing_point_or_date_counted_once():
+    stats = ApplicationStats()
+    stats.replay([
+        _create(1, point_name="P", selected_date="27.09"),
+        # старая заявка: точка в поле 'date', даты нет
+        _create(2, date="P"),
+        # ни точки, ни даты
+        _create(3),
+    ])
+
+    summary = stats.event_summary("e")
+    assert summary["total"] == 3
+    assert summary["by_status"] == {"Новая": 3}
+    assert summary["by_slot"] == {("P", "27.09"): 1}
+    assert stats.count("e", point="P") == 2
+    assert stats.count("e", date="27.09") == 1
+    assert stats.count("e", status="Новая") == 3
+
+
+def test_status_change_and_delete_keep_totals():
+    stats = ApplicationStats()
+    stats.replay([
+        _create(1, date="P"),
+        _create(2),
+        {"op": OP_STATUS, "id": 1, "data": {"status": "Принята"}},
+        {"op": OP_DELETE, "id": 2},
+    ])
+
+    assert stats.event_summary("e")["by_status"] == {"Принята": 1}
+    assert stats.count("e") == 1
+
+    stats.remove(1)
+    assert stats.count("e") == 0
+    assert stats.event_ids() == []
@@ -0,0 +1,98 @@
+import asyncio
+
+from services.broadcast import STATE_DONE, Broadcaster
+from services.notifications import GLOBAL_RATE, FakeBot
+
+
+def _source(chat_ids, chunk_size=10):
+    def source():
+        for start in range(0, len(chat_ids), chunk_size):
+            yield chat_ids[start:start + chunk_size]
+    return source
+
+
+def _sent_ids(bot):
+    return [chat_id for _, chat_id, _ in bot.sent]
+
+
+def test_blocked_users_and_report(tmp_path):
+    chat_ids = list(range(1, 21))
+    bot = FakeBot(blocked_chat_ids={3, 7})
+    broadcaster = Broadcaster(bot, str(tmp_path), chunk_size=8)
+
+    async def main():
+        job = broadcaster.create("Расписание", notify_chat_id=100)
+        return await broadcaster.run(job, _source(chat_ids))
+
+    job = asyncio.run(main())
+
+    assert job.state == STATE_DONE
+    assert (job.total, job.processed, job.delivered, job.blocked, job.failed) == (20, 20, 18, 2, 0)
+    # Последнее сообщение — отчет админу
+    assert bot.sent[-1][1] == 100
+    report = bot.sent[-1][2]
+    assert "Доставлено: 18" in report
+    assert "Заблокировали бота: 2" in report
+    assert sorted(_sent_ids(bot)[:-1]) == [chat_id for chat_id in chat_ids if chat_id not in (3, 7)]
+    # Файл получателей удаляется, прогресс остается
+    assert not (tmp_path / f"{job.job_id}.recipients").exists()
+    assert broadcaster.unfinished() == []
+
+
+def test_global_rate_ceiling(tmp_path):
+    chat_ids = list(range(1, 61))
+    bot = FakeBot()
+    broadcaster = Broadcaster(bot, str(tmp_path), chunk_size=50)
+
+    async def main():
+        return await broadcaster.run(broadcaster.create("Расписание"), _source(chat_ids))
+
+    asyncio.run(main())
+
+    times = [sent_at for sent_at, _, _ in bot.sent]
+    assert len(times) == 60
+    # В любом окне в одну секунду — не больше GLOBAL_RATE отправок
+    for i, start in enumerate(times):
+        in_window = sum(1 for sent_at in times[i:] if sent_at - start < 1.0)
+        assert in_window <= GLOBAL_RATE
+
+
+def test_resume_after_interruption(tmp_path):
+    chat_ids = list(range(1, 41))
+    chunk_size = 10
+    first_bot = FakeBot(latency=0.01)
+
+    async def interrupted():
+        broadcaster = Broadcaster(first_bot, str(tmp_path), chunk_size=chunk_size)
+        job = broadcaster.create("Расписание", job_id="broadcast_test")
+        task = broadcaster.start(job, _source(chat_ids))
+        # Останавливаем после первой сохраненной пачки, как при падении бота
+        while job.processed < chunk_size:
+            await asyncio.sleep(0.01)
+        await broadcaster.stop()
+        assert task.cancelled()
+
+    asyncio.run(interrupted())
+
+    second_bot = FakeBot()
+    resumed = Broadcaster(second_bot, str(tmp_path), chunk_size=chunk_size)
+    unfinished = resumed.unfinished()
+    assert [job.job_id for job in unfinished] == ["broadcast_test"]
+    done_before = unfinished[0].processed
+    assert done_before >= chunk_size
+
+    async def resume():
+        # Источник при продолжении не читается: список получателей уже выгружен
+        return await resumed.run(unfinished[0], _source([]))
+
+    job = asyncio.run(resume())
+
+    assert job.state == STATE_DONE
+    assert job.total == job.processed == 40
+    delivered = _sent_ids(first_bot) + _sent_ids(second_bot)
+    assert set(delivered) == set(chat_ids)
+    # Повторно могут уйти только сообщения последней незавершенной пачки
+    assert len(delivered) - len(chat_ids) <= chunk_size
+    # Уже обработанные чаты второй раз не получают сообщений
+    assert not set(_sent_ids(second_bot)) & set(chat_ids[:done_before])
+    assert resumed.unfinished() == []
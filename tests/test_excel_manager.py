@@ -0,0 +1,82 @@
+import os
+
+import pytest
+
+import excel_manager
+from excel_manager import JOURNAL_CONSUMER, InstanceLock, XlwingsBackend, value_runs
+from journal import ApplicationJournal
+
+
+def test_instance_lock_is_exclusive(tmp_path):
+    path = str(tmp_path / "excel_manager.lock")
+    first, second = InstanceLock(path), InstanceLock(path)
+
+    assert first.acquire()
+    assert not second.acquire()
+
+    first.release()
+    assert second.acquire()
+    second.release()
+    # Повторное освобождение ничего не делает
+    second.release()
+
+
+def test_ingest_journal_refuses_while_locked(tmp_path, monkeypatch):
+    lock_path = str(tmp_path / "excel_manager.lock")
+    monkeypatch.setattr(excel_manager, "LOCK_FILE", lock_path)
+    holder = InstanceLock(lock_path)
+    assert holder.acquire()
+    try:
+        with pytest.raises(RuntimeError, match="другим процессом"):
+            excel_manager.ingest_journal(journal=object(), excel_file=str(tmp_path / "missing.xlsx"))
+    finally:
+        holder.release()
+
+
+def test_ingest_journal_requires_existing_workbook(tmp_path, monkeypatch):
+    monkeypatch.setattr(excel_manager, "LOCK_FILE", str(tmp_path / "excel_manager.lock"))
+    journal = ApplicationJournal(str(tmp_path / "journal"))
+    journal.append_application(1, {"event": "test"})
+    excel_file = str(tmp_path / "applications.xlsx")
+
+    with pytest.raises(RuntimeError, match="не найдена"):
+        excel_manager.ingest_journal(journal=journal, excel_file=excel_file, backend="openpyxl")
+
+    # Пустая книга не создана, а заявка осталась в хвосте журнала
+    assert not os.path.exists(excel_file)
+    records, _ = journal.read_tail(JOURNAL_CONSUMER)
+    assert [record["id"] for record in records] == [1]
+    journal.close()
+
+
+class FakeXlwingsSheet:
+    """Запоминает присваивания sheet.range((row, col)).value."""
+
+    def __init__(self):
+        self.writes = []
+
+    def range(self, cell):
+        sheet = self
+
+        class Range:
+            @property
+            def value(self):
+                return None
+
+            @value.setter
+            def value(self, values):
+                sheet.writes.append((cell, values))
+
+        return Range()
+
+
+def test_value_runs_skip_none():
+    assert value_runs([]) == []
+    assert value_runs([None, None]) == []
+    assert value_runs([1, 2, None, 3, None, None, 4, 5]) == [(1, [1, 2]), (4, [3]), (7, [4, 5])]
+
+
+def test_xlwings_write_rows_keeps_empty_cells():
+    sheet = FakeXlwingsSheet()
+    XlwingsBackend().write_rows(sheet, 10, [["a", None, "b", "c"], [None, "d"]])
+    assert sheet.writes == [((10, 1), ["a"]), ((10, 3), ["b", "c"]), ((11, 2), ["d"])]
@@ -0,0 +1,37 @@
+import json
+
+from oldbot.bot_logic.transfer.excel_parser import regenerate_config
+
+FIELDS = ("", "название, вид события", "год договора", "даты/часы приема Крыло")
+
+
+def _columns(schedule):
+    return [FIELDS, ("Минск", "IRONSTAR", 2025, schedule)]
+
+
+def _read(path):
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_regeneration_keeps_manual_settings(tmp_path):
+    config_path = str(tmp_path / "config.json")
+    regenerate_config(_columns("27.05.2025 г. с 11:00 до 20:00"), config_path)
+
+    config = _read(config_path)
+    config["admin_ids"] = [1]
+    config["default_slot_capacity"] = 40
+    config["events"][0]["delivery_options"][0]["capacity"] = 10
+    with open(config_path, "w", encoding="utf-8") as f:
+        json.dump(config, f)
+
+    # Правка расписания пересобирает событие
+    diff = regenerate_config(_columns("28.05.2025 г. с 11:00 до 20:00"), config_path)
+    assert diff.changed
+
+    config = _read(config_path)
+    assert config["admin_ids"] == [1]
+    assert config["default_slot_capacity"] == 40
+    option = config["events"][0]["delivery_options"][0]
+    assert option["slots"] == [{"start": "2025-05-28", "times": ["11:00-20:00"]}]
+    assert option["capacity"] == 10
@@ -0,0 +1,93 @@
+import asyncio
+
+from aiogram.fsm.state import State, StatesGroup
+from aiogram.fsm.storage.base import StorageKey
+from fakeredis.aioredis import FakeRedis
+
+from services.fsm_storage import TTLRedisStorage, parse_state_ttls
+
+
+class OrderFSM(StatesGroup):
+    choosing = State()
+    confirming = State()
+
+
+class ProfileFSM(StatesGroup):
+    name = State()
+
+
+KEY = StorageKey(bot_id=1, chat_id=2, user_id=2)
+
+
+def _storage(state_ttls=None, default_ttl=None):
+    return TTLRedisStorage(FakeRedis(), state_ttls=state_ttls, default_ttl=default_ttl)
+
+
+async def _ttls(storage):
+    state_key = storage.key_builder.build(KEY, "state")
+    data_key = storage.key_builder.build(KEY, "data")
+    return await storage.redis.ttl(state_key), await storage.redis.ttl(data_key)
+
+
+def test_parse_state_ttls():
+    assert parse_state_ttls("OrderFSM=3600, OrderFSM:confirming=60,,=5") == {
+        "OrderFSM": 3600, "OrderFSM:confirming": 60}
+    assert parse_state_ttls("") == {}
+
+
+def test_ttl_by_state_then_group():
+    storage = _storage({"OrderFSM": 3600, "OrderFSM:confirming": 60}, default_ttl=86400)
+
+    async def main():
+        await storage.set_data(KEY, {"step": 1})
+        await storage.set_state(KEY, OrderFSM.choosing)
+        by_group = await _ttls(storage)
+        await storage.set_state(KEY, OrderFSM.confirming)
+        by_state = await _ttls(storage)
+        return by_group, by_state
+
+    by_group, by_state = asyncio.run(main())
+    assert by_group == (3600, 3600)
+    assert by_state == (60, 60)
+
+
+def test_default_ttl_and_no_ttl():
+    async def main(storage):
+        await storage.set_state(KEY, ProfileFSM.name)
+        await storage.set_data(KEY, {"name": "Иван"})
+        return await _ttls(storage)
+
+    assert asyncio.run(main(_storage({"OrderFSM": 3600}, default_ttl=86400))) == (86400, 86400)
+    # Без TTL ключи не истекают
+    assert asyncio.run(main(_storage())) == (-1, -1)
+
+
+def test_set_data_renews_both_keys():
+    storage = _storage({"OrderFSM": 3600})
+
+    async def main():
+        await storage.set_state(KEY, OrderFSM.choosing)
+        await storage.redis.expire(storage.key_builder.build(KEY, "state"), 10)
+        await storage.set_data(KEY, {"step": 2})
+        return await _ttls(storage), await storage.get_data(KEY)
+
+    ttls, data = asyncio.run(main())
+    assert ttls == (3600, 3600)
+    assert data == {"step": 2}
+
+
+def test_clear_removes_keys():
+    storage = _storage({"OrderFSM": 3600})
+
+    async def main():
+        await storage.set_state(KEY, OrderFSM.choosing)
+        await storage.set_data(KEY, {"step": 1})
+        await storage.set_state(KEY, None)
+        await storage.set_data(KEY, {})
+        return await storage.get_state(KEY), await storage.get_data(KEY), await _ttls(storage)
+
+    state, data, ttls = asyncio.run(main())
+    assert state is None
+    assert data == {}
+    # -2: ключа нет
+    assert ttls == (-2, -2)
@@ -0,0 +1,71 @@
+import os
+
+from oldbot.database.journal import OP_CREATE, REJECTED_FILE, ApplicationJournal
+
+
+def _rejected(journal_dir):
+    path = os.path.join(journal_dir, REJECTED_FILE)
+    if not os.path.exists(path):
+        return []
+    with open(path, encoding="utf-8") as f:
+        return f.read().splitlines()
+
+
+def _append_corrupt(journal, line="{broken"):
+    journal.close()
+    with open(journal._segment_path(journal.segments()[-1]), "a", encoding="utf-8") as f:
+        f.write(line + "\n")
+
+
+def test_read_at_returns_appended_record(tmp_path):
+    journal = ApplicationJournal(str(tmp_path), segment_max_bytes=200)
+    positions = {app_id: journal.append_application(app_id, {"n": app_id}) for app_id in range(1, 6)}
+    journal.append_tombstone(2)
+
+    # Маленькие сегменты: записи разложены по нескольким файлам
+    assert len(journal.segments()) > 1
+    for app_id, position in positions.items():
+        assert journal.read_at(position) == {"op": OP_CREATE, "id": app_id, "data": {"n": app_id}}
+    assert [(position, record["id"]) for position, record in journal.read_indexed()][:5] == \
+        [(positions[app_id], app_id) for app_id in range(1, 6)]
+
+
+def test_full_reads_do_not_reject(tmp_path):
+    journal = ApplicationJournal(str(tmp_path))
+    journal.append_application(1, {})
+    _append_corrupt(journal)
+    journal.append_application(2, {})
+
+    for _ in range(3):
+        records, _ = journal.read_from()
+        assert [record["id"] for record in records] == [1, 2]
+        assert len(journal.read_indexed()) == 2
+    assert _rejected(str(tmp_path)) == []
+
+
+def test_corrupt_line_rejected_once_when_checkpoint_passes(tmp_path):
+    journal = ApplicationJournal(str(tmp_path))
+    journal.append_application(1, {})
+    _append_corrupt(journal)
+    journal.append_application(2, {})
+
+    # Без сдвига чекпойнта строка не откладывается, сколько бы раз хвост ни читался
+    journal.read_tail("excel")
+    journal.read_tail("excel")
+    assert _rejected(str(tmp_path)) == []
+
+    # Чекпойнт до испорченной строки ее не задевает
+    records, checkpoint = journal.read_tail("excel", limit=1)
+    assert [record["id"] for record in records] == [1]
+    journal.commit_checkpoint("excel", checkpoint)
+    assert _rejected(str(tmp_path)) == []
+
+    records, checkpoint = journal.read_tail("excel")
+    assert [record["id"] for record in records] == [2]
+    journal.commit_checkpoint("excel", checkpoint)
+    assert _rejected(str(tmp_path)) == ["{broken"]
+
+    records, checkpoint = journal.read_tail("excel")
+    journal.commit_checkpoint("excel", checkpoint)
+    assert records == []
+    assert _rejected(str(tmp_path)) == ["{broken"]
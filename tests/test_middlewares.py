@@ -0,0 +1,106 @@
+import asyncio
+from types import SimpleNamespace
+
+from aiogram.fsm.storage.base import StorageKey
+from aiogram.types import CallbackQuery, Message, User
+
+from oldbot.bot_logic import middlewares
+from oldbot.bot_logic.middlewares import CallbackDedupMiddleware, UserEventIsolation
+
+
+def _key(user_id, chat_id=None):
+    return StorageKey(bot_id=1, chat_id=chat_id or user_id, user_id=user_id)
+
+
+def _callback(callback_id, user_id=42):
+    return CallbackQuery(id=callback_id, chat_instance="c",
+                         from_user=User(id=user_id, is_bot=False, first_name="u"))
+
+
+def test_same_user_serialized_across_chats():
+    isolation = UserEventIsolation()
+    events = []
+
+    async def handle(name, key):
+        async with isolation.lock(key):
+            events.append(f"{name}:start")
+            await asyncio.sleep(0.05)
+            events.append(f"{name}:end")
+
+    async def main():
+        # Один пользователь в личке и в группе — апдейты все равно идут по очереди
+        await asyncio.gather(handle("a", _key(42)), handle("b", _key(42, chat_id=-100)))
+
+    asyncio.run(main())
+    assert events == ["a:start", "a:end", "b:start", "b:end"]
+    assert isolation.active_users == 0
+
+
+def test_different_users_run_concurrently():
+    isolation = UserEventIsolation()
+    inside = set()
+
+    async def handle(user_id, event):
+        async with isolation.lock(_key(user_id)):
+            inside.add(user_id)
+            if len(inside) == 2:
+                event.set()
+            # Второй пользователь должен войти, пока первый еще держит свою блокировку
+            await asyncio.wait_for(event.wait(), 1.0)
+
+    async def main():
+        event = asyncio.Event()
+        await asyncio.gather(handle(1, event), handle(2, event))
+        assert isolation.active_users == 0
+
+    asyncio.run(main())
+
+
+def test_lock_table_cleaned_up():
+    isolation = UserEventIsolation()
+
+    async def handle(user_id):
+        async with isolation.lock(_key(user_id)):
+            await asyncio.sleep(0)
+
+    async def main():
+        await asyncio.gather(*(handle(user_id % 10) for user_id in range(100)))
+        assert isolation.active_users == 0
+
+        # Исключение в обработчике тоже освобождает запись
+        try:
+            async with isolation.lock(_key(1)):
+                assert isolation.active_users == 1
+                raise RuntimeError("сбой")
+        except RuntimeError:
+            pass
+        assert isolation.active_users == 0
+
+    asyncio.run(main())
+
+
+def test_dedup_drops_repeated_callback_within_ttl(monkeypatch):
+    now = [1000.0]
+    # Подменяем часы только модулю middlewares, цикл событий живет по настоящим
+    monkeypatch.setattr(middlewares, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    dedup = CallbackDedupMiddleware(ttl=60.0)
+    handled = []
+
+    async def handler(event, data):
+        handled.append(getattr(event, "id", None))
+        return "ok"
+
+    async def main():
+        assert await dedup(handler, _callback("1"), {}) == "ok"
+        assert await dedup(handler, _callback("1"), {}) is None
+        assert await dedup(handler, _callback("2"), {}) == "ok"
+        # Не callback — пропускается без проверки
+        message = Message.model_validate({"message_id": 1, "date": 0, "chat": {"id": 42, "type": "private"}})
+        assert await dedup(handler, message, {}) == "ok"
+
+        # После ttl тот же ID снова обрабатывается
+        now[0] += 61.0
+        assert await dedup(handler, _callback("1"), {}) == "ok"
+
+    asyncio.run(main())
+    assert handled == ["1", "2", None, "1"]
@@ -0,0 +1,70 @@
+import asyncio
+import json
+import logging
+
+from services.notifications import ConfigAdminIds, FakeBot, NotificationDispatcher, build_digests, parse_chat_ids
+
+
+def test_build_digests_respects_limit():
+    assert build_digests(["один"]) == ["один"]
+
+    digests = build_digests(["x" * 1500] * 5, limit=4096)
+    assert len(digests) == 3
+    assert all(len(digest) <= 4096 for digest in digests)
+    assert digests[0].startswith("<b>Уведомлений: 2</b>")
+
+
+def test_config_admin_ids(tmp_path):
+    path = tmp_path / "config.json"
+    path.write_text(json.dumps({"admin_ids": [1, 2]}), encoding="utf-8")
+    recipients = ConfigAdminIds(str(path))
+    assert recipients() == [1, 2]
+
+    path.write_text(json.dumps({"admin_ids": [1, 2, 3]}), encoding="utf-8")
+    assert recipients() == [1, 2, 3]
+    assert ConfigAdminIds(str(tmp_path / "missing.json"))() == []
+
+
+class FlakyBot(FakeBot):
+    """Первая отправка падает с непредвиденной ошибкой."""
+
+    async def send_message(self, chat_id, text, parse_mode=None, **kwargs):
+        if self.calls == 0:
+            self.calls += 1
+            raise RuntimeError("сбой")
+        return await super().send_message(chat_id, text, parse_mode, **kwargs)
+
+
+def test_dispatcher_coalesces_and_survives_errors():
+    bot = FlakyBot()
+
+    async def main():
+        dispatcher = NotificationDispatcher(bot, lambda: [1, 2], digest_window=0.05, per_chat_interval=0)
+        dispatcher.start()
+        dispatcher.notify("потеряется")
+        await asyncio.sleep(0.2)
+        # Очередь продолжает работать после ошибки
+        dispatcher.notify("первое")
+        dispatcher.notify("второе")
+        await dispatcher.stop()
+        return dispatcher
+
+    dispatcher = asyncio.run(main())
+
+    assert dispatcher._task.exception() is None
+    texts = {chat_id: text for _, chat_id, text in bot.sent if "первое" in text}
+    assert set(texts) == {1, 2}
+    assert all("второе" in text for text in texts.values())
+
+
+def test_parse_chat_ids():
+    assert parse_chat_ids("") == []
+    assert parse_chat_ids("123, -100456,,abc") == [123, -100456]
+
+
+def test_notify_warns_without_recipients(caplog):
+    dispatcher = NotificationDispatcher(FakeBot(), lambda: [])
+    with caplog.at_level(logging.WARNING, logger="services.notifications"):
+        dispatcher.notify("никому")
+    assert dispatcher._pending == {}
+    assert "получателей уведомлений пуст" in caplog.text
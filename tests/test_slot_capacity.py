@@ -0,0 +1,65 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from oldbot.database.journal import OP_CREATE, OP_DELETE
+from oldbot.database.slot_capacity import SlotCapacityTracker, SlotFullError
+
+KEY = ("e", "P", "27.09")
+
+
+def test_concurrent_reserve_never_exceeds_capacity():
+    tracker = SlotCapacityTracker()
+    capacity, threads = 5, 50
+    barrier = threading.Barrier(threads)
+
+    def reserve(app_id):
+        # Все потоки стартуют одновременно, чтобы проверка и занятие места действительно пересекались
+        barrier.wait()
+        try:
+            tracker.reserve(app_id, KEY, capacity)
+            return True
+        except SlotFullError:
+            return False
+
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        results = list(executor.map(reserve, range(threads)))
+
+    assert results.count(True) == capacity
+    assert results.count(False) == threads - capacity
+    assert tracker.count(KEY) == capacity
+
+
+def test_release_frees_seat():
+    tracker = SlotCapacityTracker()
+    tracker.reserve(1, KEY, 2)
+    tracker.reserve(2, KEY, 2)
+    with pytest.raises(SlotFullError):
+        tracker.reserve(3, KEY, 2)
+
+    # Запись в журнал не удалась: create_application снимает бронь
+    assert tracker.release(2)
+    tracker.reserve(3, KEY, 2)
+
+    # Удаление заявки освобождает место; повторное освобождение ничего не меняет
+    assert tracker.release(1)
+    assert not tracker.release(1)
+    assert tracker.count(KEY) == 1
+    tracker.reserve(4, KEY, 2)
+    assert tracker.count(KEY) == 2
+
+
+def test_replay_counts_tombstones():
+    data = {"event_id": "e", "point_name": "P", "selected_date": "27.09"}
+    tracker = SlotCapacityTracker()
+    tracker.replay([
+        {"op": OP_CREATE, "id": 1, "data": data},
+        {"op": OP_CREATE, "id": 2, "data": data},
+        {"op": OP_DELETE, "id": 1},
+    ])
+
+    assert tracker.count(KEY) == 1
+    tracker.reserve(3, KEY, 2)
+    with pytest.raises(SlotFullError):
+        tracker.reserve(4, KEY, 2)
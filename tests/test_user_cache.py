@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+from oldbot.database import user_cache
+from oldbot.database.user_cache import MISSING, TTLLRUCache
+
+
+def _clock(monkeypatch, start=1000.0):
+    now = [start]
+    monkeypatch.setattr(user_cache, "time", SimpleNamespace(monotonic=lambda: now[0]))
+    return now
+
+
+def test_stale_put_after_invalidate_ignored():
+    cache = TTLLRUCache()
+    # Чтение с диска началось до записи профиля
+    generation = cache.generation
+    cache.invalidate(1)
+    cache.put(1, {"name": "старое"}, generation)
+    assert cache.get(1) is MISSING
+
+    # Чтение после записи кэшируется как обычно, в том числе "пользователя нет"
+    cache.put(1, {"name": "новое"}, cache.generation)
+    assert cache.get(1) == {"name": "новое"}
+    generation = cache.generation
+    cache.clear()
+    cache.put(2, None, generation)
+    assert cache.get(2) is MISSING
+    cache.put(2, None, cache.generation)
+    assert cache.get(2) is None
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    now = _clock(monkeypatch)
+    cache = TTLLRUCache(ttl=60.0)
+    cache.put(1, "a")
+
+    now[0] += 59.0
+    assert cache.get(1) == "a"
+    now[0] += 2.0
+    assert cache.get(1) is MISSING
+    assert cache.stats()["size"] == 0
+
+
+def test_lru_eviction():
+    cache = TTLLRUCache(maxsize=2)
+    cache.put(1, "a")
+    cache.put(2, "b")
+    cache.get(1)
+    cache.put(3, "c")
+
+    assert cache.get(2) is MISSING
+    assert cache.get(1) == "a"
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,28 @@
+import pytest
+
+import config
+from services.id_generator import MAX_WORKER_ID
+from services.webhook import extract_routing_key, resolve_workers
+
+
+def test_resolve_workers(monkeypatch):
+    monkeypatch.setattr(config, "WEBHOOK_WORKERS", 0)
+    assert 1 <= resolve_workers() <= MAX_WORKER_ID + 1
+    assert resolve_workers(4) == 4
+    # Хранилище с одним писателем — всегда один процесс
+    assert resolve_workers(4, single_writer=True) == 1
+    assert resolve_workers(single_writer=True) == 1
+
+    monkeypatch.setattr(config, "WEBHOOK_WORKERS", 8)
+    assert resolve_workers() == 8
+
+
+def test_resolve_workers_rejects_too_many():
+    with pytest.raises(ValueError):
+        resolve_workers(MAX_WORKER_ID + 2)
+
+
+def test_routing_key_by_user():
+    message = {"update_id": 1, "message": {"from": {"id": 42}, "chat": {"id": -100}}}
+    callback = {"update_id": 2, "callback_query": {"from": {"id": 42}, "message": {"chat": {"id": -100}}}}
+    assert extract_routing_key(message) == extract_routing_key(callback) == 42